@@ -5,8 +5,7 @@ Implements the authorization code flow with Graph API.
 from urllib.parse import urlencode
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import RedirectResponse
-from sqlmodel import Session
-import httpx
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..core.config import get_settings
 from ..core.oauth_config import (
@@ -14,12 +13,12 @@ from ..core.oauth_config import (
     FACEBOOK_TOKEN_ENDPOINT,
     FACEBOOK_USERINFO_ENDPOINT,
     FACEBOOK_SCOPES,
-    OAUTH_TIMEOUT_SECONDS,
 )
+from ..services import oauth_http
 from ..services.oauth_state import get_state_manager
-from ..services.database import get_session
+from ..services.database import get_async_session
 from .oauth_utils import (
-    get_or_create_user,
+    get_or_create_user_async,
     generate_token_response,
     assert_provider_configured,
 )
@@ -78,7 +77,7 @@ def facebook_auth_start(
 async def facebook_auth_callback(
     code: str,
     state: str,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> RedirectResponse:
     """
     Handle Facebook OAuth callback and exchange code for tokens.
@@ -103,7 +102,7 @@ async def facebook_auth_callback(
     
     # Verify and consume state token (CSRF protection)
     state_manager = get_state_manager()
-    stored_state = state_manager.verify_and_consume(state)
+    stored_state = await state_manager.verify_and_consume_async(state)
     
     if not stored_state:
         raise HTTPException(
@@ -119,8 +118,8 @@ async def facebook_auth_callback(
         "code": code,
     }
     
-    async with httpx.AsyncClient(timeout=OAUTH_TIMEOUT_SECONDS) as client:
-        token_response = await client.get(
+    with oauth_http.timed("facebook", "token_exchange"):
+        token_response = await oauth_http.get_client("facebook").get(
             FACEBOOK_TOKEN_ENDPOINT,
             params=token_params
         )
@@ -146,8 +145,8 @@ async def facebook_auth_callback(
         "access_token": access_token,
     }
     
-    async with httpx.AsyncClient(timeout=OAUTH_TIMEOUT_SECONDS) as client:
-        user_response = await client.get(
+    with oauth_http.timed("facebook", "userinfo"):
+        user_response = await oauth_http.get_client("facebook").get(
             FACEBOOK_USERINFO_ENDPOINT,
             params=user_params
         )
@@ -176,7 +175,7 @@ async def facebook_auth_callback(
     picture_url = picture_data.get("data", {}).get("url") if isinstance(picture_data, dict) else None
     
     # Get or create user
-    user = get_or_create_user(
+    user = await get_or_create_user_async(
         session, email, provider="facebook",
         display_name=name, avatar_url=picture_url,
     )
@@ -5,10 +5,7 @@ Implements the authorization code flow with OIDC.
 from urllib.parse import urlencode
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import RedirectResponse
-from sqlmodel import Session
-import httpx
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..core.config import get_settings
 from ..core.security import create_callback_token
@@ -16,12 +13,12 @@ from ..core.oauth_config import (
     GOOGLE_AUTH_ENDPOINT,
     GOOGLE_TOKEN_ENDPOINT,
     GOOGLE_SCOPES,
-    OAUTH_TIMEOUT_SECONDS,
 )
+from ..services import google_id_token, oauth_http
 from ..services.oauth_state import get_state_manager
-from ..services.database import get_session
+from ..services.database import get_async_session
 from .oauth_utils import (
-    get_or_create_user,
+    get_or_create_user_async,
     generate_token_response,
     assert_provider_configured,
 )
@@ -120,7 +117,7 @@ def google_auth_login(
 async def google_auth_callback(
     code: str = Query(..., description="Authorization code from Google"),
     state: str = Query(..., description="State token for CSRF protection"),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> RedirectResponse:
     """
     Handle Google OAuth callback and redirect to mobile app.
@@ -153,7 +150,7 @@ async def google_auth_callback(
     
     # Verify and consume state token (CSRF protection)
     state_manager = get_state_manager()
-    stored_state = state_manager.verify_and_consume(state)
+    stored_state = await state_manager.verify_and_consume_async(state)
     
     if not stored_state:
         raise HTTPException(
@@ -170,8 +167,8 @@ async def google_auth_callback(
         "grant_type": "authorization_code",
     }
     
-    async with httpx.AsyncClient(timeout=OAUTH_TIMEOUT_SECONDS) as client:
-        token_response = await client.post(
+    with oauth_http.timed("google", "token_exchange"):
+        token_response = await oauth_http.get_client("google").post(
             GOOGLE_TOKEN_ENDPOINT,
             data=token_data
         )
@@ -191,14 +188,14 @@ async def google_auth_callback(
             detail="No id_token in response"
         )
     
-    # Verify and decode ID token
+    # Verify and decode ID token (cached Google keys, local signature check)
     try:
-        id_token_claims = id_token.verify_oauth2_token(
-            id_token_str,
-            google_requests.Request(),
-            settings.google_client_id
-        )
-    except Exception as e:
+        with oauth_http.timed("google", "id_token_verify"):
+            id_token_claims = await google_id_token.verify_id_token(
+                id_token_str,
+                settings.google_client_id
+            )
+    except google_id_token.InvalidIdToken as e:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid id_token: {str(e)}"
@@ -230,7 +227,7 @@ async def google_auth_callback(
     picture = id_token_claims.get("picture")
     
     # Get or create user
-    user = get_or_create_user(
+    user = await get_or_create_user_async(
         session, email, provider="google",
         display_name=name, avatar_url=picture,
     )
@@ -6,17 +6,17 @@ from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 import jwt
 
 from ..core.config import get_settings
 from ..core.security import verify_callback_token, create_access_token
-from ..services.database import get_session
+from ..services.database import get_async_session
 from ..services.refresh_tokens import (
     RefreshTokenError,
-    issue_refresh_token,
-    revoke_refresh_token,
-    rotate_refresh_token,
+    issue_refresh_token_async,
+    revoke_refresh_token_async,
+    rotate_refresh_token_async,
 )
 from ..models.user import User
 from sqlmodel import select
@@ -57,9 +57,9 @@ class TokenRevokeRequest(BaseModel):
 
 
 @router.post("/token/exchange")
-def exchange_callback_token(
+async def exchange_callback_token(
     request: TokenExchangeRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> TokenExchangeResponse:
     """
     Exchange short-lived callback token for long-lived access token.
@@ -96,9 +96,9 @@ def exchange_callback_token(
             )
         
         # Verify user exists in database
-        user = session.exec(
+        user = (await session.exec(
             select(User).where(User.id == user_id)
-        ).first()
+        )).first()
         
         if not user or not user.is_active:
             raise HTTPException(
@@ -109,7 +109,7 @@ def exchange_callback_token(
         # Generate long-lived access token + refresh token (NT-048)
         settings = get_settings()
         access_token = create_access_token(sub=user.id)
-        raw_refresh, _ = issue_refresh_token(session, user.id)
+        raw_refresh, _ = await issue_refresh_token_async(session, user.id)
 
         return TokenExchangeResponse(
             access_token=access_token,
@@ -148,9 +148,9 @@ def exchange_callback_token(
         401: {"description": "Refresh token invalide, expiré, révoqué ou réutilisé (famille révoquée), ou utilisateur inactif"},
     },
 )
-def refresh_access_token(
+async def refresh_access_token(
     request: TokenRefreshRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> TokenExchangeResponse:
     """Rotate a refresh token into a new access + refresh token pair (NT-048).
 
@@ -162,11 +162,11 @@ def refresh_access_token(
         HTTPException: 401 if the token is unknown, expired, revoked or reused.
     """
     try:
-        raw_refresh, record = rotate_refresh_token(session, request.refresh_token)
+        raw_refresh, record = await rotate_refresh_token_async(session, request.refresh_token)
     except RefreshTokenError as e:
         raise HTTPException(status_code=401, detail=str(e))
 
-    user = session.exec(select(User).where(User.id == record.user_id)).first()
+    user = (await session.exec(select(User).where(User.id == record.user_id))).first()
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="User not found or inactive")
 
@@ -184,14 +184,14 @@ def refresh_access_token(
 
 
 @router.post("/token/revoke", status_code=204)
-def revoke_token(
+async def revoke_token(
     request: TokenRevokeRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> Response:
     """Revoke a refresh token and its whole family — logout (NT-048).
 
     Idempotent: always returns 204, whether or not the token exists
     (no token-existence oracle).
     """
-    revoke_refresh_token(session, request.refresh_token)
+    await revoke_refresh_token_async(session, request.refresh_token)
     return Response(status_code=204)
@@ -1,21 +1,172 @@
-from datetime import datetime, timezone
+import asyncio
+import json
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, Tuple, TypeVar
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from ..models.analysis import Analysis
+from ..models.analysis_job import AnalysisJob
 from ..models.user import User
-from ..schemas.coach import AnalyzeSessionRequest, AnalyzeSessionResponse
+from ..schemas.coach import (
+    AnalysisError,
+    AnalysisPage,
+    AnalysisRecord,
+    AnalysisUsage,
+    AnalysisJobResponse,
+    AnalyzeSessionRequest,
+    AnalyzeSessionResponse,
+    AnalyzeSessionsItem,
+    AnalyzeSessionsRequest,
+    AnalyzeSessionsResponse,
+    SessionsStatsRequest,
+    SessionsStatsResponse,
+    UsageItem,
+    UsageResponse,
+)
 from ..services import mistral_client
-from ..services.prompt_builder import build_prompt, UnknownPromptVariantError
-from ..services.rate_limiter import coach_rate_limiter
+from ..services.analysis_cache import CachedAnalysis, analysis_cache, analysis_fingerprint
+from ..services.analysis_history import (
+    InvalidCursorError,
+    find_by_fingerprint_async,
+    list_analyses_async,
+    record_analysis_async,
+    session_fingerprint,
+)
+from ..services.database import async_engine, get_async_session
+from ..services.prompt_builder import build_prompt, estimate_tokens, UnknownPromptVariantError
+from ..services.rate_limiter import RateLimitDecision, coach_rate_limiter
+from ..services.analysis_jobs import analysis_jobs
+from ..services.coach_analysis import run_analysis, user_weight
+from ..services.session_stats import compute_sessions_stats
+from ..services.usage_ledger import usage_ledger, usage_by_day_async
 from ..core.config import get_settings
+from ..core.logging import get_logger
 from .deps import get_current_user
 
 router = APIRouter(prefix="/coach", tags=["coach"])
+logger = get_logger("nextarget.coach")
+
+T = TypeVar("T")
+
+# Intervalle de vérification de la déconnexion client pendant une analyse.
+DISCONNECT_POLL_SECONDS = 0.5
+# Statut (convention nginx) d'une requête abandonnée par le client.
+CLIENT_CLOSED_REQUEST = 499
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def _upstream_http_error(e: mistral_client.MistralClientError) -> HTTPException:
+    """Erreur Mistral → réponse HTTP (Retry-After si l'amont en suggère un)."""
+    headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+    return HTTPException(status_code=e.status_code, detail=e.message, headers=headers)
+
+
+async def _check_quota(current_user: User) -> None:
+    """Quota quotidien de tokens (`coach_daily_token_quota`, jour UTC)."""
+    quota = get_settings().coach_daily_token_quota
+    if quota and await usage_ledger.tokens_today_async(current_user.id) >= quota:
+        now = datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        raise HTTPException(
+            status_code=429,
+            detail="Quota quotidien du coach IA atteint, réessayez demain.",
+            headers={"Retry-After": str(int((midnight - now).total_seconds()) + 1)},
+        )
+
+
+def _rate_limit_headers(decision: RateLimitDecision) -> Dict[str, str]:
+    """En-têtes `X-RateLimit-*` (quota coach restant, secondes avant remise à plein),
+    calculés depuis la décision : aucun accès supplémentaire au stockage."""
+    return {
+        "X-RateLimit-Limit": str(decision.limit),
+        "X-RateLimit-Remaining": str(decision.remaining),
+        "X-RateLimit-Reset": str(math.ceil(decision.reset_after)),
+    }
+
+
+async def _enforce_rate_limit(user_id: str) -> RateLimitDecision:
+    decision = await coach_rate_limiter.allow_async(user_id)
+    if not decision:
+        headers = _rate_limit_headers(decision)
+        headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+        raise HTTPException(
+            status_code=429,
+            detail="Trop de requêtes, réessayez plus tard.",
+            headers=headers,
+        )
+    return decision
+
+
+async def _prepare_prompt(
+    payload: AnalyzeSessionRequest, current_user: User
+) -> Tuple[str, RateLimitDecision]:
+    """Quota, rate limit et construction du prompt, communs à toutes les variantes."""
+    await _check_quota(current_user)
+    decision = await _enforce_rate_limit(current_user.id)
+
+    try:
+        return build_prompt(payload.session, payload.prompt_variant), decision
+    except UnknownPromptVariantError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def _unless_disconnected(request: Request, work: Awaitable[T]) -> T:
+    """Exécute `work` en surveillant la connexion client.
+
+    Client parti (mobile hors réseau, app fermée) : l'appel amont est
+    annulé — quota Mistral et slot de cloison rendus aussitôt (le
+    single-flight ne coupe l'amont que si plus personne n'attend).
+
+    Raises:
+        ClientDisconnected: le client s'est déconnecté avant la fin.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def _analysis_response(
+    entry: CachedAnalysis,
+    cached: bool,
+    prompt: str,
+    fingerprint: Optional[str] = None,
+) -> AnalyzeSessionResponse:
+    return AnalyzeSessionResponse(
+        analysis=entry.analysis,
+        model=entry.model,
+        generated_at=entry.generated_at,
+        cached=cached,
+        usage=AnalysisUsage(
+            prompt_tokens_estimated=estimate_tokens(prompt),
+            prompt_tokens=entry.prompt_tokens,
+            completion_tokens=entry.completion_tokens,
+        ),
+        session_fingerprint=fingerprint,
+    )
 
 
 @router.post("/analyze-session", response_model=AnalyzeSessionResponse)
 async def analyze_session(
     payload: AnalyzeSessionRequest,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
 ):
     """Proxifie l'analyse de session vers Mistral.
@@ -24,23 +175,358 @@ async def analyze_session(
     séries, synthèse) ; ni clé API ni prompt complet ne transitent
     côté client. Endpoint protégé (JWT) : le coach IA est
     "connecté uniquement" (décision produit du 7 juillet 2026).
+
+    Si le client se déconnecte en cours d'analyse, l'appel Mistral est
+    annulé et la requête n'est pas décomptée du rate limit.
     """
-    if not coach_rate_limiter.allow(current_user.id):
-        raise HTTPException(status_code=429, detail="Trop de requêtes, réessayez plus tard.")
+    prompt, decision = await _prepare_prompt(payload, current_user)
+    response.headers.update(_rate_limit_headers(decision))
+
+    try:
+        entry, cached = await _unless_disconnected(
+            request, run_analysis(prompt, current_user, payload.prompt_variant)
+        )
+    except ClientDisconnected:
+        await coach_rate_limiter.refund_async(current_user.id)
+        logger.info("coach analysis cancelled: client disconnected")
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except mistral_client.MistralClientError as e:
+        raise _upstream_http_error(e)
+
+    fingerprint = session_fingerprint(payload.session, payload.prompt_variant)
+    await _remember(current_user.id, fingerprint, payload.prompt_variant, entry)
+    return _analysis_response(entry, cached, prompt, fingerprint)
+
+
+@router.post("/analyze-sessions", response_model=AnalyzeSessionsResponse)
+async def analyze_sessions(
+    payload: AnalyzeSessionsRequest,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    """Analyse par lot (ex. après une synchro de plusieurs séances).
+
+    Les appels amont partent en parallèle (au plus
+    `coach_batch_concurrency` à la fois) : la durée totale tend vers celle
+    de l'analyse la plus longue au lieu de la somme. Chaque séance compte
+    séparément dans le rate limit ; résultats et erreurs sont rendus par
+    élément, dans l'ordre des séances envoyées.
+    """
+    settings = get_settings()
+    if len(payload.sessions) > settings.coach_batch_max_sessions:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Trop de séances dans le lot (max {settings.coach_batch_max_sessions}).",
+        )
+    await _check_quota(current_user)
 
     try:
-        prompt = build_prompt(payload.session, payload.prompt_variant)
+        prompts = [build_prompt(s, payload.prompt_variant) for s in payload.sessions]
     except UnknownPromptVariantError as e:
         raise HTTPException(status_code=422, detail=str(e))
 
+    semaphore = asyncio.Semaphore(settings.coach_batch_concurrency)
+    decisions: List[RateLimitDecision] = []
+
+    async def analyze_one(index: int, prompt: str) -> AnalyzeSessionsItem:
+        decision = await coach_rate_limiter.allow_async(current_user.id)
+        decisions.append(decision)
+        if not decision:
+            return AnalyzeSessionsItem(
+                index=index,
+                error=AnalysisError(status_code=429, detail="Trop de requêtes, réessayez plus tard."),
+            )
+        async with semaphore:
+            try:
+                entry, cached = await run_analysis(prompt, current_user, payload.prompt_variant)
+            except mistral_client.MistralClientError as e:
+                return AnalyzeSessionsItem(
+                    index=index,
+                    error=AnalysisError(status_code=e.status_code, detail=e.message),
+                )
+        fingerprint = session_fingerprint(payload.sessions[index], payload.prompt_variant)
+        await _remember(current_user.id, fingerprint, payload.prompt_variant, entry)
+        return AnalyzeSessionsItem(
+            index=index,
+            result=_analysis_response(entry, cached, prompt, fingerprint),
+        )
+
+    items = await asyncio.gather(*(analyze_one(i, p) for i, p in enumerate(prompts)))
+    # État après le dernier passage du lot : la décision la plus restrictive.
+    response.headers.update(_rate_limit_headers(min(decisions, key=lambda d: d.remaining)))
+    return AnalyzeSessionsResponse(items=list(items))
+
+
+@router.post("/stats", response_model=SessionsStatsResponse)
+async def session_stats(
+    payload: SessionsStatsRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """Statistiques objectives (points par coup, tendance du groupement,
+    répartition par distance) d'une ou plusieurs séances, plus les
+    tendances inter-séances. Calcul local, sans appel Mistral ni rate limit.
+    """
+    return compute_sessions_stats(payload.sessions)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post(
+    "/analyze-session/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def analyze_session_stream(
+    payload: AnalyzeSessionRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """Variante streaming (Server-Sent Events) de `/coach/analyze-session`.
+
+    Événements émis : `token` ({"text"}) au fil de la génération, puis
+    `done` ({"model", "generated_at", "cached", "prompt_tokens_estimated",
+    "session_fingerprint"}) ; `error`
+    ({"status_code", "detail"}) si Mistral échoue en cours de flux.
+    Les erreurs survenant avant le premier fragment (rate limit, variante
+    inconnue, erreur Mistral) gardent les mêmes codes HTTP que l'endpoint
+    bufferisé.
+    """
+    prompt, decision = await _prepare_prompt(payload, current_user)
+
+    model = mistral_client.route_model(prompt)
+    fingerprint = analysis_fingerprint(prompt, model)
+    history_key = session_fingerprint(payload.session, payload.prompt_variant)
+    cached = await analysis_cache.get(fingerprint)
+    if cached is not None:
+        await _remember(current_user.id, history_key, payload.prompt_variant, cached)
+
+        async def replay() -> AsyncIterator[str]:
+            yield _sse("token", {"text": cached.analysis})
+            yield _sse("done", {
+                "model": cached.model,
+                "generated_at": cached.generated_at.isoformat(),
+                "cached": True,
+                "prompt_tokens_estimated": estimate_tokens(prompt),
+                "session_fingerprint": history_key,
+            })
+
+        return _event_stream(replay(), _rate_limit_headers(decision))
+
+    def record_usage(text: str, status: int = 200) -> None:
+        # Pas de bloc `usage` dans le flux : tokens estimés.
+        usage_ledger.record(
+            current_user.id,
+            payload.prompt_variant,
+            model,
+            prompt_tokens=estimate_tokens(prompt),
+            completion_tokens=estimate_tokens(text) if text else 0,
+            latency_ms=round((time.perf_counter() - start) * 1000),
+            status=status,
+        )
+
+    start = time.perf_counter()
+    chunks = mistral_client.stream_analysis(
+        prompt,
+        model=model,
+        user_id=current_user.id,
+        weight=user_weight(current_user),
+    )
     try:
-        analysis = await mistral_client.fetch_analysis(prompt)
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=502, detail="Réponse vide du modèle.")
     except mistral_client.MistralClientError as e:
-        raise HTTPException(status_code=e.status_code, detail=e.message)
+        record_usage("", status=e.status_code)
+        raise _upstream_http_error(e)
+    logger.info(
+        "coach stream first token",
+        extra={"first_token_ms": round((time.perf_counter() - start) * 1000, 1)},
+    )
 
-    settings = get_settings()
-    return AnalyzeSessionResponse(
-        analysis=analysis,
-        model=settings.mistral_model,
-        generated_at=datetime.now(timezone.utc),
+    async def relay() -> AsyncIterator[str]:
+        parts = [first]
+        try:
+            yield _sse("token", {"text": first})
+            try:
+                async for delta in chunks:
+                    parts.append(delta)
+                    yield _sse("token", {"text": delta})
+            except mistral_client.MistralClientError as e:
+                record_usage("".join(parts), status=e.status_code)
+                yield _sse("error", {"status_code": e.status_code, "detail": e.message})
+                return
+
+            entry = CachedAnalysis(
+                analysis="".join(parts),
+                model=model,
+                generated_at=datetime.now(timezone.utc),
+            )
+            record_usage(entry.analysis)
+            await analysis_cache.set(fingerprint, entry)
+            await _remember(current_user.id, history_key, payload.prompt_variant, entry)
+            logger.info(
+                "coach stream completed",
+                extra={"duration_ms": round((time.perf_counter() - start) * 1000, 1)},
+            )
+            yield _sse("done", {
+                "model": entry.model,
+                "generated_at": entry.generated_at.isoformat(),
+                "cached": False,
+                "prompt_tokens_estimated": estimate_tokens(prompt),
+                "session_fingerprint": history_key,
+            })
+        finally:
+            # Client parti en cours de flux : on ferme aussi le flux amont.
+            await chunks.aclose()
+
+    return _event_stream(relay(), _rate_limit_headers(decision))
+
+
+async def _remember(user_id: str, fingerprint: str, prompt_variant: str, entry: CachedAnalysis) -> None:
+    # Session asynchrone dédiée : le flux SSE survit à la requête (et à sa
+    # session de dépendance), et les analyses d'un lot s'enregistrent en
+    # parallèle (une AsyncSession ne se partage pas entre tâches).
+    async with AsyncSession(async_engine, expire_on_commit=False) as db:
+        await record_analysis_async(db, user_id, fingerprint, prompt_variant, entry)
+
+
+def _event_stream(events: AsyncIterator[str], headers: Dict[str, str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Pas de mise en buffer par un proxy intermédiaire (nginx, Render).
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **headers},
+    )
+
+
+def _utc(value: datetime) -> datetime:
+    # Dates persistées en naïf-UTC (SQLite) : renvoyées explicitement en UTC.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _job_response(job: AnalysisJob) -> AnalysisJobResponse:
+    response = AnalysisJobResponse(
+        id=job.id,
+        status=job.status,
+        created_at=_utc(job.created_at),
+        completed_at=_utc(job.completed_at) if job.completed_at else None,
+    )
+    if job.status == "done" and job.analysis is not None:
+        request = AnalyzeSessionRequest.parse_raw(job.request_json)
+        response.result = AnalyzeSessionResponse(
+            analysis=job.analysis,
+            model=job.model or "",
+            generated_at=response.completed_at or response.created_at,
+            cached=job.cached,
+            usage=AnalysisUsage(
+                prompt_tokens_estimated=job.prompt_tokens_estimated or 0,
+                prompt_tokens=job.prompt_tokens,
+                completion_tokens=job.completion_tokens,
+            ),
+            session_fingerprint=session_fingerprint(request.session, request.prompt_variant),
+        )
+    elif job.status == "error":
+        response.error = AnalysisError(
+            status_code=job.error_status or 502,
+            detail=job.error_detail or "",
+        )
+    return response
+
+
+@router.post("/jobs", response_model=AnalysisJobResponse, status_code=202)
+async def create_analysis_job(
+    payload: AnalyzeSessionRequest,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    """Mode job : enregistre l'analyse et rend immédiatement un id de job.
+
+    Le résultat survit à une coupure réseau côté mobile (et à un
+    redémarrage serveur) ; il se récupère via `GET /coach/jobs/{id}`.
+    Même rate limit que l'analyse directe.
+    """
+    await _check_quota(current_user)
+    decision = await _enforce_rate_limit(current_user.id)
+    response.headers.update(_rate_limit_headers(decision))
+
+    job = await analysis_jobs.submit(current_user.id, payload)
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(
+    job_id: str,
+    wait: int = Query(0, ge=0, description="Long polling : attente max (s) tant que le job n'est pas terminé"),
+    current_user: User = Depends(get_current_user),
+):
+    """État d'un job ; avec `wait`, la réponse part dès la fin du job
+    (plafonné à `coach_job_max_wait_seconds`)."""
+    timeout = min(wait, get_settings().coach_job_max_wait_seconds)
+    job = await analysis_jobs.wait(job_id, current_user.id, timeout=timeout)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    return _job_response(job)
+
+
+def _analysis_record(analysis: Analysis) -> AnalysisRecord:
+    return AnalysisRecord(
+        id=analysis.id,
+        session_fingerprint=analysis.session_fingerprint,
+        prompt_variant=analysis.prompt_variant,
+        model=analysis.model,
+        analysis=analysis.analysis,
+        prompt_tokens=analysis.prompt_tokens,
+        completion_tokens=analysis.completion_tokens,
+        created_at=_utc(analysis.created_at),
+    )
+
+
+@router.get("/analyses", response_model=AnalysisPage)
+async def list_analysis_history(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Curseur `next_cursor` de la page précédente"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Historique des analyses de l'utilisateur, plus récentes d'abord
+    (pagination par curseur)."""
+    try:
+        items, next_cursor = await list_analyses_async(db, current_user.id, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return AnalysisPage(items=[_analysis_record(a) for a in items], next_cursor=next_cursor)
+
+
+@router.get("/analyses/by-fingerprint/{fingerprint}", response_model=AnalysisRecord)
+async def get_analysis_by_fingerprint(
+    fingerprint: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Dernière analyse de l'utilisateur pour une séance (`session_fingerprint`
+    renvoyé par les endpoints d'analyse) : affichage immédiat sans régénération."""
+    analysis = await find_by_fingerprint_async(db, current_user.id, fingerprint)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analyse introuvable")
+    return _analysis_record(analysis)
+
+
+@router.get("/usage", response_model=UsageResponse)
+async def get_usage(
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Consommation de tokens de l'utilisateur, par jour (UTC) et par
+    variante, sur les `days` derniers jours, et état du quota du jour."""
+    await usage_ledger.flush()
+    quota = get_settings().coach_daily_token_quota
+    return UsageResponse(
+        daily_token_quota=quota or None,
+        tokens_today=await usage_ledger.tokens_today_async(current_user.id),
+        items=[
+            UsageItem(day=day, prompt_variant=variant, calls=calls, prompt_tokens=p, completion_tokens=c)
+            for day, variant, calls, p, c in await usage_by_day_async(db, current_user.id, days)
+        ],
     )
@@ -1,15 +1,17 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..services.database import get_session
+from ..services.database import get_async_session
 from ..models.user import User
 from ..core.security import decode_token
+from ..services.user_cache import user_cache
 from typing import Optional
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_async_session)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,7 +27,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: Session
     except Exception:
         raise credentials_exception
 
-    user = session.exec(select(User).where(User.id == user_id)).first()
-    if not user:
+    # Short-TTL snapshot cache: a hit skips the SQL lookup (services/user_cache).
+    user = user_cache.get(user_id)
+    if user is None:
+        user = (await session.exec(select(User).where(User.id == user_id))).first()
+        if user:
+            user_cache.put(user)
+    if not user or not user.is_active:
         raise credentials_exception
     return user
@@ -6,10 +6,12 @@ from datetime import timedelta
 from typing import Optional
 from fastapi import HTTPException
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..models.user import User
 from ..core.security import create_access_token, create_callback_token
 from ..core.config import get_settings
+from ..services.user_cache import user_cache
 
 
 def get_or_create_user(
@@ -40,26 +42,15 @@ def get_or_create_user(
         HTTPException: If user creation fails
     """
     # Check if user exists
-    user = session.exec(
-        select(User).where(
-            User.email == email,
-            User.provider == provider
-        )
-    ).first()
+    user = session.exec(_by_email(email, provider)).first()
     
     if user:
         # Refresh IdP data on existing user login
-        changed = False
-        if avatar_url is not None:
-            user.avatar_url = avatar_url
-            changed = True
-        if display_name is not None and not user.display_name_custom:
-            user.display_name = display_name
-            changed = True
-        if changed:
+        if _refresh_idp_data(user, display_name, avatar_url):
             session.add(user)
             session.commit()
             session.refresh(user)
+            user_cache.invalidate(user.id)
         return user
     
     # Create new user
@@ -83,6 +74,67 @@ def get_or_create_user(
         )
 
 
+async def get_or_create_user_async(
+    session: AsyncSession,
+    email: str,
+    provider: str,
+    display_name: Optional[str] = None,
+    avatar_url: Optional[str] = None,
+) -> User:
+    """Async `get_or_create_user` (same rules, non-blocking session)."""
+    user = (await session.exec(_by_email(email, provider))).first()
+
+    if user:
+        if _refresh_idp_data(user, display_name, avatar_url):
+            session.add(user)
+            await session.commit()
+            await session.refresh(user)
+            user_cache.invalidate(user.id)
+        return user
+
+    user = User(
+        email=email,
+        provider=provider,
+        display_name=display_name,
+        avatar_url=avatar_url,
+    )
+    session.add(user)
+
+    try:
+        await session.commit()
+        await session.refresh(user)
+        return user
+    except Exception as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to create user: {str(e)}"
+        )
+
+
+def _by_email(email: str, provider: str):
+    return select(User).where(
+        User.email == email,
+        User.provider == provider
+    )
+
+
+def _refresh_idp_data(user: User, display_name: Optional[str], avatar_url: Optional[str]) -> bool:
+    """Apply IdP data to an existing user; True if anything changed.
+
+    avatar_url is refreshed unconditionally, display_name only if the user
+    hasn't customized it.
+    """
+    changed = False
+    if avatar_url is not None:
+        user.avatar_url = avatar_url
+        changed = True
+    if display_name is not None and not user.display_name_custom:
+        user.display_name = display_name
+        changed = True
+    return changed
+
+
 def generate_token_response(user: User) -> dict:
     """
     Generate standardized OAuth token response.
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..schemas.auth import UserPublic, UserProfileUpdate
 from ..models.user import User
-from ..services.database import get_session
+from ..services.database import get_async_session
+from ..services.user_cache import user_cache
 from .deps import get_current_user
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -17,7 +18,7 @@ async def read_me(current_user: User = Depends(get_current_user)):
 async def update_profile(
     update: UserProfileUpdate,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     Update current user's profile information.
@@ -38,6 +39,18 @@ async def update_profile(
     
     if not update_data:
         return current_user
+
+    # current_user may be a cached snapshot: write through this session.
+    # The row may be gone (or deactivated) since the snapshot was taken.
+    user_id = current_user.id
+    current_user = await session.get(User, user_id)
+    if current_user is None or not current_user.is_active:
+        user_cache.invalidate(user_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     if "display_name" in update_data:
         current_user.display_name = update_data["display_name"]
@@ -48,7 +61,8 @@ async def update_profile(
         current_user.experience_level = update_data["experience_level"]
     
     session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
+    await session.commit()
+    await session.refresh(current_user)
+    user_cache.invalidate(current_user.id)
     
     return current_user
@@ -1,6 +1,6 @@
 from pydantic import BaseSettings, Field
 from functools import lru_cache
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     app_name: str = "NexTarget API"
@@ -25,12 +25,19 @@ class Settings(BaseSettings):
             return [o.strip() for o in self.cors_allow_origins.split(",") if o.strip()]
         return ["*"] if self.environment == "dev" else []
 
+    # Monitoring : jeton exigé par GET /metrics (`Authorization: Bearer …`).
+    # Non défini : /metrics ouvert en dev, désactivé (404) ailleurs.
+    metrics_token: Optional[str] = Field(default=None, env="METRICS_TOKEN")
+
     # Security / Auth
     jwt_secret_key: str = Field(..., env="JWT_SECRET_KEY")
     jwt_algorithm: str = "HS256"
     access_token_exp_minutes: int = 60
     callback_token_exp_minutes: int = 10  # Short-lived token for OAuth callback
     refresh_token_exp_days: int = 30  # Refresh token lifetime (NT-048)
+    # Cache des JWT déjà vérifiés (empreinte SHA-256 -> payload, jusqu'à
+    # `exp`) : un jeton rejoué n'est plus revérifié ; 0 = désactivé.
+    jwt_cache_max_entries: int = 10_000
 
     # Database
     database_url: str = "sqlite:///./data.db"
@@ -40,6 +47,119 @@ class Settings(BaseSettings):
     mistral_api_base: str = "https://api.mistral.ai/v1"
     mistral_model: str = "mistral-small-latest"
     mistral_timeout_seconds: int = 30
+    # Client HTTP partagé (pool keep-alive) : une seule poignée de main
+    # TCP+TLS par connexion au lieu d'une par analyse.
+    mistral_connect_timeout_seconds: float = 5.0
+    mistral_pool_max_connections: int = 20
+    mistral_pool_max_keepalive: int = 10
+    mistral_keepalive_expiry_seconds: float = 30.0
+    # HTTP/2 : nécessite le paquet optionnel `h2` (ignoré s'il est absent).
+    mistral_http2: bool = False
+    # Cloison globale (tous utilisateurs) : appels Mistral simultanés,
+    # file d'attente bornée, attente max avant 503 + Retry-After.
+    mistral_max_concurrency: int = 8
+    mistral_max_queue: int = 32
+    mistral_max_queue_wait_seconds: float = 10.0
+    # File équitable par utilisateur : poids par niveau (`experience_level`,
+    # futur palier d'abonnement), ex. "expert=2,advanced=1.5" ; défaut 1.
+    mistral_fair_queue_weights: Optional[str] = None
+
+    @property
+    def fair_queue_weights(self) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for item in (self.mistral_fair_queue_weights or "").split(","):
+            name, _, value = item.partition("=")
+            if name.strip() and value.strip():
+                weights[name.strip()] = float(value)
+        return weights
+
+    # Retries (429, 5xx, timeout, réseau) : backoff exponentiel + jitter,
+    # Retry-After amont honoré, le tout borné par une échéance globale.
+    mistral_max_retries: int = 2
+    mistral_retry_base_delay_seconds: float = 0.5
+    mistral_retry_max_delay_seconds: float = 8.0
+    mistral_retry_deadline_seconds: float = 45.0
+    # Disjoncteur : ouvert après N pannes consécutives, essai après le délai.
+    mistral_breaker_failure_threshold: int = 5
+    mistral_breaker_reset_seconds: float = 30.0
+    # Requêtes couvertes (hedging) : 2e appel identique si le 1er dépasse
+    # le percentile de latence observé ; budget = part max d'appels en plus.
+    mistral_hedge_enabled: bool = False
+    mistral_hedge_percentile: float = 95.0
+    mistral_hedge_budget_ratio: float = 0.05
+    mistral_hedge_min_samples: int = 20
+    # Routage par taille : prompts courts (tokens estimés) vers un modèle
+    # plus petit/rapide ; None = toujours `mistral_model`.
+    mistral_small_model: Optional[str] = None
+    mistral_small_model_max_prompt_tokens: int = 600
+    # Modèle de repli sur timeout / 5xx / erreur réseau ; None = pas de repli.
+    mistral_fallback_model: Optional[str] = None
+
+    # Cache des analyses coach (clé = empreinte modèle + prompt).
+    analysis_cache_enabled: bool = True
+    analysis_cache_max_entries: int = 1000
+    analysis_cache_ttl_seconds: int = 24 * 3600
+    # Niveau persistant optionnel (fichier SQLite) ; None = mémoire seule.
+    analysis_cache_sqlite_path: Optional[str] = None
+
+    # Budget du prompt coach (tokens estimés) : au-delà, le prompt est
+    # compacté (commentaires tronqués, séries agrégées). 0 = pas de budget.
+    coach_prompt_max_tokens: int = 1500
+    # Ajoute au prompt les statistiques pré-calculées (services/session_stats).
+    coach_prompt_include_stats: bool = False
+
+    # Jobs d'analyse asynchrones (POST /coach/jobs) : taille fixe du pool
+    # de workers et attente maximale d'un long polling GET /coach/jobs/{id}.
+    coach_job_workers: int = 2
+    coach_job_max_wait_seconds: int = 30
+    # Bail d'un job `running` (rafraîchi pendant l'exécution) : un autre
+    # worker ne le reprend qu'une fois le bail expiré (worker mort).
+    coach_job_lease_seconds: float = 60.0
+    # Long polling : relecture du job à cet intervalle (job terminé par un
+    # autre worker, non signalé par l'événement local).
+    coach_job_poll_interval_seconds: float = 1.0
+
+    # Analyse par lot (POST /coach/analyze-sessions) : taille max du lot et
+    # appels amont simultanés par requête.
+    coach_batch_max_sessions: int = 10
+    coach_batch_concurrency: int = 4
+
+    # Registre de consommation (table TokenUsage) : écritures groupées.
+    usage_ledger_batch_size: int = 100
+    usage_ledger_flush_interval_seconds: float = 2.0
+    # Quota quotidien de tokens (prompt + complétion) par utilisateur,
+    # jour UTC ; 0 = illimité.
+    coach_daily_token_quota: int = 0
+    # Relecture en base du total du jour : borne le délai avant que la
+    # consommation des autres workers compte dans le quota.
+    usage_quota_refresh_seconds: float = 60.0
+
+    # Stockage partagé (rate limiter coach, OAuth state) : "memory"
+    # (mono-worker), "sqlite" (workers d'une même machine) ou "redis"
+    # (paquet optionnel `redis`, REDIS_URL).
+    shared_store_backend: str = "memory"
+    shared_store_sqlite_path: str = "./shared_store.db"
+    redis_url: Optional[str] = None
+    # OAuth state en mémoire : capacité (les plus anciens sont évincés) et
+    # période de la purge de fond des states expirés.
+    oauth_state_max_entries: int = 10_000
+    oauth_state_sweep_interval_seconds: float = 30.0
+    # "stored" : state aléatoire conservé côté serveur ; "signed" : jeton
+    # signé HMAC portant les nonces (vérifiable par tout worker, seuls les
+    # states consommés sont mémorisés jusqu'à leur expiration).
+    oauth_state_mode: str = "stored"
+
+    # Clients HTTP partagés vers Google / Facebook (un pool par fournisseur ;
+    # timeout : OAUTH_TIMEOUT_SECONDS dans core/oauth_config).
+    oauth_http2: bool = False  # nécessite le paquet optionnel `h2`
+    oauth_pool_max_connections: int = 10
+    oauth_pool_max_keepalive: int = 5
+    oauth_keepalive_expiry_seconds: float = 60.0
+
+    # Cache des utilisateurs authentifiés (get_current_user) : TTL court =
+    # délai max de prise en compte d'une désactivation ; 0 = désactivé.
+    user_cache_ttl_seconds: float = 30.0
+    user_cache_max_entries: int = 10_000
 
     # Google OAuth
     google_client_id: Optional[str] = Field(default=None, env="GOOGLE_CLIENT_ID")
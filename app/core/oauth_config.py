@@ -8,6 +8,8 @@ from typing import Final
 GOOGLE_AUTH_ENDPOINT: Final[str] = "https://accounts.google.com/o/oauth2/v2/auth"
 GOOGLE_TOKEN_ENDPOINT: Final[str] = "https://oauth2.googleapis.com/token"
 GOOGLE_SCOPES: Final[list[str]] = ["openid", "email", "profile"]
+GOOGLE_JWKS_URL: Final[str] = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS: Final[tuple[str, ...]] = ("accounts.google.com", "https://accounts.google.com")
 
 # Facebook OAuth Configuration
 FACEBOOK_AUTH_ENDPOINT: Final[str] = "https://www.facebook.com/v18.0/dialog/oauth"
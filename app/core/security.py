@@ -1,12 +1,109 @@
+import calendar
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Literal
 import jwt
-from typing import Dict, Any
+from jwt.utils import base64url_encode
+from typing import Dict, Any, Tuple
 
 from .config import get_settings
 
 settings = get_settings()
 
+# Signing keys, prepared once -------------------------------------------------
+#
+# jwt.encode / jwt.decode re-validate and convert the secret on every call.
+# For the HMAC algorithms we key an HMAC object once (encode copies it) and
+# wrap the secret in a PyJWK (decode uses it as-is). Other algorithms fall
+# back to plain PyJWT with the raw key.
+
+_HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+def _prepare_keys(secret: str, algorithm: str) -> Tuple[Optional["hmac.HMAC"], Optional[bytes], Any]:
+    digest = _HMAC_DIGESTS.get(algorithm)
+    if digest is None:
+        return None, None, secret
+    secret_bytes = secret.encode()
+    header = json.dumps({"alg": algorithm, "typ": "JWT"}, separators=(",", ":"), sort_keys=True)
+    verifying_key = jwt.PyJWK({"kty": "oct", "k": base64url_encode(secret_bytes).decode(), "alg": algorithm})
+    return hmac.new(secret_bytes, digestmod=digest), base64url_encode(header.encode()), verifying_key
+
+
+_signing_mac, _encoded_header, _verifying_key = _prepare_keys(settings.jwt_secret_key, settings.jwt_algorithm)
+
+
+def _encode(payload: Dict[str, Any]) -> str:
+    """Sign a payload; same output as jwt.encode (exp as a UTC timestamp)."""
+    payload = {**payload, "exp": calendar.timegm(payload["exp"].utctimetuple())}
+    if _signing_mac is None:
+        return jwt.encode(payload, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    signing_input = _encoded_header + b"." + base64url_encode(json.dumps(payload, separators=(",", ":")).encode())
+    mac = _signing_mac.copy()
+    mac.update(signing_input)
+    return (signing_input + b"." + base64url_encode(mac.digest())).decode()
+
+
+# Verified-token cache --------------------------------------------------------
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified payloads, keyed by the token's SHA-256.
+
+    Clients replay the same access token on every request until it expires:
+    a hit skips the signature check and claim validation, and is only
+    served until the token's `exp`. Invalid tokens are never cached.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        payload, exp = entry
+        if exp <= time.time():
+            self._entries.pop(key, None)
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return dict(payload)
+
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        exp = payload.get("exp")
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        key = hashlib.sha256(token.encode()).digest()
+        self._entries[key] = (dict(payload), exp)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def reset(self) -> None:
+        self._entries.clear()
+        self._hits = self._misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+        }
+
+
+jwt_cache = VerifiedTokenCache(max_entries=settings.jwt_cache_max_entries)
+
 # JWT tokens -----------------------------------------------------------------
 
 def create_access_token(sub: str, expires_delta: Optional[timedelta] = None) -> str:
@@ -15,7 +112,7 @@ def create_access_token(sub: str, expires_delta: Optional[timedelta] = None) ->
         expires_delta = timedelta(minutes=settings.access_token_exp_minutes)
     expire = datetime.now(timezone.utc) + expires_delta
     payload = {"exp": expire, "sub": sub, "type": "access"}
-    token = jwt.encode(payload, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    token = _encode(payload)
     return token
 
 
@@ -30,13 +127,17 @@ def create_callback_token(sub: str, provider: str, email: str) -> str:
         "provider": provider,
         "email": email,
     }
-    token = jwt.encode(payload, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    token = _encode(payload)
     return token
 
 
 def decode_token(token: str) -> Dict[str, Any]:
-    """Decode and verify any JWT token."""
-    return jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+    """Decode and verify any JWT token (verified payloads cached until exp)."""
+    payload = jwt_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, _verifying_key, algorithms=[settings.jwt_algorithm])
+        jwt_cache.put(token, payload)
+    return payload
 
 
 def verify_callback_token(token: str) -> Dict[str, Any]:
@@ -1,12 +1,24 @@
+import hmac
 import time
 import uuid
 
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from .core.config import get_settings
+from .core.security import jwt_cache
 from .core.logging import get_logger, request_id_var, setup_logging
-from .services.database import init_db
+from .services.database import async_engine, init_db
+from .services import mistral_client, oauth_http
+from .services.analysis_cache import analysis_cache
+from .services.analysis_jobs import analysis_jobs
+from .services.bulkhead import mistral_bulkhead
+from .services.google_id_token import google_keys
+from .services.oauth_state import get_state_manager
+from .services.rate_limiter import coach_rate_limiter
+from .services.single_flight import analysis_flights
+from .services.usage_ledger import usage_ledger
+from .services.user_cache import user_cache
 from .api import auth_google, auth_facebook, auth_token, users, coach
 
 settings = get_settings()
@@ -71,15 +83,74 @@ async def request_correlation(request: Request, call_next):
 
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    await mistral_client.open_client()
+    await analysis_jobs.start()
+    await usage_ledger.start()
+    await get_state_manager().start()
+    await oauth_http.open_clients()
+    await google_keys.start()
     logger.info("startup", extra={"environment": settings.environment})
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await google_keys.stop()
+    await oauth_http.close_clients()
+    await get_state_manager().stop()
+    await analysis_jobs.stop()
+    await usage_ledger.stop()
+    await mistral_client.close_client()
+    await async_engine.dispose()
+    logger.info("shutdown")
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+
+def require_metrics_access(request: Request) -> None:
+    """Gate /metrics: bearer METRICS_TOKEN when configured, else dev only.
+
+    The counters carry no user data or secret, but expose breaker state,
+    queue depths and quotas: not for the public internet.
+    """
+    if settings.metrics_token is None:
+        if settings.environment != "dev":
+            raise HTTPException(status_code=404, detail="Not Found")
+        return
+    expected = f"Bearer {settings.metrics_token}".encode()
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_access)])
+async def metrics():
+    """Compteurs internes (monitoring) — aucune donnée utilisateur ni secret."""
+    return {
+        "mistral_pool": mistral_client.pool_stats(),
+        "mistral_bulkhead": mistral_bulkhead.stats(),
+        "mistral_breaker": mistral_client.breaker_stats(),
+        "mistral_hedging": mistral_client.hedging_stats(),
+        "mistral_models": mistral_client.model_stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "analysis_single_flight": analysis_flights.stats(),
+        "analysis_jobs": analysis_jobs.stats(),
+        "usage_ledger": usage_ledger.stats(),
+        "coach_rate_limiter": coach_rate_limiter.stats(),
+        "oauth_state": get_state_manager().stats(),
+        "google_jwks": google_keys.stats(),
+        "oauth_latency": oauth_http.latency_stats(),
+        "user_cache": user_cache.stats(),
+        "jwt_cache": jwt_cache.stats(),
+    }
+
 # OAuth authentication routers
 app.include_router(auth_google.router)
 app.include_router(auth_facebook.router)
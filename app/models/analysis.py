@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+from typing import Optional
+import uuid
+
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+def _utc_now() -> datetime:
+    """Naive UTC now (SQLite stores naive datetimes; utcnow is deprecated)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class Analysis(SQLModel, table=True):
+    """Coach analysis returned to a user (history).
+
+    `session_fingerprint` identifies the analysed session + persona
+    (see services/analysis_history.session_fingerprint): reopening a
+    session shows the stored result instead of a new paid generation.
+
+    Indexes: (user_id, created_at) for the paginated per-user listing,
+    (user_id, session_fingerprint) for the lookup.
+    """
+
+    __table_args__ = (
+        Index("ix_analysis_user_created", "user_id", "created_at"),
+        Index("ix_analysis_user_fingerprint", "user_id", "session_fingerprint"),
+    )
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
+    user_id: str
+    session_fingerprint: str
+    prompt_variant: str
+    model: str
+    analysis: str
+    prompt_tokens: Optional[int] = Field(default=None)
+    completion_tokens: Optional[int] = Field(default=None)
+    created_at: datetime = Field(default_factory=_utc_now)
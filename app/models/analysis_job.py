@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+from typing import Optional
+import uuid
+
+from sqlmodel import SQLModel, Field
+
+
+def _utc_now() -> datetime:
+    """Naive UTC now (SQLite stores naive datetimes; utcnow is deprecated)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class AnalysisJob(SQLModel, table=True):
+    """Asynchronous coach analysis job (`POST /coach/jobs`).
+
+    The request payload is persisted as JSON so that pending jobs are
+    re-queued after a restart; the result (or the mapped error) is stored
+    on completion and survives restarts too.
+
+    status: pending → running → done | error
+
+    `heartbeat_at` is the lease of the worker running the job: refreshed
+    while it runs, so that another process only takes over a `running`
+    job once the lease has expired.
+    """
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
+    user_id: str = Field(index=True)
+    status: str = Field(default="pending", index=True)
+    request_json: str
+    analysis: Optional[str] = Field(default=None)
+    model: Optional[str] = Field(default=None)
+    cached: bool = Field(default=False)
+    prompt_tokens_estimated: Optional[int] = Field(default=None)
+    prompt_tokens: Optional[int] = Field(default=None)
+    completion_tokens: Optional[int] = Field(default=None)
+    error_status: Optional[int] = Field(default=None)
+    error_detail: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=_utc_now)
+    completed_at: Optional[datetime] = Field(default=None)
+    heartbeat_at: Optional[datetime] = Field(default=None)
@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+def _utc_now() -> datetime:
+    """Naive UTC now (SQLite stores naive datetimes; utcnow is deprecated)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class TokenUsage(SQLModel, table=True):
+    """Ledger row: one upstream Mistral call (success or failure).
+
+    Written in batches by services/usage_ledger. `status` is the HTTP status
+    the call resolved to (200, or the mapped error status). Token counts
+    come from Mistral's `usage` block (estimated for streamed analyses).
+    """
+
+    __table_args__ = (Index("ix_tokenusage_user_created", "user_id", "created_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: str
+    prompt_variant: str
+    model: str
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    latency_ms: int = Field(default=0)
+    status: int = Field(default=200)
+    created_at: datetime = Field(default_factory=_utc_now)
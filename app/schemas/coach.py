@@ -24,7 +24,118 @@ class AnalyzeSessionRequest(BaseModel):
     prompt_variant: str = "coach_neutre"
 
 
+class AnalysisUsage(BaseModel):
+    prompt_tokens_estimated: int  # estimation serveur avant envoi
+    prompt_tokens: Optional[int] = None  # décompte réel renvoyé par Mistral
+    completion_tokens: Optional[int] = None
+
+
 class AnalyzeSessionResponse(BaseModel):
     analysis: str
     model: str
     generated_at: datetime
+    # True si l'analyse provient du cache (aucun appel Mistral) ; champ additif.
+    cached: bool = False
+    usage: Optional[AnalysisUsage] = None
+    # Clé de l'historique (GET /coach/analyses/by-fingerprint/{...}).
+    session_fingerprint: Optional[str] = None
+
+
+class AnalysisError(BaseModel):
+    """Erreur d'une analyse non bloquante (job, élément de lot)."""
+    status_code: int
+    detail: str
+
+
+class AnalysisJobResponse(BaseModel):
+    id: str
+    status: str  # pending | running | done | error
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    result: Optional[AnalyzeSessionResponse] = None
+    error: Optional[AnalysisError] = None
+
+
+class AnalyzeSessionsRequest(BaseModel):
+    sessions: List[SessionIn] = Field(..., min_items=1)
+    prompt_variant: str = "coach_neutre"
+
+
+class AnalyzeSessionsItem(BaseModel):
+    index: int  # position dans `sessions`
+    result: Optional[AnalyzeSessionResponse] = None
+    error: Optional[AnalysisError] = None
+
+
+class AnalyzeSessionsResponse(BaseModel):
+    items: List[AnalyzeSessionsItem]
+
+
+class DistanceStats(BaseModel):
+    distance: Optional[float]
+    series_count: int
+    shot_count: int
+    points_per_shot: Optional[float]
+    group_size_mean_cm: Optional[float]
+
+
+class SessionStats(BaseModel):
+    series_count: int
+    shot_count: int
+    points_total: Optional[float]
+    points_per_shot: Optional[float]
+    group_size_mean_cm: Optional[float]
+    group_size_best_cm: Optional[float]
+    # Pente (cm par série) : négative = le groupement se resserre.
+    group_size_trend_cm_per_series: Optional[float]
+    distances: List[DistanceStats]
+
+
+class CrossSessionTrend(BaseModel):
+    session_count: int
+    points_per_shot_mean: Optional[float]
+    points_per_shot_trend: Optional[float]  # par séance, ordre chronologique
+    group_size_mean_cm: Optional[float]
+    group_size_trend_cm: Optional[float]  # par séance, ordre chronologique
+
+
+class SessionsStatsRequest(BaseModel):
+    sessions: List[SessionIn] = Field(..., min_items=1, max_items=200)
+
+
+class SessionsStatsResponse(BaseModel):
+    sessions: List[SessionStats]
+    trend: CrossSessionTrend
+
+
+class AnalysisRecord(BaseModel):
+    """Analyse de l'historique (GET /coach/analyses)."""
+    id: str
+    session_fingerprint: str
+    prompt_variant: str
+    model: str
+    analysis: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    created_at: datetime
+
+
+class AnalysisPage(BaseModel):
+    items: List[AnalysisRecord]
+    # Curseur opaque de la page suivante ; None en fin d'historique.
+    next_cursor: Optional[str] = None
+
+
+class UsageItem(BaseModel):
+    day: str  # AAAA-MM-JJ (UTC)
+    prompt_variant: str
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class UsageResponse(BaseModel):
+    """Consommation de l'utilisateur (GET /coach/usage)."""
+    daily_token_quota: Optional[int] = None  # None = illimité
+    tokens_today: int
+    items: List[UsageItem]
@@ -0,0 +1,174 @@
+"""Cache des analyses coach, adressé par contenu.
+
+Une même session ré-analysée (retour sur l'écran, retry, réinstallation)
+produit exactement le même prompt (`build_prompt` est déterministe) : on
+réutilise alors l'analyse déjà payée au lieu de rappeler Mistral.
+
+- Clé : SHA-256 du modèle + prompt final (`analysis_fingerprint`). Le
+  prompt intègre déjà la session normalisée et la variante ; un changement
+  de template invalide naturellement les entrées.
+- Niveau 1 : LRU en mémoire process, avec TTL.
+- Niveau 2 (optionnel) : SQLite persistant (`ANALYSIS_CACHE_SQLITE_PATH`),
+  survit aux redémarrages ; accédé hors event loop (`asyncio.to_thread`).
+"""
+import asyncio
+import hashlib
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from ..core.config import get_settings
+
+
+def analysis_fingerprint(prompt: str, model: str) -> str:
+    """Empreinte stable d'une analyse (modèle + prompt final)."""
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedAnalysis:
+    analysis: str
+    model: str
+    generated_at: datetime
+    # Usage Mistral de la génération d'origine (non refacturé sur un hit).
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+class AnalysisCache:
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        sqlite_path: Optional[str] = None,
+        enabled: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[float, CachedAnalysis]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._sqlite_ready = False
+
+    async def get(self, key: str) -> Optional[CachedAnalysis]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        item = self._entries.get(key)
+        if item is not None:
+            expires_at, entry = item
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+            del self._entries[key]
+
+        if self.sqlite_path:
+            found = await asyncio.to_thread(self._sqlite_get, key, now)
+            if found is not None:
+                expires_at, entry = found
+                self._remember(key, expires_at, entry)
+                self._hits += 1
+                return entry
+
+        self._misses += 1
+        return None
+
+    async def set(self, key: str, entry: CachedAnalysis) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, expires_at, entry)
+        if self.sqlite_path:
+            await asyncio.to_thread(self._sqlite_set, key, expires_at, entry)
+
+    def clear(self) -> None:
+        """Vide le niveau mémoire (le niveau SQLite est conservé)."""
+        self._entries.clear()
+        self._hits = 0
+        self._misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+    def _remember(self, key: str, expires_at: float, entry: CachedAnalysis) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (expires_at, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # -- SQLite tier (exécuté dans un thread) -------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.sqlite_path)
+        if not self._sqlite_ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                " key TEXT PRIMARY KEY, analysis TEXT NOT NULL, model TEXT NOT NULL,"
+                " generated_at TEXT NOT NULL, expires_at REAL NOT NULL,"
+                " prompt_tokens INTEGER, completion_tokens INTEGER)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_analysis_cache_expires_at"
+                " ON analysis_cache (expires_at)"
+            )
+            self._sqlite_ready = True
+        return conn
+
+    def _sqlite_get(self, key: str, now: float) -> Optional[Tuple[float, CachedAnalysis]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT analysis, model, generated_at, expires_at, prompt_tokens,"
+                " completion_tokens FROM analysis_cache"
+                " WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+        if row is None:
+            return None
+        analysis, model, generated_at, expires_at, prompt_tokens, completion_tokens = row
+        return expires_at, CachedAnalysis(
+            analysis=analysis,
+            model=model,
+            generated_at=datetime.fromisoformat(generated_at),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+
+    def _sqlite_set(self, key: str, expires_at: float, entry: CachedAnalysis) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, analysis, model, generated_at,"
+                " expires_at, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    entry.analysis,
+                    entry.model,
+                    entry.generated_at.isoformat(),
+                    expires_at,
+                    entry.prompt_tokens,
+                    entry.completion_tokens,
+                ),
+            )
+            # Purge opportuniste des entrées expirées.
+            conn.execute("DELETE FROM analysis_cache WHERE expires_at <= ?", (time.time(),))
+
+
+_settings = get_settings()
+analysis_cache = AnalysisCache(
+    max_entries=_settings.analysis_cache_max_entries,
+    ttl_seconds=_settings.analysis_cache_ttl_seconds,
+    sqlite_path=_settings.analysis_cache_sqlite_path,
+    enabled=_settings.analysis_cache_enabled,
+)
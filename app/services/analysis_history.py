@@ -0,0 +1,166 @@
+"""Historique des analyses coach (table `Analysis`).
+
+- `session_fingerprint` : empreinte canonique d'une séance + persona,
+  indépendante du modèle et du template (contrairement à la clé du cache).
+- `record_analysis` / `record_analysis_async` : persiste une analyse servie
+  à un utilisateur (sans doublon si la même analyse lui a déjà été servie) ;
+  variante `AsyncSession` pour les handlers asynchrones.
+- `list_analyses` : pagination par curseur (keyset) sur
+  (created_at, id) décroissants — coût constant quelle que soit la page.
+- `list_analyses_async` / `find_by_fingerprint_async` : mêmes requêtes sur
+  une `AsyncSession`.
+"""
+import base64
+import hashlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..models.analysis import Analysis
+from ..schemas.coach import SessionIn
+from .analysis_cache import CachedAnalysis
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+def session_fingerprint(session: SessionIn, prompt_variant: str) -> str:
+    """Empreinte stable d'une séance (JSON canonique, clés triées) + variante."""
+    canonical = session.json(sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{prompt_variant}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+def record_analysis(
+    session: Session,
+    user_id: str,
+    fingerprint: str,
+    prompt_variant: str,
+    entry: CachedAnalysis,
+) -> Analysis:
+    existing = session.exec(_existing(user_id, fingerprint, prompt_variant, entry)).first()
+    if existing is not None:
+        return existing
+
+    record = _new_record(user_id, fingerprint, prompt_variant, entry)
+    session.add(record)
+    session.commit()
+    session.refresh(record)
+    return record
+
+
+async def record_analysis_async(
+    session: AsyncSession,
+    user_id: str,
+    fingerprint: str,
+    prompt_variant: str,
+    entry: CachedAnalysis,
+) -> Analysis:
+    existing = (await session.exec(_existing(user_id, fingerprint, prompt_variant, entry))).first()
+    if existing is not None:
+        return existing
+
+    record = _new_record(user_id, fingerprint, prompt_variant, entry)
+    session.add(record)
+    await session.commit()
+    await session.refresh(record)
+    return record
+
+
+def _existing(user_id: str, fingerprint: str, prompt_variant: str, entry: CachedAnalysis):
+    return select(Analysis).where(
+        Analysis.user_id == user_id,
+        Analysis.session_fingerprint == fingerprint,
+        Analysis.prompt_variant == prompt_variant,
+        Analysis.analysis == entry.analysis,
+    )
+
+
+def _new_record(user_id: str, fingerprint: str, prompt_variant: str, entry: CachedAnalysis) -> Analysis:
+    return Analysis(
+        user_id=user_id,
+        session_fingerprint=fingerprint,
+        prompt_variant=prompt_variant,
+        model=entry.model,
+        analysis=entry.analysis,
+        prompt_tokens=entry.prompt_tokens,
+        completion_tokens=entry.completion_tokens,
+    )
+
+
+def _encode_cursor(record: Analysis) -> str:
+    raw = f"{record.created_at.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, record_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), record_id
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursorError("Curseur de pagination invalide") from e
+
+
+def list_analyses(
+    session: Session,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Analysis], Optional[str]]:
+    """Page d'historique, plus récentes d'abord.
+
+    Returns:
+        Tuple (analyses, next_cursor) — next_cursor None en fin de liste.
+
+    Raises:
+        InvalidCursorError: curseur illisible.
+    """
+    return _page(session.exec(_page_query(user_id, limit, cursor)).all(), limit)
+
+
+async def list_analyses_async(
+    session: AsyncSession,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Analysis], Optional[str]]:
+    return _page((await session.exec(_page_query(user_id, limit, cursor))).all(), limit)
+
+
+def find_by_fingerprint(session: Session, user_id: str, fingerprint: str) -> Optional[Analysis]:
+    """Analyse la plus récente de l'utilisateur pour cette séance."""
+    return session.exec(_latest(user_id, fingerprint)).first()
+
+
+async def find_by_fingerprint_async(session: AsyncSession, user_id: str, fingerprint: str) -> Optional[Analysis]:
+    return (await session.exec(_latest(user_id, fingerprint))).first()
+
+
+def _page_query(user_id: str, limit: int, cursor: Optional[str]):
+    query = select(Analysis).where(Analysis.user_id == user_id)
+    if cursor:
+        created_at, record_id = _decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Analysis.created_at < created_at,
+                and_(Analysis.created_at == created_at, Analysis.id < record_id),
+            )
+        )
+    return query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit + 1)  # type: ignore[attr-defined]
+
+
+def _page(rows, limit: int) -> Tuple[List[Analysis], Optional[str]]:
+    items = list(rows[:limit])
+    next_cursor = _encode_cursor(items[-1]) if len(rows) > limit else None
+    return items, next_cursor
+
+
+def _latest(user_id: str, fingerprint: str):
+    return (
+        select(Analysis)
+        .where(Analysis.user_id == user_id, Analysis.session_fingerprint == fingerprint)
+        .order_by(Analysis.created_at.desc())  # type: ignore[attr-defined]
+    )
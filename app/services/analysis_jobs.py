@@ -0,0 +1,341 @@
+"""Jobs d'analyse coach asynchrones (mode « job »).
+
+Une génération longue immobilise la requête et sa connexion jusqu'à
+`mistral_timeout_seconds` ; sur réseau mobile, la connexion tombe souvent
+avant la réponse et le résultat (payé) est perdu. En mode job :
+
+- `submit` persiste la demande (table `AnalysisJob`) et la met en file ;
+- un pool de workers asyncio de taille fixe exécute build_prompt +
+  pipeline d'analyse (cache, single-flight, Mistral) ;
+- le client récupère le résultat par long polling (`wait`).
+
+Tous les accès base passent par `asyncio.to_thread` (Session synchrone) ou
+une AsyncSession : rien ne bloque la boucle.
+
+Les jobs et leurs résultats vivent en base. Plusieurs process (workers
+uvicorn) peuvent partager la table :
+
+- un job est réclamé par un `UPDATE … WHERE status='pending'` conditionnel :
+  un seul process l'exécute, les autres l'ignorent ;
+- le process qui l'exécute rafraîchit un bail (`heartbeat_at`) ; un job
+  `running` n'est repris ailleurs qu'une fois le bail expiré
+  (`coach_job_lease_seconds`, process mort) ;
+- au démarrage puis à chaque bail, les jobs `pending` et `running` au bail
+  expiré sont remis en file ;
+- `wait` relit le job toutes les `poll_interval_seconds` : un job terminé
+  par un autre process réveille le long polling sans attendre le timeout
+  (l'événement local ne couvre que les jobs terminés ici).
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..core.config import get_settings
+from ..core.logging import get_logger
+from ..models.analysis_job import AnalysisJob
+from ..models.user import User
+from ..schemas.coach import AnalyzeSessionRequest
+from . import mistral_client
+from .coach_analysis import run_analysis
+from .database import async_engine, engine
+from .analysis_cache import CachedAnalysis
+from .analysis_history import record_analysis_async, session_fingerprint
+from .prompt_builder import UnknownPromptVariantError, build_prompt, estimate_tokens
+
+logger = get_logger("nextarget.jobs")
+
+FINAL_STATUSES = ("done", "error")
+
+
+def _now() -> datetime:
+    # Naïf-UTC, comme les autres dates persistées (SQLite).
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class AnalysisJobRunner:
+    def __init__(self, workers: int, lease_seconds: float = 60.0, poll_interval_seconds: float = 1.0):
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Un événement par long polling en cours, réveillé par `_finish`.
+        self._done_events: Dict[str, Set[asyncio.Event]] = {}
+        self._skipped = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Démarre les workers et remet en file les jobs interrompus. Idempotent."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self._recover):
+            self._queue.put_nowait(job_id)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"analysis-job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._recover_forever(), name="analysis-job-recovery"))
+
+    async def stop(self) -> None:
+        """Arrête les workers. Un job interrompu reste `running` en base et
+        sera repris (ici ou par un autre process) une fois son bail expiré."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, user_id: str, payload: AnalyzeSessionRequest) -> AnalysisJob:
+        """Persiste la demande et la met en file."""
+        job = await asyncio.to_thread(self._insert, user_id, payload.json())
+        if self._queue is not None:
+            self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: str, user_id: str) -> Optional[AnalysisJob]:
+        """Job de l'utilisateur, None s'il n'existe pas ou appartient à un autre."""
+        job = await asyncio.to_thread(self._load, job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    async def wait(self, job_id: str, user_id: str, timeout: float) -> Optional[AnalysisJob]:
+        """Long polling : rend le job dès qu'il est terminé, au plus après `timeout` s."""
+        # Événement créé *avant* la lecture : une fin de job locale entre les
+        # deux ne peut pas être manquée. Une fin ailleurs est vue à la
+        # relecture suivante (au plus `poll_interval_seconds` plus tard).
+        event = asyncio.Event()
+        self._done_events.setdefault(job_id, set()).add(event)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                job = await self.get(job_id, user_id)
+                remaining = deadline - loop.time()
+                if job is None or job.status in FINAL_STATUSES or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(remaining, self.poll_interval_seconds))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            events = self._done_events.get(job_id)
+            if events is not None:
+                events.discard(event)
+                if not events:
+                    del self._done_events[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "waiters": sum(len(events) for events in self._done_events.values()),
+            # Sortis de la file sans exécution : déjà terminés ou réclamés
+            # par un autre process.
+            "skipped": self._skipped,
+        }
+
+    # -- internals ------------------------------------------------------------
+    # Méthodes synchrones : appelées via asyncio.to_thread.
+
+    def _insert(self, user_id: str, request_json: str) -> AnalysisJob:
+        job = AnalysisJob(user_id=user_id, request_json=request_json)
+        with Session(engine, expire_on_commit=False) as session:
+            session.add(job)
+            session.commit()
+        return job
+
+    def _load(self, job_id: str) -> Optional[AnalysisJob]:
+        with Session(engine) as session:
+            return session.get(AnalysisJob, job_id)
+
+    def _load_user(self, user_id: str) -> Optional[User]:
+        with Session(engine) as session:
+            return session.get(User, user_id)
+
+    def _claimable(self, now: datetime):
+        """Job en attente, ou en cours dont le bail a expiré (process mort)."""
+        stale = now - timedelta(seconds=self.lease_seconds)
+        return or_(
+            AnalysisJob.status == "pending",
+            and_(
+                AnalysisJob.status == "running",
+                or_(AnalysisJob.heartbeat_at.is_(None), AnalysisJob.heartbeat_at < stale),  # type: ignore[union-attr]
+            ),
+        )
+
+    def _recover(self) -> List[str]:
+        with Session(engine) as session:
+            ids = list(session.exec(
+                select(AnalysisJob.id)
+                .where(self._claimable(_now()))
+                .order_by(AnalysisJob.created_at)
+            ).all())
+        if ids:
+            logger.info("analysis jobs recovered", extra={"count": len(ids)})
+        return ids
+
+    async def _recover_forever(self) -> None:
+        """Reprend périodiquement les jobs orphelins (bail expiré, job
+        `pending` d'un process arrêté). Un job déjà en file ici ou réclamé
+        ailleurs est simplement ignoré au moment de la réclamation."""
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                job_ids = await asyncio.to_thread(self._recover)
+            except Exception:
+                logger.exception("analysis job recovery failed")
+                continue
+            if self._queue is not None:
+                for job_id in job_ids:
+                    self._queue.put_nowait(job_id)
+
+    def _claim(self, job_id: str) -> Optional[Tuple[str, str]]:
+        """Passe le job à `running` si personne ne le détient (un seul
+        `UPDATE` conditionnel, atomique) ; (request_json, user_id) ou None."""
+        now = _now()
+        with Session(engine) as session:
+            result = session.exec(  # type: ignore[call-overload]
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id, self._claimable(now))
+                .values(status="running", heartbeat_at=now)
+            )
+            session.commit()
+            if result.rowcount != 1:
+                return None
+            job = session.get(AnalysisJob, job_id)
+            return job.request_json, job.user_id
+
+    def _heartbeat(self, job_id: str) -> None:
+        with Session(engine) as session:
+            session.exec(  # type: ignore[call-overload]
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id, AnalysisJob.status == "running")
+                .values(heartbeat_at=_now())
+            )
+            session.commit()
+
+    async def _keep_lease(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self._heartbeat, job_id)
+            except Exception:
+                logger.warning("analysis job heartbeat failed", extra={"job_id": job_id}, exc_info=True)
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            job_id = await queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("analysis job crashed", extra={"job_id": job_id})
+                await self._finish(job_id, error=(500, "Erreur interne du job d'analyse."))
+            finally:
+                queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        claimed = await asyncio.to_thread(self._claim, job_id)
+        if claimed is None:
+            # Terminé, inconnu, ou exécuté par un autre process.
+            self._skipped += 1
+            return
+        request_json, user_id = claimed
+        lease = asyncio.create_task(self._keep_lease(job_id), name=f"analysis-job-lease-{job_id}")
+        try:
+            await self._execute(job_id, request_json, user_id)
+        finally:
+            lease.cancel()
+            await asyncio.gather(lease, return_exceptions=True)
+
+    async def _execute(self, job_id: str, request_json: str, user_id: str) -> None:
+        user = await asyncio.to_thread(self._load_user, user_id)
+
+        start = time.perf_counter()
+        payload = AnalyzeSessionRequest.parse_raw(request_json)
+        try:
+            prompt = build_prompt(payload.session, payload.prompt_variant)
+            entry, cached = await run_analysis(prompt, user, payload.prompt_variant)
+        except UnknownPromptVariantError as e:
+            await self._finish(job_id, error=(422, str(e)))
+        except mistral_client.MistralClientError as e:
+            await self._finish(job_id, error=(e.status_code, e.message))
+        else:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                await record_analysis_async(
+                    session,
+                    user_id,
+                    session_fingerprint(payload.session, payload.prompt_variant),
+                    payload.prompt_variant,
+                    entry,
+                )
+            await self._finish(
+                job_id,
+                entry=entry,
+                cached=cached,
+                prompt_tokens_estimated=estimate_tokens(prompt),
+            )
+        logger.info(
+            "analysis job finished",
+            extra={"job_id": job_id, "duration_ms": round((time.perf_counter() - start) * 1000, 1)},
+        )
+
+    async def _finish(
+        self,
+        job_id: str,
+        entry: Optional[CachedAnalysis] = None,
+        cached: bool = False,
+        prompt_tokens_estimated: Optional[int] = None,
+        error: Optional[tuple] = None,
+    ) -> None:
+        await asyncio.to_thread(self._store_result, job_id, entry, cached, prompt_tokens_estimated, error)
+        for event in self._done_events.get(job_id, ()):
+            event.set()
+
+    def _store_result(
+        self,
+        job_id: str,
+        entry: Optional[CachedAnalysis],
+        cached: bool,
+        prompt_tokens_estimated: Optional[int],
+        error: Optional[tuple],
+    ) -> None:
+        with Session(engine) as session:
+            job = session.get(AnalysisJob, job_id)
+            if job is None:
+                return
+            if error is not None:
+                job.status = "error"
+                job.error_status, job.error_detail = error
+            elif entry is not None:
+                job.status = "done"
+                job.analysis = entry.analysis
+                job.model = entry.model
+                job.cached = cached
+                job.prompt_tokens_estimated = prompt_tokens_estimated
+                job.prompt_tokens = entry.prompt_tokens
+                job.completion_tokens = entry.completion_tokens
+            job.completed_at = _now()
+            session.add(job)
+            session.commit()
+
+
+_settings = get_settings()
+analysis_jobs = AnalysisJobRunner(
+    workers=_settings.coach_job_workers,
+    lease_seconds=_settings.coach_job_lease_seconds,
+    poll_interval_seconds=_settings.coach_job_poll_interval_seconds,
+)
@@ -0,0 +1,166 @@
+"""Cloison (bulkhead) de concurrence globale pour les appels sortants.
+
+`coach_rate_limiter` borne chaque utilisateur, mais rien ne bornait le
+nombre total d'appels Mistral simultanés : un pic de trafic ouvrait des
+centaines de sockets et déclenchait les 429 « compte entier » de Mistral
+pour tout le monde. Ici :
+
+- au plus `max_concurrency` appels en cours ;
+- au-delà, une file d'attente bornée (`max_queue`) ;
+- file pleine, ou attente > `max_wait_seconds` : rejet immédiat
+  (`BulkheadFullError`, traduit en 503 + Retry-After par l'API).
+
+Un slot libéré est transmis directement à un appel en attente (pas de
+dépassement par un nouvel arrivant). L'ordre de la file est équitable
+entre clés (utilisateurs) : file à pondération équitable (WFQ, étiquettes
+de fin virtuelles). Chaque appel d'une clé de poids w avance son étiquette
+de 1/w : un utilisateur qui enchaîne les analyses ne passe plus devant les
+autres, et un poids 2 obtient deux fois plus de slots sous contention.
+Sans clé, tous les appels partagent la même file : FIFO.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..core.config import get_settings
+
+
+class BulkheadFullError(Exception):
+    """Plus de capacité sortante : file pleine ou attente trop longue."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    def __init__(self, max_concurrency: int, max_queue: int, max_wait_seconds: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._active = 0
+        # Tas (étiquette de fin, ordre d'arrivée, attente, clé).
+        self._heap: List[Tuple[float, int, asyncio.Future, str]] = []
+        self._seq = itertools.count()
+        self._queued = 0
+        self._depth: Dict[str, int] = {}
+        self._last_finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._rejected = 0
+        self._waited = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.max_wait_seconds))
+
+    async def acquire(self, key: Optional[str] = None, weight: float = 1.0) -> None:
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+            return
+
+        if self._queued >= self.max_queue:
+            self._rejected += 1
+            raise BulkheadFullError("File d'attente sortante pleine.", self.retry_after)
+
+        waiter = self._enqueue(key or "", weight)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Slot transmis au moment même de l'abandon : on le rend.
+                self.release()
+            else:
+                self._discard(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._rejected += 1
+                raise BulkheadFullError("Attente sortante trop longue.", self.retry_after)
+            raise
+        finally:
+            waited = time.monotonic() - start
+            self._waited += 1
+            self._wait_seconds_total += waited
+            self._wait_seconds_max = max(self._wait_seconds_max, waited)
+
+    def try_acquire(self) -> bool:
+        """Slot immédiat ou rien (jamais de file) : pour les appels
+        opportunistes comme les requêtes couvertes."""
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        while self._heap:
+            finish, _, waiter, key = heapq.heappop(self._heap)
+            self._dequeued(key)
+            if not waiter.done():
+                self._virtual_time = finish
+                waiter.set_result(None)  # slot transmis, _active inchangé
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, key: Optional[str] = None, weight: float = 1.0) -> AsyncIterator[None]:
+        await self.acquire(key, weight)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": self._queued,
+            # Profondeur par utilisateur, agrégée (aucun identifiant exposé).
+            "queued_users": len(self._depth),
+            "max_user_queue_depth": max(self._depth.values(), default=0),
+            "rejected": self._rejected,
+            "waited": self._waited,
+            "wait_ms_avg": round(self._wait_seconds_total / self._waited * 1000, 1) if self._waited else 0.0,
+            "wait_ms_max": round(self._wait_seconds_max * 1000, 1),
+        }
+
+    def _enqueue(self, key: str, weight: float) -> "asyncio.Future":
+        start = max(self._virtual_time, self._last_finish.get(key, 0.0))
+        finish = start + 1.0 / max(weight, 1e-6)
+        self._last_finish[key] = finish
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (finish, next(self._seq), waiter, key))
+        self._queued += 1
+        self._depth[key] = self._depth.get(key, 0) + 1
+        return waiter
+
+    def _discard(self, waiter: "asyncio.Future") -> None:
+        for i, entry in enumerate(self._heap):
+            if entry[2] is waiter:
+                self._heap[i] = self._heap[-1]
+                self._heap.pop()
+                heapq.heapify(self._heap)
+                self._dequeued(entry[3])
+                return
+
+    def _dequeued(self, key: str) -> None:
+        self._queued -= 1
+        depth = self._depth[key] - 1
+        if depth:
+            self._depth[key] = depth
+        else:
+            del self._depth[key]
+            # Clé inactive : plus de crédit/dette de temps virtuel.
+            self._last_finish.pop(key, None)
+
+
+_settings = get_settings()
+mistral_bulkhead = Bulkhead(
+    max_concurrency=_settings.mistral_max_concurrency,
+    max_queue=_settings.mistral_max_queue,
+    max_wait_seconds=_settings.mistral_max_queue_wait_seconds,
+)
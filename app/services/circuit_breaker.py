@@ -0,0 +1,115 @@
+"""Disjoncteur (circuit breaker) pour un service amont.
+
+Après `failure_threshold` échecs consécutifs, le circuit s'ouvre : les
+appels sont refusés immédiatement (quelques µs) au lieu d'attendre chacun
+un timeout. Passé `reset_timeout_seconds`, un seul appel d'essai est
+autorisé (half-open) : succès ⇒ fermeture, échec ⇒ réouverture.
+
+Chaque transition est loggée (logger JSON applicatif) ; `stats()` expose
+l'état pour le monitoring.
+"""
+import math
+import time
+from typing import Dict, Optional
+
+from ..core.logging import get_logger
+
+logger = get_logger("nextarget.circuit")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Circuit ouvert : appel refusé sans solliciter l'amont."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_timeout_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._opened_count = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def before_call(self) -> None:
+        """À appeler avant chaque appel amont.
+
+        Raises:
+            CircuitOpenError: circuit ouvert (ou essai half-open déjà en cours).
+        """
+        if self._state == CLOSED:
+            return
+        if self._state == OPEN:
+            elapsed = time.monotonic() - (self._opened_at or 0.0)
+            if elapsed < self.reset_timeout_seconds:
+                self._reject(self.reset_timeout_seconds - elapsed)
+            self._transition(HALF_OPEN)
+        if self._trial_in_flight:
+            self._reject(1)
+        self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self._consecutive_failures = 0
+        self._trial_in_flight = False
+        if self._state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        self._trial_in_flight = False
+        if self._state == HALF_OPEN or (
+            self._state == CLOSED and self._consecutive_failures >= self.failure_threshold
+        ):
+            self._opened_at = time.monotonic()
+            self._opened_count += 1
+            self._transition(OPEN)
+
+    def release_trial(self) -> None:
+        """Appel d'essai terminé sans verdict (annulé, erreur non amont)."""
+        self._trial_in_flight = False
+
+    def reset(self) -> None:
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self._state,
+            "consecutive_failures": self._consecutive_failures,
+            "opened_count": self._opened_count,
+            "rejected": self._rejected,
+        }
+
+    def _reject(self, retry_after: float) -> None:
+        self._rejected += 1
+        raise CircuitOpenError(
+            f"Circuit {self.name} ouvert.", retry_after=max(1, math.ceil(retry_after))
+        )
+
+    def _transition(self, to_state: str) -> None:
+        logger.warning(
+            "circuit breaker transition",
+            extra={
+                "breaker": self.name,
+                "from_state": self._state,
+                "to_state": to_state,
+                "consecutive_failures": self._consecutive_failures,
+            },
+        )
+        self._state = to_state
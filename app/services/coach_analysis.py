@@ -0,0 +1,89 @@
+"""Pipeline d'analyse coach partagé par les endpoints (bufferisé, jobs).
+
+routage du modèle → cache (empreinte modèle + prompt) → single-flight →
+appel Mistral → mise en cache. L'appel amont passe toujours par
+`mistral_client.fetch_analysis` (point de mock unique dans les tests).
+"""
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from ..core.config import get_settings
+from ..models.user import User
+from . import mistral_client
+from .analysis_cache import CachedAnalysis, analysis_cache, analysis_fingerprint
+from .single_flight import analysis_flights
+from .usage_ledger import usage_ledger
+
+
+def user_weight(user: Optional[User]) -> float:
+    """Poids de l'utilisateur dans la file équitable vers Mistral
+    (`mistral_fair_queue_weights`, par `experience_level`)."""
+    if user is None or not user.experience_level:
+        return 1.0
+    return get_settings().fair_queue_weights.get(user.experience_level, 1.0)
+
+
+async def run_analysis(
+    prompt: str,
+    user: Optional[User] = None,
+    prompt_variant: str = "coach_neutre",
+) -> Tuple[CachedAnalysis, bool]:
+    """Analyse d'un prompt déjà construit, pour `user` (file équitable,
+    registre de consommation — un hit de cache ne coûte rien et n'y figure pas).
+
+    Returns:
+        Tuple (analyse, cached) — cached=True si servie depuis le cache.
+
+    Raises:
+        MistralClientError: échec de l'appel amont.
+    """
+    model = mistral_client.route_model(prompt)
+    fingerprint = analysis_fingerprint(prompt, model)
+    cached = await analysis_cache.get(fingerprint)
+    if cached is not None:
+        return cached, True
+
+    async def generate() -> CachedAnalysis:
+        start = time.perf_counter()
+        try:
+            # completion.model peut différer de `model` (repli sur timeout / 5xx).
+            completion = await mistral_client.fetch_analysis(
+                prompt,
+                model=model,
+                user_id=user.id if user else None,
+                weight=user_weight(user),
+            )
+        except mistral_client.MistralClientError as e:
+            if user is not None:
+                usage_ledger.record(
+                    user.id,
+                    prompt_variant,
+                    model,
+                    prompt_tokens=None,
+                    completion_tokens=None,
+                    latency_ms=round((time.perf_counter() - start) * 1000),
+                    status=e.status_code,
+                )
+            raise
+        if user is not None:
+            usage_ledger.record(
+                user.id,
+                prompt_variant,
+                completion.model,
+                completion.prompt_tokens,
+                completion.completion_tokens,
+                latency_ms=round((time.perf_counter() - start) * 1000),
+            )
+        entry = CachedAnalysis(
+            analysis=completion.content,
+            model=completion.model,
+            generated_at=datetime.now(timezone.utc),
+            prompt_tokens=completion.prompt_tokens,
+            completion_tokens=completion.completion_tokens,
+        )
+        await analysis_cache.set(fingerprint, entry)
+        return entry
+
+    # Requêtes identiques concurrentes (double tap, retry) : un seul appel amont.
+    return await analysis_flights.do(fingerprint, generate), False
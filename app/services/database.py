@@ -1,13 +1,45 @@
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from ..core.config import get_settings
 
 settings = get_settings()
 
 engine = create_engine(settings.database_url, echo=settings.debug, connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {})
 
+# Pilotes asynchrones par dialecte (URL sync inchangée dans la config).
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """URL de `url` avec le pilote asynchrone du dialecte (inchangée si un
+    pilote est déjà explicite, ex. `postgresql+asyncpg://`)."""
+    scheme, sep, rest = url.partition("://")
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def _create_async_engine(url: str):
+    try:
+        return create_async_engine(async_database_url(url), echo=settings.debug)
+    except ModuleNotFoundError as e:
+        # PostgreSQL : pilote asynchrone optionnel, absent de requirements.txt.
+        raise RuntimeError(
+            f"DATABASE_URL ({url.partition('://')[0]}) requiert le pilote asynchrone "
+            f"'{e.name}' (pip install {e.name}), voir .env.example."
+        ) from e
+
+
+# Moteur asynchrone (handlers `async def` : aucune requête SQL ne bloque la
+# boucle). Le moteur sync reste utilisé par init_db, les tâches de fond
+# (to_thread) et les tests.
+async_engine = _create_async_engine(settings.database_url)
+
 # Ensure models imported so metadata includes all tables
 from ..models.user import User  # noqa: F401
 from ..models.refresh_token import RefreshToken  # noqa: F401
+from ..models.analysis_job import AnalysisJob  # noqa: F401
+from ..models.analysis import Analysis  # noqa: F401
+from ..models.token_usage import TokenUsage  # noqa: F401
 
 def init_db() -> None:
     SQLModel.metadata.create_all(engine)
@@ -16,3 +48,10 @@ def init_db() -> None:
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session():
+    # expire_on_commit=False : les objets restent lisibles après commit sans
+    # rechargement implicite (impossible hors greenlet en asynchrone).
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,207 @@
+"""Vérification locale des id_token Google, clés JWKS en cache.
+
+`id_token.verify_oauth2_token(..., google_requests.Request())` téléchargeait
+les certificats Google à chaque login, en `requests` bloquant sur la boucle
+asyncio. Ici :
+
+- les clés publiques (JWKS, `GOOGLE_JWKS_URL`) sont récupérées en httpx
+  asynchrone (client partagé, services/oauth_http) et gardées le temps indiqué par `Cache-Control: max-age` de la
+  réponse ;
+- une tâche de fond (start/stop, cycle de vie de l'app) les rafraîchit
+  avant expiration ; une requête ne télécharge que si le cache est froid ou
+  expiré, ou si le `kid` est inconnu (rotation, au plus une fois par
+  `MIN_REFRESH_INTERVAL_SECONDS`) ;
+- la signature RS256 et les claims (exp/iat, aud, iss) sont vérifiés
+  localement (quelques centaines de µs de CPU, aucune E/S).
+"""
+import asyncio
+import base64
+import json
+import re
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import rsa
+from google.auth import crypt
+
+from ..core.logging import get_logger
+from ..core.oauth_config import GOOGLE_ISSUERS, GOOGLE_JWKS_URL
+from . import oauth_http
+
+logger = get_logger("nextarget.oauth")
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class InvalidIdToken(ValueError):
+    """id_token refusé (format, signature, claims) ou clés indisponibles."""
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _b64int(data: str) -> int:
+    return int.from_bytes(_b64decode(data), "big")
+
+
+class GoogleKeyCache:
+    # Durée de cache si la réponse n'a pas de max-age exploitable.
+    DEFAULT_MAX_AGE_SECONDS = 3600
+    # Rafraîchissement de fond quand il reste moins que cette part du TTL.
+    REFRESH_MARGIN_RATIO = 0.1
+    # Délai minimal entre deux téléchargements déclenchés par un kid inconnu.
+    MIN_REFRESH_INTERVAL_SECONDS = 30.0
+    # Nouvel essai de la tâche de fond après un échec.
+    RETRY_SECONDS = 30.0
+
+    def __init__(self, url: str = GOOGLE_JWKS_URL):
+        self.url = url
+        self._verifiers: Dict[str, crypt.Verifier] = {}
+        self._fetched_at = 0.0
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._fetches = 0
+        self._failures = 0
+
+    async def start(self) -> None:
+        """Démarre le rafraîchissement de fond (premier chargement inclus). Idempotent."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresher(), name="google-jwks-refresher")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def get_verifier(self, kid: str) -> crypt.Verifier:
+        """Vérifieur de la clé `kid` ; télécharge seulement si nécessaire."""
+        verifier = self._verifiers.get(kid)
+        if verifier is not None and time.monotonic() < self._expires_at:
+            return verifier
+        async with self._lock:
+            now = time.monotonic()
+            stale = now >= self._expires_at
+            # Kid inconnu avec un cache frais : rotation possible, mais pas
+            # de téléchargement à chaque jeton forgé.
+            if stale or (kid not in self._verifiers and now - self._fetched_at >= self.MIN_REFRESH_INTERVAL_SECONDS):
+                await self._fetch()
+        verifier = self._verifiers.get(kid)
+        if verifier is None:
+            raise InvalidIdToken(f"Unknown key id: {kid}")
+        return verifier
+
+    def reset(self) -> None:
+        self._verifiers = {}
+        self._fetched_at = 0.0
+        self._expires_at = 0.0
+        self._fetches = 0
+        self._failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._verifiers),
+            "fresh": time.monotonic() < self._expires_at,
+            "fetches": self._fetches,
+            "failures": self._failures,
+        }
+
+    # -- internals ------------------------------------------------------------
+
+    async def _fetch(self) -> None:
+        self._fetches += 1
+        try:
+            with oauth_http.timed("google", "jwks_fetch"):
+                response = await oauth_http.get_client("google").get(self.url)
+            if response.status_code != 200:
+                raise InvalidIdToken(f"JWKS fetch failed: HTTP {response.status_code}")
+            body = response.json()
+            keys = body.get("keys") if isinstance(body, dict) else None
+            if not isinstance(keys, list):
+                raise InvalidIdToken("JWKS fetch failed: no key list in response")
+            verifiers = {
+                key["kid"]: crypt.RSAVerifier.from_string(
+                    rsa.PublicKey(_b64int(key["n"]), _b64int(key["e"])).save_pkcs1()
+                )
+                for key in keys
+                if isinstance(key, dict) and key.get("kty") == "RSA"
+            }
+        except InvalidIdToken:
+            self._failures += 1
+            raise
+        except (httpx.HTTPError, KeyError, TypeError, ValueError) as e:
+            self._failures += 1
+            raise InvalidIdToken(f"JWKS fetch failed: {e}") from e
+        match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else self.DEFAULT_MAX_AGE_SECONDS
+        now = time.monotonic()
+        self._verifiers = verifiers
+        self._fetched_at = now
+        self._expires_at = now + max_age
+
+    async def _refresher(self) -> None:
+        while True:
+            ttl = self._expires_at - self._fetched_at
+            delay = self._expires_at - ttl * self.REFRESH_MARGIN_RATIO - time.monotonic()
+            if self._fetched_at:
+                # max-age nul ou minuscule : pas de boucle de téléchargements.
+                delay = max(delay, self.MIN_REFRESH_INTERVAL_SECONDS)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                async with self._lock:
+                    await self._fetch()
+            except Exception:
+                # La tâche ne doit jamais mourir : nouvel essai plus tard.
+                logger.warning("google jwks refresh failed", exc_info=True)
+                await asyncio.sleep(self.RETRY_SECONDS)
+
+
+google_keys = GoogleKeyCache()
+
+
+async def verify_id_token(
+    token: str,
+    audience: str,
+    keys: GoogleKeyCache = google_keys,
+    clock_skew_seconds: int = 10,
+) -> Dict[str, Any]:
+    """Vérifie un id_token Google (RS256) et renvoie ses claims.
+
+    Raises:
+        InvalidIdToken: jeton malformé, signature invalide, expiré, mauvaise
+            audience ou mauvais émetteur ; clés Google indisponibles.
+    """
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        claims = json.loads(_b64decode(payload_b64))
+        signature = _b64decode(signature_b64)
+    except ValueError as e:
+        raise InvalidIdToken("Malformed token") from e
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise InvalidIdToken("Malformed token")
+    if header.get("alg") != "RS256":
+        raise InvalidIdToken(f"Unsupported algorithm: {header.get('alg')}")
+
+    kid = header.get("kid", "")
+    if not isinstance(kid, str):
+        raise InvalidIdToken("Invalid key id")
+    verifier = await keys.get_verifier(kid)
+    if not verifier.verify(f"{header_b64}.{payload_b64}".encode(), signature):
+        raise InvalidIdToken("Invalid signature")
+
+    now = time.time()
+    if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] + clock_skew_seconds < now:
+        raise InvalidIdToken("Token expired")
+    if isinstance(claims.get("iat"), (int, float)) and claims["iat"] - clock_skew_seconds > now:
+        raise InvalidIdToken("Token used too early")
+    aud = claims.get("aud")
+    if aud != audience and not (isinstance(aud, list) and audience in aud):
+        raise InvalidIdToken("Invalid audience")
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise InvalidIdToken("Invalid issuer")
+    return claims
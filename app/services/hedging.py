@@ -0,0 +1,102 @@
+"""Requêtes « couvertes » (hedging) contre la latence de queue.
+
+Quelques générations Mistral anormalement lentes font le p99 de
+`/coach/analyze-session`. Si l'appel principal n'a pas répondu après le
+percentile `percentile` des latences récentes (mesuré en continu), une
+seconde requête identique part ; la première réponse réussie l'emporte,
+l'autre est annulée.
+
+Garde-fous :
+- budget : chaque appel principal crédite `budget_ratio` jeton, une
+  couverture en coûte un (≈ 5 % d'appels en plus au maximum, rafale
+  bornée par `burst`) ;
+- pas de couverture tant que la fenêtre compte moins de `min_samples`
+  mesures ;
+- la couverture ne fait jamais la queue dans la cloison globale : sans
+  slot libre immédiatement, elle n'est pas envoyée (décision de
+  l'appelant, voir mistral_client).
+"""
+import math
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class Hedger:
+    def __init__(
+        self,
+        percentile: float,
+        budget_ratio: float,
+        min_samples: int,
+        window: int = 256,
+        burst: float = 5.0,
+    ):
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.min_samples = min_samples
+        self.burst = burst
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._tokens = 0.0
+        self._primary_calls = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._skipped_budget = 0
+        self._skipped_capacity = 0
+
+    def record_latency(self, seconds: float) -> None:
+        """Latence d'un appel amont réussi, mesurée depuis le départ de
+        l'appel principal (même quand la couverture l'emporte)."""
+        self._latencies.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Délai avant couverture pour un nouvel appel principal.
+
+        Crédite le budget ; None si la fenêtre est encore trop courte.
+        """
+        self._primary_calls += 1
+        self._tokens = min(self.burst, self._tokens + self.budget_ratio)
+        if len(self._latencies) < self.min_samples:
+            return None
+        return self._quantile()
+
+    def try_spend(self) -> bool:
+        """Réserve le budget d'une couverture ; False si épuisé."""
+        if self._tokens < 1.0:
+            self._skipped_budget += 1
+            return False
+        self._tokens -= 1.0
+        self._hedges += 1
+        return True
+
+    def refund(self) -> None:
+        """Couverture réservée mais non envoyée (pas de slot libre)."""
+        self._tokens = min(self.burst, self._tokens + 1.0)
+        self._hedges -= 1
+        self._skipped_capacity += 1
+
+    def record_win(self) -> None:
+        self._hedge_wins += 1
+
+    def reset(self) -> None:
+        self._latencies.clear()
+        self._tokens = 0.0
+        self._primary_calls = self._hedges = self._hedge_wins = 0
+        self._skipped_budget = self._skipped_capacity = 0
+
+    def stats(self) -> Dict[str, float]:
+        threshold = self._quantile() if self._latencies else None
+        return {
+            "primary_calls": self._primary_calls,
+            "hedges": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "hedge_rate": round(self._hedges / self._primary_calls, 4) if self._primary_calls else 0.0,
+            "skipped_budget": self._skipped_budget,
+            "skipped_capacity": self._skipped_capacity,
+            "threshold_ms": round(threshold * 1000, 1) if threshold is not None else None,
+            "samples": len(self._latencies),
+        }
+
+    def _quantile(self) -> float:
+        # Méthode « nearest rank » sur la fenêtre (≤ quelques centaines de points).
+        ordered = sorted(self._latencies)
+        rank = max(1, math.ceil(self.percentile / 100 * len(ordered)))
+        return ordered[rank - 1]
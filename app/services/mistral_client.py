@@ -3,58 +3,359 @@
 Équivalent serveur de l'ancien CoachAnalysisService.fetchAnalysis
 côté app (lib/services/coach_analysis_service.dart). La clé API
 Mistral ne quitte jamais le serveur.
+
+Un seul `httpx.AsyncClient` est partagé par tout le process (pool de
+connexions keep-alive) : ouvert au démarrage de l'app (`open_client`),
+fermé à l'arrêt (`close_client`). Sans lifespan (tests, scripts), il est
+créé paresseusement au premier appel.
 """
+import asyncio
+import importlib.util
+import json
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional
+
 import httpx
 
 from ..core.config import get_settings
+from ..core.logging import get_logger
+from .bulkhead import BulkheadFullError, mistral_bulkhead
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .hedging import Hedger
+from .prompt_builder import estimate_tokens
+
+logger = get_logger("nextarget.mistral")
+
+_client: Optional[httpx.AsyncClient] = None
+
+_settings = get_settings()
+mistral_breaker = CircuitBreaker(
+    "mistral",
+    failure_threshold=_settings.mistral_breaker_failure_threshold,
+    reset_timeout_seconds=_settings.mistral_breaker_reset_seconds,
+)
+mistral_hedger = Hedger(
+    percentile=_settings.mistral_hedge_percentile,
+    budget_ratio=_settings.mistral_hedge_budget_ratio,
+    min_samples=_settings.mistral_hedge_min_samples,
+)
 
 
 class MistralClientError(Exception):
     """Erreur générique lors de l'appel à Mistral (message user-friendly)."""
 
-    def __init__(self, message: str, status_code: int = 502):
+    def __init__(
+        self,
+        message: str,
+        status_code: int = 502,
+        retry_after: Optional[int] = None,
+        transient: bool = False,
+    ):
         super().__init__(message)
         self.message = message
         self.status_code = status_code
+        # Délai conseillé (s) avant nouvel essai, renvoyé en header Retry-After.
+        self.retry_after = retry_after
+        # Échec passager (429, 5xx, timeout, réseau) : éligible au retry.
+        self.transient = transient
+
+
+@dataclass(frozen=True)
+class MistralCompletion:
+    """Réponse Mistral utile au serveur : texte + modèle + usage (tokens)."""
+
+    content: str
+    model: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+class ModelStats:
+    """Appels amont par modèle (succès, échecs, latence) pour régler le routage."""
+
+    def __init__(self):
+        self._models: Dict[str, Dict[str, float]] = {}
+        self.fallbacks = 0
+
+    def record(self, model: str, ok: bool, seconds: float) -> None:
+        entry = self._models.setdefault(
+            model, {"calls": 0, "successes": 0, "latency_total": 0.0, "latency_max": 0.0}
+        )
+        entry["calls"] += 1
+        if ok:
+            entry["successes"] += 1
+            entry["latency_total"] += seconds
+            entry["latency_max"] = max(entry["latency_max"], seconds)
+
+    def reset(self) -> None:
+        self._models.clear()
+        self.fallbacks = 0
+
+    def stats(self) -> dict:
+        models = {}
+        for model, entry in self._models.items():
+            successes = entry["successes"]
+            models[model] = {
+                "calls": entry["calls"],
+                "successes": successes,
+                "success_rate": round(successes / entry["calls"], 4),
+                "latency_ms_avg": round(entry["latency_total"] / successes * 1000, 1) if successes else None,
+                "latency_ms_max": round(entry["latency_max"] * 1000, 1),
+            }
+        return {"models": models, "fallbacks": self.fallbacks}
 
 
-async def fetch_analysis(prompt: str) -> str:
+mistral_model_stats = ModelStats()
+
+
+def route_model(prompt: str) -> str:
+    """Modèle à utiliser pour ce prompt (routage par taille).
+
+    Séance courte (prompt ≤ `mistral_small_model_max_prompt_tokens` tokens
+    estimés) → `mistral_small_model` s'il est configuré ; sinon le modèle
+    principal.
+    """
     settings = get_settings()
+    if (
+        settings.mistral_small_model
+        and estimate_tokens(prompt) <= settings.mistral_small_model_max_prompt_tokens
+    ):
+        return settings.mistral_small_model
+    return settings.mistral_model
+
+
+def _build_client() -> httpx.AsyncClient:
+    settings = get_settings()
+    http2 = settings.mistral_http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("mistral http2 disabled: package 'h2' not installed")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(
+            settings.mistral_timeout_seconds,
+            connect=settings.mistral_connect_timeout_seconds,
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.mistral_pool_max_connections,
+            max_keepalive_connections=settings.mistral_pool_max_keepalive,
+            keepalive_expiry=settings.mistral_keepalive_expiry_seconds,
+        ),
+    )
+
+
+async def open_client() -> None:
+    """Ouvre le client partagé (startup de l'app). Idempotent."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+
+
+async def close_client() -> None:
+    """Ferme le client partagé et ses connexions (shutdown de l'app)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Client partagé, créé à la demande si le startup n'a pas eu lieu."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+def pool_stats() -> dict:
+    """État du pool de connexions vers Mistral (monitoring).
 
+    - active : connexions portant une requête en cours ;
+    - idle : connexions keep-alive disponibles (réutilisables sans TLS) ;
+    - waiting : requêtes en attente d'une connexion (pool saturé).
+
+    Lit des attributs privés de httpx/httpcore : si une version les
+    renomme, les compteurs valent None (jamais d'exception).
+    """
+    stats = {
+        "open": _client is not None and not _client.is_closed,
+        "active": 0,
+        "idle": 0,
+        "waiting": 0,
+    }
+    if not stats["open"]:
+        return stats
+    # httpx n'expose pas le pool publiquement : lecture défensive.
+    try:
+        pool = _client._transport._pool  # type: ignore[union-attr]
+        connections = list(pool.connections)
+        idle = sum(1 for c in connections if c.is_idle())
+        waiting = sum(1 for r in pool._requests if r.is_queued())
+    except Exception:
+        return {**stats, "active": None, "idle": None, "waiting": None}
+    stats.update(active=len(connections) - idle, idle=idle, waiting=waiting)
+    return stats
+
+
+def _request_headers(api_key: str) -> dict:
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+
+
+def _require_api_key() -> str:
+    settings = get_settings()
     if not settings.mistral_api_key:
         raise MistralClientError(
             "Clé API Mistral absente côté serveur (MISTRAL_API_KEY).", status_code=500
         )
+    return settings.mistral_api_key
 
-    url = f"{settings.mistral_api_base}/chat/completions"
 
+def _overloaded(e: BulkheadFullError) -> MistralClientError:
+    return MistralClientError(
+        "Coach IA surchargé, réessayez dans quelques instants.",
+        status_code=503,
+        retry_after=e.retry_after,
+    )
+
+
+def _circuit_open(e: CircuitOpenError) -> MistralClientError:
+    return MistralClientError(
+        "Coach IA temporairement indisponible, réessayez plus tard.",
+        status_code=503,
+        retry_after=e.retry_after,
+    )
+
+
+def _timeout_error() -> MistralClientError:
+    return MistralClientError("Le modèle ne répond pas (timeout).", status_code=504, transient=True)
+
+
+def _network_error(e: Exception) -> MistralClientError:
+    return MistralClientError(f"Erreur réseau vers Mistral: {e}", status_code=502, transient=True)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[int]:
+    """Header Retry-After amont : délai en secondes ou date HTTP."""
+    if not value:
+        return None
     try:
-        async with httpx.AsyncClient(timeout=settings.mistral_timeout_seconds) as client:
-            response = await client.post(
-                url,
-                headers={
-                    "Authorization": f"Bearer {settings.mistral_api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": settings.mistral_model,
-                    "messages": [{"role": "user", "content": prompt}],
-                },
-            )
-    except httpx.TimeoutException:
-        raise MistralClientError("Le modèle ne répond pas (timeout).", status_code=504)
-    except httpx.RequestError as e:
-        raise MistralClientError(f"Erreur réseau vers Mistral: {e}", status_code=502)
+        return max(0, int(float(value)))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, int((when - datetime.now(timezone.utc)).total_seconds()))
+
 
+def _raise_for_status(response: httpx.Response) -> None:
+    """Traduit un statut HTTP Mistral en MistralClientError (message user-friendly)."""
     if response.status_code == 401:
         raise MistralClientError("Clé API Mistral invalide côté serveur.", status_code=500)
     if response.status_code == 429:
-        raise MistralClientError("Trop de requêtes vers Mistral, réessayez plus tard.", status_code=429)
+        raise MistralClientError(
+            "Trop de requêtes vers Mistral, réessayez plus tard.",
+            status_code=429,
+            retry_after=_parse_retry_after(response.headers.get("Retry-After")),
+            transient=True,
+        )
     if response.status_code >= 500:
-        raise MistralClientError(f"Erreur serveur Mistral ({response.status_code}).", status_code=502)
+        raise MistralClientError(
+            f"Erreur serveur Mistral ({response.status_code}).",
+            status_code=502,
+            retry_after=_parse_retry_after(response.headers.get("Retry-After")),
+            transient=True,
+        )
     if response.status_code < 200 or response.status_code >= 300:
         raise MistralClientError(f"Erreur HTTP Mistral ({response.status_code}).", status_code=502)
 
+
+def _record_outcome(e: MistralClientError) -> None:
+    """Verdict du disjoncteur pour un appel amont terminé en erreur.
+
+    Seules les pannes (5xx, timeout, réseau) comptent comme échec ; un 429
+    se gère par Retry-After, une erreur 4xx prouve que Mistral répond.
+    """
+    if e.transient and e.status_code != 429:
+        mistral_breaker.record_failure()
+    else:
+        mistral_breaker.record_success()
+
+
+def _retry_delay(e: MistralClientError, attempt: int, deadline: float) -> Optional[float]:
+    """Délai avant le prochain essai, None si on abandonne.
+
+    Backoff exponentiel « full jitter » ; un Retry-After amont prime. On
+    n'attend jamais au-delà de l'échéance globale de l'appel.
+    """
+    settings = get_settings()
+    if not e.transient or attempt >= settings.mistral_max_retries:
+        return None
+    if e.retry_after is not None:
+        delay = float(e.retry_after)
+    else:
+        cap = min(
+            settings.mistral_retry_max_delay_seconds,
+            settings.mistral_retry_base_delay_seconds * (2 ** attempt),
+        )
+        delay = random.uniform(0, cap)
+    if time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+async def _send(
+    prompt: str, api_key: str, timeout: float, model: str, record_latency: bool = True
+) -> MistralCompletion:
+    """Un aller-retour HTTP vers Mistral (slot de cloison déjà acquis), mesuré.
+
+    `record_latency=False` : la fenêtre du hedger est alimentée par
+    l'appelant (`_send_hedged`).
+    """
+    start = time.monotonic()
+    try:
+        completion = await _request(prompt, api_key, timeout, model)
+    except MistralClientError:
+        mistral_model_stats.record(model, ok=False, seconds=time.monotonic() - start)
+        raise
+    elapsed = time.monotonic() - start
+    mistral_model_stats.record(model, ok=True, seconds=elapsed)
+    if record_latency:
+        mistral_hedger.record_latency(elapsed)
+    return completion
+
+
+async def _request(prompt: str, api_key: str, timeout: float, model: str) -> MistralCompletion:
+    settings = get_settings()
+    url = f"{settings.mistral_api_base}/chat/completions"
+    try:
+        response = await get_client().post(
+            url,
+            headers=_request_headers(api_key),
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+            },
+            timeout=httpx.Timeout(
+                min(settings.mistral_timeout_seconds, timeout),
+                connect=settings.mistral_connect_timeout_seconds,
+            ),
+        )
+    except httpx.TimeoutException:
+        raise _timeout_error()
+    except httpx.RequestError as e:
+        raise _network_error(e)
+
+    _raise_for_status(response)
+
     data = response.json()
     try:
         content = data["choices"][0]["message"]["content"]
@@ -64,4 +365,250 @@ async def fetch_analysis(prompt: str) -> str:
     if not content or not str(content).strip():
         raise MistralClientError("Réponse vide du modèle.", status_code=502)
 
-    return content
+    usage = data.get("usage") if isinstance(data.get("usage"), dict) else {}
+    return MistralCompletion(
+        content=content,
+        model=data.get("model") or model,
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+    )
+
+
+async def _post_once(
+    prompt: str,
+    api_key: str,
+    timeout: float,
+    model: str,
+    user_id: Optional[str] = None,
+    weight: float = 1.0,
+) -> MistralCompletion:
+    if timeout <= 0:
+        raise _timeout_error()
+    async with mistral_bulkhead.slot(key=user_id, weight=weight):
+        if get_settings().mistral_hedge_enabled:
+            return await _send_hedged(prompt, api_key, timeout, model)
+        return await _send(prompt, api_key, timeout, model)
+
+
+async def _send_hedged(prompt: str, api_key: str, timeout: float, model: str) -> MistralCompletion:
+    """Appel principal + couverture éventuelle (voir services/hedging).
+
+    La première réponse réussie l'emporte, l'autre requête est annulée ;
+    si les deux échouent, l'erreur de l'appel principal est remontée.
+
+    Latence enregistrée : durée depuis le départ de l'appel principal
+    jusqu'à la première réponse réussie. Quand la couverture gagne, c'est
+    un minorant de la latence du principal annulé ; mesurer la couverture
+    depuis son propre départ (ou ignorer le principal) retirerait de la
+    fenêtre exactement la queue de distribution qui fixe le seuil.
+    """
+    start = time.monotonic()
+    completion = await _race_hedge(prompt, api_key, timeout, model)
+    mistral_hedger.record_latency(time.monotonic() - start)
+    return completion
+
+
+async def _race_hedge(prompt: str, api_key: str, timeout: float, model: str) -> MistralCompletion:
+    primary = asyncio.ensure_future(_send(prompt, api_key, timeout, model, record_latency=False))
+    hedge: Optional[asyncio.Future] = None
+    try:
+        delay = mistral_hedger.hedge_delay()
+        if delay is None or delay >= timeout:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        if not mistral_hedger.try_spend():
+            return await primary
+        if not mistral_bulkhead.try_acquire():
+            mistral_hedger.refund()
+            return await primary
+        hedge = asyncio.ensure_future(_send_in_acquired_slot(prompt, api_key, timeout - delay, model))
+        logger.info("mistral hedge sent", extra={"after_ms": round(delay * 1000)})
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        mistral_hedger.record_win()
+                    return task.result()
+        return primary.result()
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+        await asyncio.gather(*(t for t in (primary, hedge) if t is not None), return_exceptions=True)
+
+
+async def _send_in_acquired_slot(prompt: str, api_key: str, timeout: float, model: str) -> MistralCompletion:
+    try:
+        return await _send(prompt, api_key, timeout, model, record_latency=False)
+    finally:
+        mistral_bulkhead.release()
+
+
+def _fallback_for(e: MistralClientError, model: str) -> Optional[str]:
+    """Modèle de repli après un timeout / 5xx / erreur réseau (pas un 429)."""
+    fallback = get_settings().mistral_fallback_model
+    if fallback and fallback != model and e.transient and e.status_code != 429:
+        return fallback
+    return None
+
+
+async def fetch_analysis(
+    prompt: str,
+    model: Optional[str] = None,
+    user_id: Optional[str] = None,
+    weight: float = 1.0,
+) -> MistralCompletion:
+    """Appel Mistral bufferisé, résilient aux échecs passagers.
+
+    - `model` : modèle demandé (par défaut `route_model(prompt)`).
+    - `user_id` / `weight` : place dans la file équitable de la cloison
+      (voir services/bulkhead).
+    - timeout / 5xx / erreur réseau : bascule immédiate (une fois) sur
+      `mistral_fallback_model` s'il est configuré ; le modèle réellement
+      utilisé est celui de la `MistralCompletion` rendue.
+    - 429 / 5xx / timeout / erreur réseau : nouvel essai (backoff
+      exponentiel avec jitter, ou Retry-After amont), dans la limite de
+      `mistral_max_retries` et de l'échéance `mistral_retry_deadline_seconds`.
+    - Disjoncteur : après N pannes consécutives, refus immédiat (503)
+      jusqu'à l'essai suivant.
+    """
+    settings = get_settings()
+    api_key = _require_api_key()
+    model = model or route_model(prompt)
+    deadline = time.monotonic() + settings.mistral_retry_deadline_seconds
+    attempt = 0
+
+    while True:
+        try:
+            mistral_breaker.before_call()
+        except CircuitOpenError as e:
+            raise _circuit_open(e)
+
+        try:
+            completion = await _post_once(
+                prompt,
+                api_key,
+                timeout=deadline - time.monotonic(),
+                model=model,
+                user_id=user_id,
+                weight=weight,
+            )
+        except BulkheadFullError as e:
+            mistral_breaker.release_trial()
+            raise _overloaded(e)
+        except MistralClientError as e:
+            _record_outcome(e)
+            fallback = _fallback_for(e, model)
+            if fallback is not None and time.monotonic() < deadline:
+                logger.info(
+                    "mistral fallback",
+                    extra={"from_model": model, "to_model": fallback, "status": e.status_code},
+                )
+                mistral_model_stats.fallbacks += 1
+                model = fallback
+                continue
+            delay = _retry_delay(e, attempt, deadline)
+            if delay is None:
+                raise
+            attempt += 1
+            logger.info(
+                "mistral retry",
+                extra={"attempt": attempt, "status": e.status_code, "delay_ms": round(delay * 1000)},
+            )
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            mistral_breaker.release_trial()
+            raise
+
+        mistral_breaker.record_success()
+        return completion
+
+
+def breaker_stats() -> dict:
+    return mistral_breaker.stats()
+
+
+def hedging_stats() -> dict:
+    return mistral_hedger.stats()
+
+
+def model_stats() -> dict:
+    return mistral_model_stats.stats()
+
+
+async def stream_analysis(
+    prompt: str,
+    model: Optional[str] = None,
+    user_id: Optional[str] = None,
+    weight: float = 1.0,
+) -> AsyncIterator[str]:
+    """Variante streaming (`stream=true`) : produit les fragments de texte
+    au fil de la génération, avec le modèle `model` (défaut : routage).
+    Pas de repli de modèle : le flux a pu commencer.
+
+    Mêmes erreurs que `fetch_analysis` (MistralClientError), levées au
+    premier `__anext__` pour un échec HTTP, ou en cours de flux pour une
+    coupure réseau.
+    """
+    settings = get_settings()
+    api_key = _require_api_key()
+    url = f"{settings.mistral_api_base}/chat/completions"
+    model = model or route_model(prompt)
+
+    try:
+        mistral_breaker.before_call()
+    except CircuitOpenError as e:
+        raise _circuit_open(e)
+
+    settled = False
+    try:
+        try:
+            async with mistral_bulkhead.slot(key=user_id, weight=weight):
+                async with get_client().stream(
+                    "POST",
+                    url,
+                    headers=_request_headers(api_key),
+                    json={
+                        "model": model,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "stream": True,
+                    },
+                ) as response:
+                    if not 200 <= response.status_code < 300:
+                        await response.aread()
+                        _raise_for_status(response)
+                    mistral_breaker.record_success()
+                    settled = True
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            delta = json.loads(data)["choices"][0]["delta"].get("content")
+                        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                            continue
+                        if delta:
+                            yield delta
+        except httpx.TimeoutException:
+            raise _timeout_error()
+        except httpx.RequestError as e:
+            raise _network_error(e)
+    except BulkheadFullError as e:
+        raise _overloaded(e)
+    except MistralClientError as e:
+        if not settled:
+            _record_outcome(e)
+            settled = True
+        raise
+    finally:
+        if not settled:
+            mistral_breaker.release_trial()
@@ -0,0 +1,129 @@
+"""Clients HTTP partagés vers les fournisseurs OAuth (Google, Facebook).
+
+Un `httpx.AsyncClient` par fournisseur (pool keep-alive, HTTP/2 optionnel si
+`h2` est installé, timeout `OAUTH_TIMEOUT_SECONDS`) au lieu d'un client —
+donc d'une poignée de main TLS — par appel : ouverts au démarrage de l'app
+(`open_clients`), fermés à l'arrêt (`close_clients`), créés à la demande
+sans lifespan (tests, scripts).
+
+Chaque étape d'un login (échange du code, profil Graph, JWKS…) est
+chronométrée dans un histogramme par fournisseur et par étape
+(`latency_stats`, exposé dans /metrics).
+"""
+import importlib.util
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import httpx
+
+from ..core.config import get_settings
+from ..core.logging import get_logger
+from ..core.oauth_config import OAUTH_TIMEOUT_SECONDS
+
+logger = get_logger("nextarget.oauth")
+
+PROVIDERS = ("google", "facebook")
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client() -> httpx.AsyncClient:
+    settings = get_settings()
+    http2 = settings.oauth_http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("oauth http2 disabled: package 'h2' not installed")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=OAUTH_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=settings.oauth_pool_max_connections,
+            max_keepalive_connections=settings.oauth_pool_max_keepalive,
+            keepalive_expiry=settings.oauth_keepalive_expiry_seconds,
+        ),
+    )
+
+
+async def open_clients() -> None:
+    """Ouvre un client par fournisseur (startup de l'app). Idempotent."""
+    for provider in PROVIDERS:
+        get_client(provider)
+
+
+async def close_clients() -> None:
+    """Ferme les clients et leurs connexions (shutdown de l'app)."""
+    while _clients:
+        _, client = _clients.popitem()
+        await client.aclose()
+
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """Client partagé du fournisseur, créé à la demande."""
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _clients[provider] = _build_client()
+    return client
+
+
+class LatencyHistogram:
+    """Histogramme cumulatif de latences (bornes en ms, style Prometheus)."""
+
+    BUCKETS_MS: Tuple[float, ...] = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.errors = 0
+
+    def observe(self, ms: float, ok: bool = True) -> None:
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if ms <= bound:
+                break
+        else:
+            i = len(self.BUCKETS_MS)
+        self.counts[i] += 1
+        self.total_ms += ms
+        if not ok:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        count = sum(self.counts)
+        buckets = {}
+        cumulative = 0
+        for bound, n in zip((*self.BUCKETS_MS, "inf"), self.counts):
+            cumulative += n
+            buckets[f"le_{bound}"] = cumulative
+        return {
+            "count": count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / count, 1) if count else None,
+            "buckets": buckets,
+        }
+
+
+_latencies: Dict[Tuple[str, str], LatencyHistogram] = {}
+
+
+@contextmanager
+def timed(provider: str, step: str) -> Iterator[None]:
+    """Chronomètre une étape ; une exception (timeout, réseau) la compte en erreur."""
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        histogram = _latencies.setdefault((provider, step), LatencyHistogram())
+        histogram.observe((time.perf_counter() - start) * 1000, ok)
+
+
+def latency_stats() -> Dict[str, Dict[str, dict]]:
+    stats: Dict[str, Dict[str, dict]] = {}
+    for (provider, step), histogram in sorted(_latencies.items()):
+        stats.setdefault(provider, {})[step] = histogram.stats()
+    return stats
+
+
+def reset_latencies() -> None:
+    _latencies.clear()
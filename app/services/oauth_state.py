@@ -2,24 +2,56 @@
 OAuth state management service.
 Handles ephemeral state storage with TTL expiration.
 
-NOTE: In-memory implementation for v0.1. Replace with Redis for production.
+States live in the shared store (services/shared_store): process memory by
+default, SQLite or Redis when several workers must see the same states
+(SHARED_STORE_BACKEND).
+
+With OAUTH_STATE_MODE=signed, nothing is stored at creation: the state is
+an HMAC-signed, expiring token carrying the nonces (SignedStateManager), so
+any worker can verify it. Only consumed state ids are remembered, until the
+token expires, to keep states single-use.
 """
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
 import secrets
 import time
-from typing import Optional
+from typing import Any, Dict, Optional
 
+from ..core.config import get_settings
+from ..core.logging import get_logger
 from ..core.oauth_config import STATE_TTL_SECONDS
+from .shared_store import MemoryStore, SharedStore, get_shared_store
+
+_KEY_PREFIX = "oauth_state:"
+_USED_PREFIX = "oauth_state_used:"
+
+logger = get_logger("nextarget.oauth")
 
 
 class OAuthStateManager:
     """
     Manages OAuth state tokens with automatic expiration.
-    Thread-safe for single-process deployments.
+
+    Storage is delegated to a SharedStore: one-time consumption is atomic,
+    and the in-memory store is bounded and guarded by a lock (see
+    MemoryStore). Expired states are also dropped by a background sweeper
+    (start/stop, wired to the app lifecycle), so idle memory is reclaimed
+    even without new logins.
     """
     
-    def __init__(self, ttl_seconds: int = STATE_TTL_SECONDS):
-        self._states: dict[str, dict] = {}
+    def __init__(
+        self,
+        ttl_seconds: int = STATE_TTL_SECONDS,
+        store: Optional[SharedStore] = None,
+        sweep_interval_seconds: float = 30.0,
+    ):
+        self._store = store or MemoryStore()
         self._ttl_seconds = ttl_seconds
+        self._sweep_interval_seconds = sweep_interval_seconds
+        self._sweeper: Optional[asyncio.Task] = None
     
     def create_state(
         self, 
@@ -36,8 +68,6 @@ class OAuthStateManager:
         Returns:
             Tuple of (state_token, state_data)
         """
-        self._prune_expired()
-        
         state = secrets.token_urlsafe(24)
         nonce = nonce or secrets.token_urlsafe(24)
         now = time.time()
@@ -49,7 +79,7 @@ class OAuthStateManager:
             "client_nonce": client_nonce,
         }
         
-        self._states[state] = state_data
+        self._store.put(_KEY_PREFIX + state, json.dumps(state_data), self._ttl_seconds, now)
         return state, state_data
     
     def verify_and_consume(self, state: str) -> Optional[dict]:
@@ -62,19 +92,148 @@ class OAuthStateManager:
         Returns:
             State data if valid, None if invalid/expired
         """
-        self._prune_expired()
-        return self._states.pop(state, None)
-    
-    def _prune_expired(self) -> None:
-        """Remove expired state tokens."""
         now = time.time()
-        expired = [k for k, v in self._states.items() if v["exp"] < now]
-        for k in expired:
-            self._states.pop(k, None)
+        raw = self._store.take(_KEY_PREFIX + state, now)
+        if raw is None:
+            return None
+        state_data = json.loads(raw)
+        return state_data if state_data["exp"] >= now else None
+
+    async def verify_and_consume_async(self, state: str) -> Optional[dict]:
+        """verify_and_consume for async callbacks: SQLite/Redis I/O runs in a thread.
+
+        (The login endpoints are sync and already run in FastAPI's threadpool.)
+        """
+        if self._store.blocking:
+            return await asyncio.to_thread(self.verify_and_consume, state)
+        return self.verify_and_consume(state)
+
+    async def start(self) -> None:
+        """Start the background sweeper. Idempotent."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever(), name="oauth-state-sweeper")
+
+    async def stop(self) -> None:
+        """Stop the background sweeper."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sweeper_running": self._sweeper is not None, **self._store.stats()}
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self._sweep_interval_seconds)
+            try:
+                # Off the event loop: SQLite purges touch the disk.
+                await asyncio.to_thread(self._store.purge, time.time())
+            except Exception:
+                logger.exception("oauth state sweep failed")
+
+
+class SignedStateManager(OAuthStateManager):
+    """
+    Stateless OAuth states: `<payload>.<signature>` (base64url), where the
+    payload holds the state id, nonces and expiry, signed with HMAC-SHA256.
+
+    The store only acts as a replay cache of consumed state ids (kept until
+    the token would expire anyway): local to the process with the memory
+    backend, shared across workers with SQLite/Redis.
+    """
+
+    def __init__(
+        self,
+        secret_key: str,
+        ttl_seconds: int = STATE_TTL_SECONDS,
+        store: Optional[SharedStore] = None,
+        sweep_interval_seconds: float = 30.0,
+    ):
+        super().__init__(ttl_seconds, store, sweep_interval_seconds)
+        # Dedicated key: a state can never be confused with a JWT.
+        self._key = hmac.new(secret_key.encode(), b"nextarget-oauth-state", hashlib.sha256).digest()
+
+    def create_state(
+        self,
+        client_nonce: Optional[str] = None,
+        nonce: Optional[str] = None
+    ) -> tuple[str, dict]:
+        """Create a signed state token; nothing is stored server-side."""
+        nonce = nonce or secrets.token_urlsafe(24)
+        now = time.time()
+        state_data = {
+            "nonce": nonce,
+            "created": now,
+            "exp": now + self._ttl_seconds,
+            "client_nonce": client_nonce,
+        }
+        claims = {
+            "j": secrets.token_urlsafe(12),
+            "n": nonce,
+            "c": client_nonce,
+            "t": now,
+            "e": state_data["exp"],
+        }
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        return f"{payload}.{self._sign(payload)}", state_data
+
+    def verify_and_consume(self, state: str) -> Optional[dict]:
+        """Check signature and expiry, then mark the state id as consumed."""
+        payload, _, signature = state.partition(".")
+        # Bytes comparison: compare_digest rejects non-ASCII str (forged
+        # query param) with a TypeError.
+        if not signature or not hmac.compare_digest(signature.encode(), self._sign(payload).encode()):
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+            state_id, exp = claims["j"], float(claims["e"])
+            state_data = {
+                "nonce": claims["n"],
+                "created": claims["t"],
+                "exp": exp,
+                "client_nonce": claims["c"],
+            }
+        except (ValueError, TypeError, KeyError):
+            return None
+        now = time.time()
+        if exp < now:
+            return None
+        if not self._store.put_if_absent(_USED_PREFIX + str(state_id), "1", exp - now, now):
+            return None
+        return state_data
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._key, payload.encode(), hashlib.sha256).digest())
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def build_state_manager() -> OAuthStateManager:
+    settings = get_settings()
+    mode = settings.oauth_state_mode.lower()
+    if mode == "stored":
+        return OAuthStateManager(
+            store=get_shared_store(),
+            sweep_interval_seconds=settings.oauth_state_sweep_interval_seconds,
+        )
+    if mode == "signed":
+        return SignedStateManager(
+            settings.jwt_secret_key,
+            store=get_shared_store(),
+            sweep_interval_seconds=settings.oauth_state_sweep_interval_seconds,
+        )
+    raise RuntimeError(f"OAUTH_STATE_MODE inconnu : {settings.oauth_state_mode}")
 
 
 # Global singleton instance
-_state_manager = OAuthStateManager()
+_state_manager = build_state_manager()
 
 
 def get_state_manager() -> OAuthStateManager:
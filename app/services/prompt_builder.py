@@ -4,14 +4,22 @@ Portage de la logique historiquement présente côté client
 (lib/services/coach_analysis_service.dart::buildPrompt) : le client
 n'envoie plus le prompt, seulement les données de session ; le
 template et l'assemblage vivent désormais côté serveur.
+
+Budget : un prompt dont l'estimation dépasse `coach_prompt_max_tokens`
+est compacté par étapes (commentaires tronqués, puis séries agrégées par
+distance, puis synthèse tronquée). Le résultat reste déterministe
+(même session ⇒ même prompt, cf. cache des analyses).
 """
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional
 import functools
+import math
 
 import yaml
 
-from ..schemas.coach import SessionIn
+from ..core.config import get_settings
+from ..schemas.coach import SeriesIn, SessionIn
+from .session_stats import compute_session_stats, stats_prompt_lines
 
 PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
 
@@ -21,6 +29,10 @@ _VARIANT_FILES: Dict[str, str] = {
     "coach_cool": "coach_cool.yaml",
 }
 
+# Heuristique sans tokenizer : ≈ 4 caractères par token (texte FR/EN).
+CHARS_PER_TOKEN = 4
+COMMENT_MAX_CHARS = 80
+
 
 class UnknownPromptVariantError(Exception):
     pass
@@ -37,22 +49,123 @@ def _load_template(variant: str) -> str:
     return str(data["prompt"]).strip()
 
 
-def build_prompt(session: SessionIn, prompt_variant: str = "coach_neutre") -> str:
-    template = _load_template(prompt_variant)
+def estimate_tokens(text: str) -> int:
+    """Estimation du nombre de tokens d'un texte (borne haute grossière)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
 
+def _truncate(text: Optional[str], max_chars: Optional[int]) -> Optional[str]:
+    if text is None or max_chars is None or len(text) <= max_chars:
+        return text
+    return text[: max(0, max_chars - 1)].rstrip() + "…"
+
+
+def _series_lines(series: List[SeriesIn], comment_max_chars: Optional[int] = None) -> List[str]:
+    lines = ["Séries :"]
+    for i, s in enumerate(series, start=1):
+        lines.append(
+            f"- Série {i} : Coups={s.shot_count}, Distance={s.distance}m, "
+            f"Points={s.points}, Groupement={s.group_size_cm}cm, "
+            f"Commentaire={_truncate(s.comment, comment_max_chars)}"
+        )
+    return lines
+
+
+def _mean_range(values: List[float], unit: str = "") -> str:
+    if not values:
+        return "n/a"
+    mean = sum(values) / len(values)
+    return f"moy {mean:.1f}{unit} (min {min(values):g}, max {max(values):g})"
+
+
+def _aggregated_series_lines(series: List[SeriesIn]) -> List[str]:
+    """Une ligne par distance : agrégats numériques + commentaires dédoublonnés."""
+    by_distance: Dict[Optional[float], List[SeriesIn]] = {}
+    for s in series:
+        by_distance.setdefault(s.distance, []).append(s)
+
+    lines = [f"Séries (agrégées par distance, {len(series)} au total) :"]
+    for distance, group in by_distance.items():
+        points = [s.points for s in group if s.points is not None]
+        groups = [s.group_size_cm for s in group if s.group_size_cm is not None]
+        comments: List[str] = []
+        for s in group:
+            comment = _truncate(s.comment.strip(), COMMENT_MAX_CHARS) if s.comment else None
+            if comment and comment not in comments:
+                comments.append(comment)
+        line = (
+            f"- Distance={distance}m : {len(group)} séries, "
+            f"Coups={sum(s.shot_count for s in group)}, "
+            f"Points {_mean_range(points)}, Groupement {_mean_range(groups, 'cm')}"
+        )
+        if comments:
+            line += f", Commentaires={' | '.join(comments[:3])}"
+        lines.append(line)
+    return lines
+
+
+def _assemble(
+    template: str,
+    session: SessionIn,
+    series_lines: List[str],
+    synthese: Optional[str],
+    stats_lines: Optional[List[str]] = None,
+) -> str:
     lines = [template, "", "Session :"]
     lines.append(f"Arme : {session.weapon or 'Non renseignée'}")
     lines.append(f"Calibre : {session.caliber or 'Non renseigné'}")
     lines.append(f"Date : {session.date.isoformat() if session.date else 'Non renseignée'}")
-    lines.append("Séries :")
-    for i, s in enumerate(session.series, start=1):
-        lines.append(
-            f"- Série {i} : Coups={s.shot_count}, Distance={s.distance}m, "
-            f"Points={s.points}, Groupement={s.group_size_cm}cm, Commentaire={s.comment}"
-        )
-    if session.synthese and session.synthese.strip():
+    lines.extend(series_lines)
+    if stats_lines:
+        lines.append("")
+        lines.extend(stats_lines)
+    if synthese and synthese.strip():
         lines.append("")
         lines.append("Synthèse du tireur :")
-        lines.append(session.synthese)
+        lines.append(synthese)
 
     return "\n".join(lines)
+
+
+def build_prompt(
+    session: SessionIn,
+    prompt_variant: str = "coach_neutre",
+    max_tokens: Optional[int] = None,
+    include_stats: Optional[bool] = None,
+) -> str:
+    """Prompt complet pour une session.
+
+    Args:
+        max_tokens: budget estimé ; par défaut `coach_prompt_max_tokens`
+            (0 = pas de budget).
+        include_stats: ajoute les statistiques pré-calculées ; par défaut
+            `coach_prompt_include_stats`.
+    """
+    settings = get_settings()
+    template = _load_template(prompt_variant)
+    budget = settings.coach_prompt_max_tokens if max_tokens is None else max_tokens
+    if include_stats is None:
+        include_stats = settings.coach_prompt_include_stats
+    stats = stats_prompt_lines(compute_session_stats(session)) if include_stats else None
+
+    prompt = _assemble(template, session, _series_lines(session.series), session.synthese, stats)
+    if budget <= 0 or estimate_tokens(prompt) <= budget:
+        return prompt
+
+    # 1. Commentaires tronqués, séries conservées une par une.
+    prompt = _assemble(
+        template, session, _series_lines(session.series, COMMENT_MAX_CHARS), session.synthese, stats
+    )
+    if estimate_tokens(prompt) <= budget:
+        return prompt
+
+    # 2. Séries agrégées par distance.
+    series_lines = _aggregated_series_lines(session.series)
+    prompt = _assemble(template, session, series_lines, session.synthese, stats)
+    if estimate_tokens(prompt) <= budget or not session.synthese:
+        return prompt
+
+    # 3. Synthèse tronquée au budget restant.
+    overflow_chars = (estimate_tokens(prompt) - budget) * CHARS_PER_TOKEN
+    synthese = _truncate(session.synthese, max(0, len(session.synthese) - overflow_chars))
+    return _assemble(template, session, series_lines, synthese, stats)
@@ -1,12 +1,30 @@
-"""Rate limiting minimal en mémoire pour les endpoints qui coûtent de
-l'argent (appels Mistral). Volontairement simple (usage perso /
-petite échelle) : fenêtre glissante par utilisateur, stockée en
-mémoire process. À remplacer par Redis si multi-instance un jour
-(cf. SECURITY_ANALYSIS.md, même limite déjà connue pour l'OAuth state).
+"""Rate limiting pour les endpoints qui coûtent de l'argent (appels
+Mistral). Volontairement simple (usage perso / petite échelle).
+
+- `GcraRateLimiter` (utilisé par le coach) : GCRA (« generic cell rate
+  algorithm », équivalent d'un seau à jetons), un seul float par clé — la
+  date théorique d'arrivée (TAT) — dans un stockage partagé
+  (services/shared_store, backend choisi par `SHARED_STORE_BACKEND`). Les
+  clés inactives (quota entièrement regagné) sont évincées : leur
+  suppression ne change aucune décision.
+  Un passage = un seul appel au stockage : la décision
+  (`RateLimitDecision`) porte déjà restant / remise à plein / Retry-After,
+  calculés depuis la TAT renvoyée. Avec un backend bloquant (SQLite,
+  Redis), les variantes `*_async` passent par un thread
+  (`asyncio.to_thread`) : la boucle asyncio n'attend jamais le disque ou
+  le réseau.
+- `InMemoryRateLimiter` : ancienne fenêtre glissante (deque d'horodatages
+  par clé), conservée comme référence du micro-benchmark
+  (benchmarks/rate_limiter_bench.py).
 """
+import asyncio
+import math
 import time
 from collections import defaultdict, deque
-from typing import Deque, Dict
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+from .shared_store import MemoryStore, SharedStore, get_shared_store
 
 
 class InMemoryRateLimiter:
@@ -25,7 +43,116 @@ class InMemoryRateLimiter:
         hits.append(now)
         return True
 
+    def refund(self, key: str) -> None:
+        """Annule le dernier passage autorisé (appel abandonné, ex. client parti)."""
+        hits = self._hits.get(key)
+        if hits:
+            hits.pop()
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    """Résultat d'un passage ; vrai si autorisé (`if limiter.allow(key):`)."""
+
+    allowed: bool
+    limit: int
+    # Passages encore autorisés immédiatement.
+    remaining: int
+    # Secondes avant que le quota soit entièrement regagné.
+    reset_after: float
+    # Secondes avant le prochain passage autorisé (0 si possible tout de suite).
+    retry_after: float
+
+    def __bool__(self) -> bool:
+        return self.allowed
+
+
+class GcraRateLimiter:
+    """`max_requests` par `window_seconds`, rafale comprise.
+
+    Chaque passage repousse la TAT de la clé d'un intervalle
+    `window_seconds / max_requests` ; un passage est refusé si la TAT
+    dépasserait `now + window_seconds`. L'état vit dans un `SharedStore`
+    (mémoire par défaut ; SQLite/Redis pour plusieurs workers).
+    """
+
+    def __init__(
+        self,
+        max_requests: int,
+        window_seconds: float,
+        store: Optional[SharedStore] = None,
+        prefix: str = "",
+        max_keys: int = 100_000,
+        sweep_interval_seconds: float = 60.0,
+    ):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.store = store or MemoryStore(max_keys=max_keys, sweep_interval_seconds=sweep_interval_seconds)
+        self.prefix = prefix
+        self._interval = window_seconds / max_requests
+
+    def allow(self, key: str) -> RateLimitDecision:
+        now = time.time()
+        allowed, tat = self.store.gcra_allow(self.prefix + key, now, self._interval, self.window_seconds)
+        return self._decision(allowed, tat, now)
+
+    async def allow_async(self, key: str) -> RateLimitDecision:
+        """`allow` sans bloquer la boucle (thread si le backend fait des E/S)."""
+        if self.store.blocking:
+            return await asyncio.to_thread(self.allow, key)
+        return self.allow(key)
+
+    def refund(self, key: str) -> None:
+        """Annule le dernier passage autorisé (appel abandonné, ex. client parti)."""
+        self.store.gcra_refund(self.prefix + key, time.time(), self._interval)
+
+    async def refund_async(self, key: str) -> None:
+        if self.store.blocking:
+            await asyncio.to_thread(self.refund, key)
+        else:
+            self.refund(key)
+
+    def peek(self, key: str) -> RateLimitDecision:
+        """État courant de la clé, sans consommer de passage (`allowed` : un
+        passage serait autorisé maintenant)."""
+        now = time.time()
+        return self._decision(None, self.store.gcra_tat(self.prefix + key, now), now)
+
+    def remaining(self, key: str) -> int:
+        """Passages encore autorisés immédiatement."""
+        return self.peek(key).remaining
+
+    def reset_after(self, key: str) -> float:
+        """Secondes avant que le quota soit entièrement regagné."""
+        return self.peek(key).reset_after
+
+    def retry_after(self, key: str) -> float:
+        """Secondes avant le prochain passage autorisé (0 si possible tout de suite)."""
+        return self.peek(key).retry_after
+
+    def _decision(self, allowed: Optional[bool], tat: Optional[float], now: float) -> RateLimitDecision:
+        used = max(0.0, tat - now) if tat is not None else 0.0
+        retry_after = max(0.0, used + self._interval - self.window_seconds)
+        return RateLimitDecision(
+            allowed=retry_after == 0 if allowed is None else allowed,
+            limit=self.max_requests,
+            remaining=max(0, math.floor((self.window_seconds - used) / self._interval + 1e-9)),
+            reset_after=used,
+            retry_after=retry_after,
+        )
+
+    def reset(self) -> None:
+        self.store.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
 
 # 10 analyses / 5 minutes par utilisateur : large pour un usage perso,
 # suffisant pour éviter un abus qui viderait le quota Mistral.
-coach_rate_limiter = InMemoryRateLimiter(max_requests=10, window_seconds=300)
+coach_rate_limiter = GcraRateLimiter(
+    max_requests=10,
+    window_seconds=300,
+    store=get_shared_store(),
+    prefix="coach:",
+)
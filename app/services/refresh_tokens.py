@@ -8,6 +8,10 @@ Security model:
 - Reuse detection: presenting an already-revoked token is treated as a
   compromise signal — the whole family is revoked (the legitimate holder
   will simply re-login).
+
+Each operation exists in two flavours sharing the same statements and
+rules: sync (`Session`, background work and tests) and async
+(`AsyncSession`, `*_async`, used by the async request handlers).
 """
 import hashlib
 import secrets
@@ -16,6 +20,7 @@ from typing import Optional, Tuple
 import uuid
 
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..core.config import get_settings
 from ..models.refresh_token import RefreshToken
@@ -46,6 +51,14 @@ def issue_refresh_token(
     Returns:
         Tuple (raw_token, record). The raw token is never stored.
     """
+    raw, record = _new_token(user_id, family_id)
+    session.add(record)
+    session.commit()
+    session.refresh(record)
+    return raw, record
+
+
+def _new_token(user_id: str, family_id: Optional[str]) -> Tuple[str, RefreshToken]:
     settings = get_settings()
     raw = secrets.token_urlsafe(48)
     record = RefreshToken(
@@ -54,26 +67,36 @@ def issue_refresh_token(
         family_id=family_id or str(uuid.uuid4()),
         expires_at=_now() + timedelta(days=settings.refresh_token_exp_days),
     )
-    session.add(record)
-    session.commit()
-    session.refresh(record)
     return raw, record
 
 
+def _by_raw(raw_token: str):
+    return select(RefreshToken).where(RefreshToken.token_hash == _hash(raw_token))
+
+
+def _active_in_family(family_id: str):
+    return select(RefreshToken).where(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked_at == None,  # noqa: E711 (SQL expression)
+    )
+
+
+def _check_rotatable(record: Optional[RefreshToken]) -> RefreshToken:
+    """Validity checks before rotation (reuse is handled by the caller)."""
+    if record is None:
+        raise RefreshTokenError("Invalid refresh token")
+    if record.revoked_at is None and record.expires_at <= _now():
+        raise RefreshTokenError("Refresh token expired")
+    return record
+
+
 def _get_by_raw(session: Session, raw_token: str) -> Optional[RefreshToken]:
-    return session.exec(
-        select(RefreshToken).where(RefreshToken.token_hash == _hash(raw_token))
-    ).first()
+    return session.exec(_by_raw(raw_token)).first()
 
 
 def revoke_family(session: Session, family_id: str) -> None:
     """Revoke every active token of a rotation family."""
-    tokens = session.exec(
-        select(RefreshToken).where(
-            RefreshToken.family_id == family_id,
-            RefreshToken.revoked_at == None,  # noqa: E711 (SQL expression)
-        )
-    ).all()
+    tokens = session.exec(_active_in_family(family_id)).all()
     now = _now()
     for t in tokens:
         t.revoked_at = now
@@ -87,18 +110,13 @@ def rotate_refresh_token(session: Session, raw_token: str) -> Tuple[str, Refresh
     Raises:
         RefreshTokenError: unknown, expired, revoked (reuse ⇒ family revoked).
     """
-    record = _get_by_raw(session, raw_token)
-    if record is None:
-        raise RefreshTokenError("Invalid refresh token")
+    record = _check_rotatable(_get_by_raw(session, raw_token))
 
     if record.revoked_at is not None:
         # Reuse of a rotated/revoked token: compromise signal.
         revoke_family(session, record.family_id)
         raise RefreshTokenError("Refresh token reuse detected")
 
-    if record.expires_at <= _now():
-        raise RefreshTokenError("Refresh token expired")
-
     record.revoked_at = _now()
     session.add(record)
     session.commit()
@@ -111,3 +129,51 @@ def revoke_refresh_token(session: Session, raw_token: str) -> None:
     record = _get_by_raw(session, raw_token)
     if record is not None:
         revoke_family(session, record.family_id)
+
+
+# -- async flavour -------------------------------------------------------------
+
+
+async def issue_refresh_token_async(
+    session: AsyncSession,
+    user_id: str,
+    family_id: Optional[str] = None,
+) -> Tuple[str, RefreshToken]:
+    """Async `issue_refresh_token`."""
+    raw, record = _new_token(user_id, family_id)
+    session.add(record)
+    await session.commit()
+    await session.refresh(record)
+    return raw, record
+
+
+async def revoke_family_async(session: AsyncSession, family_id: str) -> None:
+    """Async `revoke_family`."""
+    tokens = (await session.exec(_active_in_family(family_id))).all()
+    now = _now()
+    for t in tokens:
+        t.revoked_at = now
+        session.add(t)
+    await session.commit()
+
+
+async def rotate_refresh_token_async(session: AsyncSession, raw_token: str) -> Tuple[str, RefreshToken]:
+    """Async `rotate_refresh_token`."""
+    record = _check_rotatable((await session.exec(_by_raw(raw_token))).first())
+
+    if record.revoked_at is not None:
+        await revoke_family_async(session, record.family_id)
+        raise RefreshTokenError("Refresh token reuse detected")
+
+    record.revoked_at = _now()
+    session.add(record)
+    await session.commit()
+
+    return await issue_refresh_token_async(session, record.user_id, family_id=record.family_id)
+
+
+async def revoke_refresh_token_async(session: AsyncSession, raw_token: str) -> None:
+    """Async `revoke_refresh_token`."""
+    record = (await session.exec(_by_raw(raw_token))).first()
+    if record is not None:
+        await revoke_family_async(session, record.family_id)
@@ -0,0 +1,148 @@
+"""Statistiques objectives de séance, calculées côté serveur sans LLM.
+
+Points par coup, tendance du groupement au fil des séries, répartition par
+distance, et tendances inter-séances sur un lot. Calcul en un passage sur
+`SessionIn.series` (quelques dizaines de valeurs au plus : inutile
+d'embarquer NumPy pour ça) — quelques microsecondes par séance, aucun
+appel Mistral.
+
+Les mêmes chiffres peuvent être injectés dans le prompt (`build_prompt`)
+pour que le modèle raisonne sur des valeurs exactes au lieu de les recalculer.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..schemas.coach import (
+    CrossSessionTrend,
+    DistanceStats,
+    SessionIn,
+    SessionStats,
+    SessionsStatsResponse,
+)
+
+
+def _mean(values: Sequence[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+def _slope(points: Sequence[Tuple[float, float]]) -> Optional[float]:
+    """Pente des moindres carrés de y en fonction de x (None si < 2 points)."""
+    n = len(points)
+    if n < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def _round(value: Optional[float], digits: int = 2) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+
+def _utc(value: datetime) -> datetime:
+    """Date comparable : une date sans fuseau est lue comme UTC."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def compute_session_stats(session: SessionIn) -> SessionStats:
+    shots = 0
+    scored_shots = 0
+    points_total = 0.0
+    groups: List[Tuple[float, float]] = []
+    by_distance: Dict[Optional[float], Dict[str, float]] = {}
+    distance_groups: Dict[Optional[float], List[float]] = {}
+
+    for i, s in enumerate(session.series):
+        shots += s.shot_count
+        bucket = by_distance.setdefault(
+            s.distance, {"series": 0, "shots": 0, "scored_shots": 0, "points": 0.0}
+        )
+        bucket["series"] += 1
+        bucket["shots"] += s.shot_count
+        if s.points is not None:
+            scored_shots += s.shot_count
+            points_total += s.points
+            bucket["scored_shots"] += s.shot_count
+            bucket["points"] += s.points
+        if s.group_size_cm is not None:
+            groups.append((float(i), s.group_size_cm))
+            distance_groups.setdefault(s.distance, []).append(s.group_size_cm)
+
+    group_values = [g for _, g in groups]
+    return SessionStats(
+        series_count=len(session.series),
+        shot_count=shots,
+        points_total=_round(points_total) if scored_shots else None,
+        points_per_shot=_round(points_total / scored_shots) if scored_shots else None,
+        group_size_mean_cm=_round(_mean(group_values)),
+        group_size_best_cm=min(group_values) if group_values else None,
+        group_size_trend_cm_per_series=_round(_slope(groups), 3),
+        distances=[
+            DistanceStats(
+                distance=distance,
+                series_count=int(bucket["series"]),
+                shot_count=int(bucket["shots"]),
+                points_per_shot=(
+                    _round(bucket["points"] / bucket["scored_shots"])
+                    if bucket["scored_shots"] else None
+                ),
+                group_size_mean_cm=_round(_mean(distance_groups.get(distance, []))),
+            )
+            for distance, bucket in by_distance.items()
+        ],
+    )
+
+
+def compute_sessions_stats(sessions: List[SessionIn]) -> SessionsStatsResponse:
+    """Statistiques par séance + tendances inter-séances.
+
+    L'ordre chronologique suit `date` quand toutes les séances en ont une,
+    sinon l'ordre d'envoi. Les dates sans fuseau sont lues comme UTC (un lot
+    peut mélanger `2026-01-01T10:00:00` et `2026-01-02T10:00:00Z`).
+    """
+    per_session = [compute_session_stats(s) for s in sessions]
+    order = list(range(len(sessions)))
+    if all(s.date is not None for s in sessions):
+        order.sort(key=lambda i: _utc(sessions[i].date))
+
+    pps = [(float(rank), per_session[i].points_per_shot) for rank, i in enumerate(order)]
+    grp = [(float(rank), per_session[i].group_size_mean_cm) for rank, i in enumerate(order)]
+    pps = [(x, y) for x, y in pps if y is not None]
+    grp = [(x, y) for x, y in grp if y is not None]
+
+    return SessionsStatsResponse(
+        sessions=per_session,
+        trend=CrossSessionTrend(
+            session_count=len(sessions),
+            points_per_shot_mean=_round(_mean([y for _, y in pps])),
+            points_per_shot_trend=_round(_slope(pps), 3),
+            group_size_mean_cm=_round(_mean([y for _, y in grp])),
+            group_size_trend_cm=_round(_slope(grp), 3),
+        ),
+    )
+
+
+def stats_prompt_lines(stats: SessionStats) -> List[str]:
+    """Bloc « chiffres pré-calculés » pour le prompt coach."""
+    lines = ["Statistiques calculées (exactes, ne pas recalculer) :"]
+    lines.append(f"- Séries={stats.series_count}, Coups={stats.shot_count}")
+    if stats.points_per_shot is not None:
+        lines.append(f"- Points par coup={stats.points_per_shot}")
+    if stats.group_size_mean_cm is not None:
+        lines.append(
+            f"- Groupement moyen={stats.group_size_mean_cm}cm, meilleur={stats.group_size_best_cm}cm"
+        )
+    if stats.group_size_trend_cm_per_series is not None:
+        lines.append(
+            f"- Tendance du groupement={stats.group_size_trend_cm_per_series:+}cm par série"
+            " (négatif = se resserre)"
+        )
+    for d in stats.distances:
+        lines.append(
+            f"- Distance={d.distance}m : {d.series_count} séries, {d.shot_count} coups, "
+            f"Points par coup={d.points_per_shot}, Groupement moyen={d.group_size_mean_cm}cm"
+        )
+    return lines
@@ -0,0 +1,430 @@
+"""Stockage partagé entre workers : rate limiter coach et OAuth state.
+
+En mémoire process, chaque worker uvicorn a ses propres compteurs (limites
+multipliées par le nombre de workers) et ses propres states OAuth (callback
+refusé s'il arrive sur un autre worker). Trois implémentations de la même
+interface, choisies par `SHARED_STORE_BACKEND` :
+
+- `memory` : comportement historique, mono-process ;
+- `sqlite` : fichier SQLite partagé par les workers d'une même machine
+  (`SHARED_STORE_SQLITE_PATH`) ;
+- `redis` : tout serveur parlant le protocole Redis (`REDIS_URL`, paquet
+  optionnel `redis`).
+
+Chaque opération est atomique et tient en un aller-retour : une requête
+`INSERT … ON CONFLICT … RETURNING` / `DELETE … RETURNING` côté SQLite, un
+script Lua (`EVAL`) ou `GETDEL` côté Redis. Horloge : `time.time()`
+(commune aux process), passée par l'appelant.
+
+Les backends SQLite et Redis font des E/S bloquantes (`blocking = True`) :
+les appelants asynchrones (rate limiter, OAuth state) les exécutent dans
+un thread (`asyncio.to_thread`) ; le backend mémoire reste sur la boucle.
+
+Opérations :
+- `gcra_allow` / `gcra_refund` / `gcra_tat` : état GCRA d'une clé (date
+  théorique d'arrivée, voir services/rate_limiter) ;
+- `put` / `take` : valeur à usage unique avec TTL (OAuth state) ;
+- `put_if_absent` : marque à TTL posée une seule fois (cache anti-rejeu des
+  states OAuth signés) ;
+- `purge` : suppression des entrées expirées (tâche de fond de l'appelant).
+"""
+import heapq
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import get_settings
+
+
+class SharedStore(ABC):
+    name = "abstract"
+    # Opérations faisant des E/S (disque, réseau) : hors boucle asyncio.
+    blocking = True
+
+    @abstractmethod
+    def gcra_allow(self, key: str, now: float, interval: float, window: float) -> Tuple[bool, Optional[float]]:
+        """Passage GCRA : (autorisé, TAT après décision ; None si clé inconnue)."""
+
+    @abstractmethod
+    def gcra_refund(self, key: str, now: float, interval: float) -> None:
+        """Rend un passage (TAT reculée d'un intervalle, jamais avant `now`)."""
+
+    @abstractmethod
+    def gcra_tat(self, key: str, now: float) -> Optional[float]:
+        """TAT courante de la clé, None si inconnue ou inactive."""
+
+    @abstractmethod
+    def put(self, key: str, value: str, ttl_seconds: float, now: float) -> None:
+        """Stocke une valeur expirant après `ttl_seconds`."""
+
+    @abstractmethod
+    def take(self, key: str, now: float) -> Optional[str]:
+        """Lit et supprime la valeur (usage unique) ; None si absente ou expirée."""
+
+    @abstractmethod
+    def put_if_absent(self, key: str, value: str, ttl_seconds: float, now: float) -> bool:
+        """Stocke la valeur si la clé est absente ou expirée ; False sinon."""
+
+    def purge(self, now: float) -> None:
+        """Supprime les entrées expirées (no-op si le backend expire seul)."""
+
+    def reset(self) -> None:
+        """Vide le stockage (tests)."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryStore(SharedStore):
+    """Dictionnaires du process (un seul worker).
+
+    - GCRA : les clés inactives sont évincées périodiquement ou dès
+      `max_keys` clés (seuil relevé si rien n'est évinçable : coût amorti
+      O(1)). Appelé uniquement depuis la boucle asyncio, sans verrou.
+    - Valeurs à usage unique : expiration suivie dans un tas
+      (expires_at, clé) — une purge ne coûte que les entrées expirées — et
+      capacité bornée à `max_values` (les plus anciennes sont évincées :
+      un flood de /auth/*/login ne fait plus grossir la mémoire). Protégées
+      par un verrou : `purge` tourne dans un thread (asyncio.to_thread).
+    - Marques anti-rejeu (`put_if_absent`) : tenues à part, jamais évincées
+      sur capacité (une marque évincée rouvrirait le rejeu d'un state
+      consommé). Au-delà de `max_values` marques vivantes, `put_if_absent`
+      refuse (False) : le state est rejeté plutôt que rejouable.
+    """
+
+    name = "memory"
+    blocking = False
+
+    def __init__(
+        self,
+        max_keys: int = 100_000,
+        sweep_interval_seconds: float = 60.0,
+        max_values: int = 10_000,
+    ):
+        self.max_keys = max_keys
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.max_values = max_values
+        self._tat: Dict[str, float] = {}
+        self._next_sweep: Optional[float] = None
+        self._sweep_size = max_keys
+        self._evicted = 0
+        # Ordre d'insertion = ordre d'éviction sur capacité.
+        self._values: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # Tas paresseux : une entrée consommée ou remplacée y reste jusqu'à
+        # son échéance (ignorée si elle ne correspond plus à `_values`).
+        self._expiry: List[Tuple[float, str]] = []
+        self._markers: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._values_expired = 0
+        self._values_evicted = 0
+        self._markers_rejected = 0
+
+    def gcra_allow(self, key: str, now: float, interval: float, window: float) -> Tuple[bool, Optional[float]]:
+        if self._next_sweep is None:
+            self._next_sweep = now + self.sweep_interval_seconds
+        if now >= self._next_sweep or len(self._tat) >= self._sweep_size:
+            self._sweep(now)
+        # Chemin chaud : pas d'appel de fonction au-delà du dict.
+        current = self._tat.get(key)
+        tat = now if current is None or current < now else current
+        tat += interval
+        if tat - now > window:
+            return False, current
+        self._tat[key] = tat
+        return True, tat
+
+    def gcra_refund(self, key: str, now: float, interval: float) -> None:
+        tat = self._tat.get(key)
+        if tat is not None:
+            self._tat[key] = max(tat - interval, now)
+
+    def gcra_tat(self, key: str, now: float) -> Optional[float]:
+        return self._tat.get(key)
+
+    def put(self, key: str, value: str, ttl_seconds: float, now: float) -> None:
+        with self._lock:
+            self._put(key, value, now + ttl_seconds, now)
+
+    def take(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            item = self._values.pop(key, None)
+        if item is None or item[1] < now:
+            return None
+        return item[0]
+
+    def put_if_absent(self, key: str, value: str, ttl_seconds: float, now: float) -> bool:
+        with self._lock:
+            self._purge_values(now)
+            item = self._markers.get(key) or self._values.get(key)
+            if item is not None and item[1] >= now:
+                return False
+            if key not in self._markers and len(self._markers) >= self.max_values:
+                self._markers_rejected += 1
+                return False
+            self._values.pop(key, None)
+            self._markers[key] = (value, now + ttl_seconds)
+            heapq.heappush(self._expiry, (now + ttl_seconds, key))
+            return True
+
+    def purge(self, now: float) -> None:
+        with self._lock:
+            self._purge_values(now)
+
+    def reset(self) -> None:
+        self._tat.clear()
+        self._sweep_size = self.max_keys
+        with self._lock:
+            self._values.clear()
+            self._markers.clear()
+            self._expiry.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "keys": len(self._tat),
+            "evicted": self._evicted,
+            "values": len(self._values),
+            "values_expired": self._values_expired,
+            "values_evicted": self._values_evicted,
+            "markers": len(self._markers),
+            "markers_rejected": self._markers_rejected,
+        }
+
+    def _sweep(self, now: float) -> None:
+        self._next_sweep = now + self.sweep_interval_seconds
+        idle = [key for key, tat in self._tat.items() if tat <= now]
+        for key in idle:
+            del self._tat[key]
+        self._evicted += len(idle)
+        self._sweep_size = max(self.max_keys, 2 * len(self._tat))
+
+    def _put(self, key: str, value: str, expires_at: float, now: float) -> None:
+        # Appelant : verrou tenu.
+        self._purge_values(now)
+        self._values.pop(key, None)
+        self._values[key] = (value, expires_at)
+        heapq.heappush(self._expiry, (expires_at, key))
+        while len(self._values) > self.max_values:
+            self._values.popitem(last=False)
+            self._values_evicted += 1
+
+    def _purge_values(self, now: float) -> None:
+        # Appelant : verrou tenu.
+        expiry = self._expiry
+        while expiry and expiry[0][0] < now:
+            expires_at, key = heapq.heappop(expiry)
+            for entries in (self._values, self._markers):
+                item = entries.get(key)
+                if item is not None and item[1] == expires_at:
+                    del entries[key]
+                    self._values_expired += 1
+        # Entrées périmées (consommées, évincées) : reconstruction si le tas
+        # dépasse nettement le nombre de valeurs vivantes.
+        live = len(self._values) + len(self._markers)
+        if len(expiry) > 2 * live + 64:
+            self._expiry = [
+                (exp, k) for entries in (self._values, self._markers) for k, (_, exp) in entries.items()
+            ]
+            heapq.heapify(self._expiry)
+
+
+class SqliteStore(SharedStore):
+    """Fichier SQLite partagé (WAL) par les workers d'une même machine.
+
+    Appels synchrones courts (fichier local, une requête par opération),
+    exécutés dans un thread par les appelants asynchrones.
+    """
+
+    name = "sqlite"
+
+    # Purge des lignes inactives/expirées toutes les N écritures.
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ready = False
+        self._writes = 0
+
+    def gcra_allow(self, key: str, now: float, interval: float, window: float) -> Tuple[bool, Optional[float]]:
+        with closing(self._connect()) as conn:
+            # Insertion (clé neuve) ou mise à jour conditionnelle : aucune
+            # ligne renvoyée = passage refusé.
+            row = conn.execute(
+                "INSERT INTO gcra (key, tat) VALUES (:key, :now + :interval)"
+                " ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :interval"
+                " WHERE max(tat, :now) + :interval - :now <= :window"
+                " RETURNING tat",
+                {"key": key, "now": now, "interval": interval, "window": window},
+            ).fetchone()
+            if row is not None:
+                self._maybe_purge(conn, now)
+                return True, row[0]
+            # Refus : TAT courante lue sur la même connexion (même appel).
+            row = conn.execute("SELECT tat FROM gcra WHERE key = ?", (key,)).fetchone()
+        return False, row[0] if row else None
+
+    def gcra_refund(self, key: str, now: float, interval: float) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE gcra SET tat = max(tat - ?, ?) WHERE key = ?",
+                (interval, now, key),
+            )
+
+    def gcra_tat(self, key: str, now: float) -> Optional[float]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT tat FROM gcra WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str, ttl_seconds: float, now: float) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl_seconds),
+            )
+            self._maybe_purge(conn, now)
+
+    def take(self, key: str, now: float) -> Optional[str]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "DELETE FROM kv WHERE key = ? RETURNING value, expires_at", (key,)
+            ).fetchone()
+        if row is None or row[1] < now:
+            return None
+        return row[0]
+
+    def put_if_absent(self, key: str, value: str, ttl_seconds: float, now: float) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "INSERT INTO kv (key, value, expires_at) VALUES (:key, :value, :exp)"
+                " ON CONFLICT (key) DO UPDATE SET value = :value, expires_at = :exp"
+                " WHERE expires_at < :now"
+                " RETURNING key",
+                {"key": key, "value": value, "exp": now + ttl_seconds, "now": now},
+            ).fetchone()
+            self._maybe_purge(conn, now)
+        return row is not None
+
+    def purge(self, now: float) -> None:
+        with closing(self._connect()) as conn:
+            self._purge(conn, now)
+
+    def reset(self) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM gcra")
+            conn.execute("DELETE FROM kv")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit : chaque instruction est sa propre transaction atomique.
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS gcra (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._ready = True
+        return conn
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float) -> None:
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge(conn, now)
+
+    def _purge(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM gcra WHERE tat <= ?", (now,))
+        conn.execute("DELETE FROM kv WHERE expires_at < ?", (now,))
+
+
+class RedisStore(SharedStore):
+    """Serveur au protocole Redis ; `client` expose `eval`, `set`,
+    `getdel`, `get` (ex. `redis.Redis`, ou le faux client des tests)."""
+
+    name = "redis"
+
+    # KEYS[1] = clé ; ARGV = now, interval, window. Renvoie {autorisé, TAT}.
+    # Expiration = fin de l'inactivité : l'éviction est faite par Redis.
+    GCRA_ALLOW = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local current = redis.call('GET', KEYS[1])
+local tat = now
+if current and tonumber(current) > now then tat = tonumber(current) end
+tat = tat + interval
+if tat - now > window then return {0, current or false} end
+redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+return {1, tostring(tat)}
+"""
+
+    # KEYS[1] = clé ; ARGV = now, interval.
+    GCRA_REFUND = """
+local current = redis.call('GET', KEYS[1])
+if not current then return 0 end
+local now = tonumber(ARGV[1])
+local tat = math.max(tonumber(current) - tonumber(ARGV[2]), now)
+if tat <= now then redis.call('DEL', KEYS[1]) return 1 end
+redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+return 1
+"""
+
+    def __init__(self, client, prefix: str = "nextarget:"):
+        self.client = client
+        self.prefix = prefix
+
+    def gcra_allow(self, key: str, now: float, interval: float, window: float) -> Tuple[bool, Optional[float]]:
+        allowed, tat = self.client.eval(self.GCRA_ALLOW, 1, self._gcra_key(key), now, interval, window)
+        return bool(allowed), float(tat) if tat else None
+
+    def gcra_refund(self, key: str, now: float, interval: float) -> None:
+        self.client.eval(self.GCRA_REFUND, 1, self._gcra_key(key), now, interval)
+
+    def gcra_tat(self, key: str, now: float) -> Optional[float]:
+        value = self.client.get(self._gcra_key(key))
+        return float(value) if value is not None else None
+
+    def put(self, key: str, value: str, ttl_seconds: float, now: float) -> None:
+        self.client.set(self._kv_key(key), value, px=max(1, int(ttl_seconds * 1000)))
+
+    def take(self, key: str, now: float) -> Optional[str]:
+        value = self.client.getdel(self._kv_key(key))
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def put_if_absent(self, key: str, value: str, ttl_seconds: float, now: float) -> bool:
+        return bool(self.client.set(self._kv_key(key), value, px=max(1, int(ttl_seconds * 1000)), nx=True))
+
+    def _gcra_key(self, key: str) -> str:
+        return f"{self.prefix}gcra:{key}"
+
+    def _kv_key(self, key: str) -> str:
+        return f"{self.prefix}kv:{key}"
+
+
+def build_shared_store() -> SharedStore:
+    settings = get_settings()
+    backend = settings.shared_store_backend.lower()
+    if backend == "memory":
+        return MemoryStore(max_values=settings.oauth_state_max_entries)
+    if backend == "sqlite":
+        return SqliteStore(settings.shared_store_sqlite_path)
+    if backend == "redis":
+        if not settings.redis_url:
+            raise RuntimeError("SHARED_STORE_BACKEND=redis requiert REDIS_URL.")
+        try:
+            import redis  # dépendance optionnelle
+        except ImportError as e:
+            raise RuntimeError("SHARED_STORE_BACKEND=redis requiert le paquet 'redis'.") from e
+        return RedisStore(redis.Redis.from_url(settings.redis_url))
+    raise RuntimeError(f"SHARED_STORE_BACKEND inconnu : {settings.shared_store_backend}")
+
+
+@lru_cache
+def get_shared_store() -> SharedStore:
+    """Stockage partagé du process (backend choisi par les Settings)."""
+    return build_shared_store()
@@ -0,0 +1,67 @@
+"""Coalescence des appels identiques en vol (« single-flight »).
+
+Un double tap ou un retry client peut envoyer la même session deux fois
+pendant que le premier appel Mistral tourne encore : sans coalescence,
+les deux partent chez Mistral et sont facturés. Ici, le premier appel
+pour une clé (empreinte du prompt) lance la coroutine amont ; les appels
+concurrents de même clé attendent le même future et partagent son
+résultat ou son erreur.
+
+L'appel amont n'est annulé que si *tous* ses appelants ont été annulés.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._upstream_calls = 0
+        self._coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self._upstream_calls += 1
+        else:
+            self._coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Dernier appelant annulé : plus personne n'attend le résultat.
+                flight.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "upstream_calls": self._upstream_calls,
+            "coalesced": self._coalesced,
+        }
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+# Analyses coach en vol, par empreinte (cf. analysis_cache.analysis_fingerprint).
+analysis_flights = SingleFlight()
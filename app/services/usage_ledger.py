@@ -0,0 +1,247 @@
+"""Registre de consommation de tokens (table `TokenUsage`) et quotas.
+
+Chaque appel amont Mistral (succès ou échec) y laisse une ligne : user,
+variante, modèle, tokens prompt/complétion, latence, statut.
+
+- Écritures groupées : `record` ne fait qu'empiler en mémoire ; une tâche
+  de fond écrit par lots (`usage_ledger_batch_size` lignes ou toutes les
+  `usage_ledger_flush_interval_seconds`), dans un thread — aucune latence
+  ajoutée aux requêtes. Flush final à l'arrêt de l'app.
+- Quotas : `tokens_today` / `tokens_today_async` (jour UTC) servent au
+  contrôle des quotas quotidiens ; le total est lu en base (dans un thread
+  pour la variante async, appelée par les handlers) puis tenu à jour en
+  mémoire, et relu au plus toutes les `usage_quota_refresh_seconds`.
+- Historique : `usage_by_day` / `usage_by_day_async` (variante
+  `AsyncSession` pour les handlers asynchrones).
+
+Limite multi-workers : le total en mémoire ne compte que la consommation
+du process. Celle des autres workers n'est vue qu'une fois écrite en base
+et relue, soit au plus `usage_quota_refresh_seconds` +
+`usage_ledger_flush_interval_seconds` plus tard : le quota peut être
+dépassé de ce que les autres workers consomment dans ce délai, mais n'est
+pas multiplié par leur nombre.
+"""
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..core.config import get_settings
+from ..core.logging import get_logger
+from ..models.token_usage import TokenUsage
+from .database import engine
+
+logger = get_logger("nextarget.usage")
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _day_start(day: date) -> datetime:
+    # Naïf-UTC, comme les dates persistées.
+    return datetime.combine(day, time.min)
+
+
+class UsageLedger:
+    def __init__(self, batch_size: int, flush_interval_seconds: float, quota_refresh_seconds: float = 60.0):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.quota_refresh_seconds = quota_refresh_seconds
+        self._pending: List[TokenUsage] = []
+        self._writing: List[TokenUsage] = []
+        # user_id -> (jour UTC, total, date de lecture en base (monotonic)).
+        self._daily: Dict[str, Tuple[date, int, float]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._written = 0
+        self._dropped = 0
+
+    async def start(self) -> None:
+        """Démarre l'écrivain de fond. Idempotent."""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._writer(), name="usage-ledger-writer")
+
+    async def stop(self) -> None:
+        """Arrête l'écrivain et écrit ce qui reste en mémoire."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+
+    def record(
+        self,
+        user_id: str,
+        prompt_variant: str,
+        model: str,
+        prompt_tokens: Optional[int],
+        completion_tokens: Optional[int],
+        latency_ms: int,
+        status: int = 200,
+    ) -> None:
+        row = TokenUsage(
+            user_id=user_id,
+            prompt_variant=prompt_variant,
+            model=model,
+            prompt_tokens=prompt_tokens or 0,
+            completion_tokens=completion_tokens or 0,
+            latency_ms=latency_ms,
+            status=status,
+        )
+        self._pending.append(row)
+        daily = self._daily.get(user_id)
+        if daily is not None and daily[0] == _utc_today():
+            self._daily[user_id] = (daily[0], daily[1] + row.prompt_tokens + row.completion_tokens, daily[2])
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """Écrit immédiatement les lignes en attente."""
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        self._writing.extend(rows)
+        try:
+            await asyncio.to_thread(self._write, rows)
+            self._written += len(rows)
+        except Exception:
+            self._dropped += len(rows)
+            logger.exception("usage ledger flush failed", extra={"rows": len(rows)})
+        finally:
+            del self._writing[: len(rows)]
+
+    def tokens_today(self, user_id: str) -> int:
+        """Tokens (prompt + complétion) consommés par l'utilisateur depuis
+        minuit UTC, lignes non encore écrites comprises."""
+        today = _utc_today()
+        cached = self._cached_today(user_id, today)
+        if cached is not None:
+            return cached
+        unsaved = self._unsaved(user_id)
+        return self._remember(user_id, today, self._stored_today(user_id, today), unsaved)
+
+    async def tokens_today_async(self, user_id: str) -> int:
+        """`tokens_today` sans bloquer la boucle : lecture en base dans un thread."""
+        today = _utc_today()
+        cached = self._cached_today(user_id, today)
+        if cached is not None:
+            return cached
+        unsaved = self._unsaved(user_id)
+        stored = await asyncio.to_thread(self._stored_today, user_id, today)
+        # Lignes enregistrées pendant la lecture : ajoutées (une ligne écrite
+        # entre-temps peut être comptée deux fois — excès, jamais défaut).
+        unsaved.update(self._unsaved(user_id))
+        return self._remember(user_id, today, stored, unsaved)
+
+    def _cached_today(self, user_id: str, today: date) -> Optional[int]:
+        daily = self._daily.get(user_id)
+        if (
+            daily is not None
+            and daily[0] == today
+            and monotonic() - daily[2] < self.quota_refresh_seconds
+        ):
+            return daily[1]
+        return None
+
+    def _unsaved(self, user_id: str) -> Dict[int, int]:
+        # id(ligne) -> tokens, lignes pas encore en base.
+        return {
+            id(row): row.prompt_tokens + row.completion_tokens
+            for row in (*self._writing, *self._pending)
+            if row.user_id == user_id
+        }
+
+    def _remember(self, user_id: str, today: date, stored: int, unsaved: Dict[int, int]) -> int:
+        total = stored + sum(unsaved.values())
+        self._daily[user_id] = (today, total, monotonic())
+        return total
+
+    @staticmethod
+    def _stored_today(user_id: str, today: date) -> int:
+        with Session(engine) as session:
+            stored = session.exec(
+                select(func.coalesce(func.sum(TokenUsage.prompt_tokens + TokenUsage.completion_tokens), 0))
+                .where(TokenUsage.user_id == user_id, TokenUsage.created_at >= _day_start(today))
+            ).one()
+        return int(stored)
+
+    def reset(self) -> None:
+        self._pending.clear()
+        self._daily.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "written": self._written,
+            "dropped": self._dropped,
+        }
+
+    # -- internals ------------------------------------------------------------
+
+    async def _writer(self) -> None:
+        assert self._wakeup is not None
+        wakeup = self._wakeup
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            await self.flush()
+
+    @staticmethod
+    def _write(rows: List[TokenUsage]) -> None:
+        with Session(engine) as session:
+            session.add_all(rows)
+            session.commit()
+
+
+def usage_by_day(session: Session, user_id: str, days: int) -> List[Tuple[str, str, int, int, int]]:
+    """Agrégat par jour (UTC) et par variante sur les `days` derniers jours.
+
+    Returns:
+        Liste de tuples (jour ISO, variante, appels, tokens prompt,
+        tokens complétion), jours les plus récents d'abord.
+    """
+    return _usage_rows(session.exec(_usage_query(user_id, days)).all())
+
+
+async def usage_by_day_async(session: AsyncSession, user_id: str, days: int) -> List[Tuple[str, str, int, int, int]]:
+    return _usage_rows((await session.exec(_usage_query(user_id, days))).all())
+
+
+def _usage_query(user_id: str, days: int):
+    since = _day_start(_utc_today() - timedelta(days=days - 1))
+    day = func.date(TokenUsage.created_at)
+    return (
+        select(
+            day,
+            TokenUsage.prompt_variant,
+            func.count(),
+            func.sum(TokenUsage.prompt_tokens),
+            func.sum(TokenUsage.completion_tokens),
+        )
+        .where(TokenUsage.user_id == user_id, TokenUsage.created_at >= since)
+        .group_by(day, TokenUsage.prompt_variant)
+        .order_by(day.desc(), TokenUsage.prompt_variant)
+    )
+
+
+def _usage_rows(rows) -> List[Tuple[str, str, int, int, int]]:
+    return [(str(d), variant, calls, int(p or 0), int(c or 0)) for d, variant, calls, p, c in rows]
+
+
+_settings = get_settings()
+usage_ledger = UsageLedger(
+    batch_size=_settings.usage_ledger_batch_size,
+    flush_interval_seconds=_settings.usage_ledger_flush_interval_seconds,
+    quota_refresh_seconds=_settings.usage_quota_refresh_seconds,
+)
@@ -0,0 +1,82 @@
+"""Cache des utilisateurs authentifiés (dépendance `get_current_user`).
+
+Chaque requête protégée (/users/me, /coach/*…) relisait son `User` en base.
+Ici, un LRU en mémoire process garde un instantané (valeurs des colonnes)
+par id pendant `user_cache_ttl_seconds` :
+
+- invalidation explicite quand l'utilisateur change (PATCH profil, données
+  IdP rafraîchies au login) ;
+- le TTL borne le délai de prise en compte d'un changement fait ailleurs
+  (autre worker, désactivation `is_active` en base) ;
+- un hit renvoie un `User` neuf (transitoire) construit depuis l'instantané :
+  aucun objet partagé entre requêtes. Les handlers qui écrivent relisent
+  l'utilisateur dans leur session.
+
+`user_cache_ttl_seconds=0` désactive le cache.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.config import get_settings
+from ..models.user import User
+
+# Colonnes de la table : l'instantané ne dépend pas de `dict()` (déprécié
+# par SQLModel) et ne porte que des valeurs persistées.
+_COLUMNS = tuple(column.key for column in User.__table__.columns)  # type: ignore[attr-defined]
+
+
+class UserCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self._misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self._hits += 1
+        return User(**entry[0])
+
+    def put(self, user: User) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[user.id] = ({name: getattr(user, name) for name in _COLUMNS}, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        if self._entries.pop(user_id, None) is not None:
+            self._invalidations += 1
+
+    def reset(self) -> None:
+        self._entries.clear()
+        self._hits = self._misses = self._invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+            # Chaque hit est une requête SQL évitée.
+            "db_lookups_avoided": self._hits,
+            "invalidations": self._invalidations,
+        }
+
+
+_settings = get_settings()
+user_cache = UserCache(
+    max_entries=_settings.user_cache_max_entries,
+    ttl_seconds=_settings.user_cache_ttl_seconds,
+)
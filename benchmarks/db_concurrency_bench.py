@@ -0,0 +1,153 @@
+"""Benchmark de concurrence : accès base sync (boucle bloquée) vs async.
+
+Usage (depuis la racine du repo) :
+
+    python -m benchmarks.db_concurrency_bench --requests 400 --concurrency 10
+
+Trafic mixte en process (transport ASGI, aucun réseau) : moitié
+`GET /users/me` (authentification seule), moitié `POST /coach/analyze-session`
+(Mistral simulé par un `asyncio.sleep`). Deux variantes de la dépendance
+`get_current_user` :
+
+- sync : l'ancienne implémentation, `Session` synchrone appelée sur la boucle ;
+- async : l'implémentation actuelle (`AsyncSession`, aiosqlite).
+
+Une latence de base est simulée par requête SQL (`--db-latency-ms`, écouteur
+`before_cursor_execute`), comme un serveur distant : avec le pilote sync elle
+bloque la boucle, avec le pilote async elle est subie dans le thread du pilote.
+Base SQLite temporaire, supprimée à la fin.
+
+Concurrence volontairement sous la taille du pool sync (5 + 10) : au-delà,
+la variante sync bloque la boucle en attendant une connexion que seule la
+boucle peut rendre (timeout du pool, 30 s par requête).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_DB_DIR = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR.name}/bench.db"
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ["DEBUG"] = "false"  # pas d'echo SQL
+os.environ["LOG_LEVEL"] = "WARNING"  # pas de log par requête
+
+from fastapi import Depends, HTTPException  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.api import coach  # noqa: E402
+from app.api.deps import get_current_user, oauth2_scheme  # noqa: E402
+from app.core.security import create_access_token, decode_token  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services import mistral_client  # noqa: E402
+from app.services.database import async_engine, engine, get_session, init_db  # noqa: E402
+from app.services.mistral_client import MistralCompletion  # noqa: E402
+from app.services.rate_limiter import GcraRateLimiter  # noqa: E402
+
+
+async def sync_get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
+    """Ancienne dépendance : requête synchrone sur la boucle."""
+    user_id = decode_token(token).get("sub")
+    user = session.exec(select(User).where(User.id == user_id)).first()
+    if not user:
+        raise HTTPException(status_code=401)
+    return user
+
+
+def _payload(i: int) -> dict:
+    # Séances distinctes : pas de hit du cache d'analyses.
+    return {
+        "session": {
+            "weapon": "Glock 17",
+            "caliber": "9mm",
+            "series": [{"shot_count": 5, "distance": 25, "points": i % 50, "group_size_cm": 8.5}],
+            "synthese": f"séance {i}",
+        },
+        "prompt_variant": "coach_neutre",
+    }
+
+
+async def _run(tokens, requests: int, concurrency: int) -> dict:
+    latencies = {"auth": [], "coach": []}
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = ASGITransport(app=app)
+
+    async def one(i: int, ac: AsyncClient) -> None:
+        headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+        kind = "auth" if i % 2 else "coach"
+        async with semaphore:
+            start = time.perf_counter()
+            if kind == "auth":
+                r = await ac.get("/users/me", headers=headers)
+            else:
+                r = await ac.post("/coach/analyze-session", json=_payload(i), headers=headers)
+            latencies[kind].append(time.perf_counter() - start)
+        assert r.status_code == 200, (kind, r.status_code, r.text)
+
+    async with AsyncClient(transport=transport, base_url="https://bench") as ac:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i, ac) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, **latencies}
+
+
+def _p95(values) -> float:
+    return statistics.quantiles(values, n=20)[-1] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--mistral-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    init_db()
+    with Session(engine) as session:
+        users = [User(email=f"bench{i}@example.com", provider="google") for i in range(args.users)]
+        session.add_all(users)
+        session.commit()
+        tokens = [create_access_token(sub=u.id) for u in users]
+
+    db_latency = args.db_latency_ms / 1000
+
+    def slow_query(*_args, **_kwargs):
+        time.sleep(db_latency)
+
+    event.listen(engine, "before_cursor_execute", slow_query)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", slow_query)
+
+    async def fake_fetch(prompt, **kwargs):
+        await asyncio.sleep(args.mistral_latency_ms / 1000)
+        return MistralCompletion(content="Analyse.", model="bench", prompt_tokens=100, completion_tokens=50)
+
+    mistral_client.fetch_analysis = fake_fetch
+    coach.coach_rate_limiter = GcraRateLimiter(max_requests=10**9, window_seconds=1)
+
+    print(
+        f"{args.requests} requests (1/2 /users/me, 1/2 /coach/analyze-session), "
+        f"concurrency {args.concurrency}, db {args.db_latency_ms} ms/query, "
+        f"mistral {args.mistral_latency_ms} ms"
+    )
+    for name, override in (("sync session", sync_get_current_user), ("async session", None)):
+        app.dependency_overrides.clear()
+        if override is not None:
+            app.dependency_overrides[get_current_user] = override
+        result = asyncio.run(_run(tokens, args.requests, args.concurrency))
+        print(
+            f"{name:<14} {args.requests / result['elapsed']:7.1f} req/s   "
+            f"p95 /users/me {_p95(result['auth']):7.1f} ms   "
+            f"p95 coach {_p95(result['coach']):7.1f} ms"
+        )
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
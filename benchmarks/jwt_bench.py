@@ -0,0 +1,61 @@
+"""Micro-benchmark des jetons JWT (core/security).
+
+Usage (depuis la racine du repo) :
+
+    python -m benchmarks.jwt_bench --iterations 20000
+
+Mesure le coût par appel de :
+
+- `create_access_token` ;
+- `decode_token` sur un même jeton rejoué (cas d'un client mobile qui
+  renvoie son access token à chaque requête) et sur des jetons tous
+  différents (première vue de chaque jeton) ;
+- `verify_callback_token`.
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+
+from app.core import security  # noqa: E402
+from app.core.security import (  # noqa: E402
+    create_access_token,
+    create_callback_token,
+    decode_token,
+    verify_callback_token,
+)
+
+
+def _bench(name: str, fn, args) -> None:
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {elapsed / len(args) * 1e6:7.2f} µs/op")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    subs = [f"user-{i}" for i in range(n)]
+    _bench("create_access_token", create_access_token, subs)
+
+    token = create_access_token(sub="user-0")
+    _bench("decode_token (same token)", decode_token, [token] * n)
+    tokens = [create_access_token(sub=sub) for sub in subs]
+    _bench("decode_token (distinct tokens)", decode_token, tokens)
+
+    callback = create_callback_token(sub="user-0", provider="google", email="tireur@example.com")
+    _bench("verify_callback_token", verify_callback_token, [callback] * n)
+
+    stats = getattr(security, "jwt_cache", None)
+    if stats is not None:
+        print(stats.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Micro-benchmark : fenêtre glissante (deque par clé) vs GCRA (un float par clé).
+
+Usage (depuis la racine du repo) :
+
+    python -m benchmarks.rate_limiter_bench --keys 1000000
+
+Mesure, pour chaque limiteur : durée d'un premier passage (création des
+clés), d'un second passage (clés existantes) et mémoire retenue
+(tracemalloc) une fois toutes les clés vues.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from app.services.rate_limiter import GcraRateLimiter, InMemoryRateLimiter
+
+
+def _bench(name: str, limiter, keys) -> None:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for key in keys:
+        limiter.allow(key)
+    first = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for key in keys:
+        limiter.allow(key)
+    second = time.perf_counter() - start
+
+    n = len(keys)
+    print(
+        f"{name:<22} new keys {first / n * 1e9:7.0f} ns/op   "
+        f"existing keys {second / n * 1e9:7.0f} ns/op   "
+        f"memory {retained / 2**20:8.1f} MiB ({retained / n:5.0f} B/key)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    keys = [f"user-{i}" for i in range(args.keys)]
+    print(f"{args.keys} keys, 2 calls per key")
+    _bench("sliding window (deque)", InMemoryRateLimiter(max_requests=10, window_seconds=300), keys)
+    # max_keys au-dessus du nombre de clés : mesure du coût nominal, sans balayage.
+    _bench("GCRA (float)", GcraRateLimiter(max_requests=10, window_seconds=300, max_keys=args.keys + 1), keys)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,11 @@
 
 - `client()`: AsyncClient wired to the app via ASGITransport (no deprecated
   `app=` shortcut, no network).
-- `reset_db`: fresh schema between tests (autouse).
+- `reset_db`: fresh schema and empty user cache between tests (autouse).
+- `reset_coach_state`: empty coach rate limiter, analysis cache and usage
+  ledger around a test (opt-in, for the coach suites).
+- `auth_headers()` / `VALID_PAYLOAD`: a stored user's bearer header and a
+  valid coach analysis request.
 - `google_configured` / `facebook_configured`: force provider config on the
   module-level settings objects.
 - Google/Facebook HTTP exchanges are mocked in tests; nothing ever calls
@@ -12,10 +16,29 @@ from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from httpx import ASGITransport, AsyncClient
-from sqlmodel import SQLModel
+from sqlmodel import Session, SQLModel
 
+from app.core.security import create_access_token, jwt_cache
 from app.main import app
+from app.models.user import User
+from app.services.analysis_cache import analysis_cache
 from app.services.database import engine
+from app.services.mistral_client import MistralCompletion
+from app.services.rate_limiter import coach_rate_limiter
+from app.services.usage_ledger import usage_ledger
+from app.services.user_cache import user_cache
+
+VALID_PAYLOAD = {
+    "session": {
+        "weapon": "Glock 17",
+        "caliber": "9mm",
+        "series": [
+            {"shot_count": 5, "distance": 25, "points": 45, "group_size_cm": 8.5, "comment": "stable"},
+        ],
+        "synthese": "RAS",
+    },
+    "prompt_variant": "coach_neutre",
+}
 
 
 def client() -> AsyncClient:
@@ -31,9 +54,30 @@ def client() -> AsyncClient:
 def reset_db():
     SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
+    user_cache.reset()
+    jwt_cache.reset()
     yield
 
 
+@pytest.fixture
+def reset_coach_state():
+    coach_rate_limiter.reset()
+    analysis_cache.clear()
+    usage_ledger.reset()
+    yield
+    usage_ledger.reset()
+
+
+def auth_headers(email="tireur@example.com") -> dict:
+    """Store a Google user and return its bearer Authorization header."""
+    with Session(engine) as session:
+        user = User(email=email, provider="google")
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+    return {"Authorization": f"Bearer {create_access_token(sub=user.id)}"}
+
+
 @pytest.fixture
 def google_configured(monkeypatch):
     """Force a valid Google OAuth configuration."""
@@ -63,14 +107,15 @@ def facebook_configured(monkeypatch):
 
 
 def mock_async_http_client(responses):
-    """Build a mocked `httpx.AsyncClient` context manager.
+    """Build a mocked `httpx.AsyncClient` (usable as a context manager).
 
     Args:
         responses: list of MagicMock responses returned in order by
             successive `get`/`post` calls (shared queue).
 
     Returns:
-        A MagicMock suitable for `patch("...httpx.AsyncClient", return_value=...)`.
+        A MagicMock suitable for `patch("...httpx.AsyncClient", return_value=...)`
+        or `patch("app.services.oauth_http.get_client", return_value=...)`.
     """
     queue = list(responses)
 
@@ -91,3 +136,13 @@ def http_response(status_code=200, json_body=None, text=""):
     resp = MagicMock(status_code=status_code, text=text)
     resp.json = MagicMock(return_value=json_body or {})
     return resp
+
+
+def completion(content="Analyse test.", model="mistral-small-latest", prompt_tokens=None, completion_tokens=None):
+    """Mocked `mistral_client.fetch_analysis` result."""
+    return MistralCompletion(
+        content=content,
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+    )
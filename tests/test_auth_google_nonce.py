@@ -4,7 +4,7 @@ The Google token exchange and id_token verification are mocked: no real
 network call is made. First building block of the mocked-provider test
 suite (NT-054).
 """
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
 
@@ -13,9 +13,9 @@ from tests.conftest import client, http_response, mock_async_http_client
 
 
 def _mock_token_exchange():
-    """Mock httpx.AsyncClient so the code exchange returns a fake id_token."""
+    """Mock the shared Google HTTP client so the code exchange returns a fake id_token."""
     mocked = mock_async_http_client([http_response(200, {"id_token": "fake-id-token"})])
-    return patch("app.api.auth_google.httpx.AsyncClient", return_value=mocked)
+    return patch("app.services.oauth_http.get_client", return_value=mocked)
 
 
 def _claims(nonce=None, **overrides):
@@ -33,8 +33,8 @@ def _claims(nonce=None, **overrides):
 
 async def _call_callback(state: str, claims: dict):
     with _mock_token_exchange(), patch(
-        "app.api.auth_google.id_token.verify_oauth2_token",
-        return_value=claims,
+        "app.api.auth_google.google_id_token.verify_id_token",
+        AsyncMock(return_value=claims),
     ):
         async with client() as ac:
             return await ac.get(
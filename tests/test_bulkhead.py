@@ -0,0 +1,147 @@
+"""Global outbound concurrency bulkhead (bounded queue + load shedding)."""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.bulkhead import Bulkhead, BulkheadFullError
+
+
+@pytest.mark.asyncio
+async def test_calls_beyond_capacity_wait_for_a_slot_in_fifo_order():
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=5, max_wait_seconds=1)
+    order = []
+
+    await bulkhead.acquire()
+
+    async def waiter(name):
+        async with bulkhead.slot():
+            order.append(name)
+
+    tasks = [asyncio.create_task(waiter(n)) for n in ("a", "b")]
+    await asyncio.sleep(0)
+    assert bulkhead.stats()["queued"] == 2
+
+    bulkhead.release()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b"]
+    assert bulkhead.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_fails_fast():
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=0, max_wait_seconds=5)
+    await bulkhead.acquire()
+
+    with pytest.raises(BulkheadFullError) as exc:
+        await bulkhead.acquire()
+    assert exc.value.retry_after == 5
+    assert bulkhead.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_is_bounded():
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=5, max_wait_seconds=0.05)
+    await bulkhead.acquire()
+
+    with pytest.raises(BulkheadFullError):
+        await bulkhead.acquire()
+    stats = bulkhead.stats()
+    assert stats["queued"] == 0
+    assert stats["wait_ms_max"] >= 40
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=5, max_wait_seconds=5)
+    await bulkhead.acquire()
+
+    task = asyncio.create_task(bulkhead.acquire())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    bulkhead.release()
+    assert bulkhead.stats()["active"] == 0
+    assert bulkhead.stats()["queued"] == 0
+
+
+async def _drain(bulkhead, queued):
+    """Hold the single slot, queue `queued` (key, weight) calls, return grant order."""
+    order = []
+
+    async def waiter(key, weight):
+        async with bulkhead.slot(key=key, weight=weight):
+            order.append(key)
+
+    await bulkhead.acquire()
+    tasks = [asyncio.create_task(waiter(k, w)) for k, w in queued]
+    await asyncio.sleep(0)
+    bulkhead.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_heavy_user_does_not_starve_others():
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=20, max_wait_seconds=1)
+    queued = [("heavy", 1.0)] * 4 + [("light-a", 1.0), ("light-b", 1.0)]
+
+    order = await _drain(bulkhead, queued)
+    # Round-robin across users instead of arrival order.
+    assert order[:3] == ["heavy", "light-a", "light-b"]
+
+
+@pytest.mark.asyncio
+async def test_weights_skew_the_share_of_slots():
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=20, max_wait_seconds=1)
+    queued = [("expert", 2.0)] * 4 + [("beginner", 1.0)] * 4
+
+    order = await _drain(bulkhead, queued)
+    assert order[:6].count("expert") == 4
+
+
+@pytest.mark.asyncio
+async def test_per_user_queue_depth_is_aggregated():
+    bulkhead = Bulkhead(max_concurrency=1, max_queue=20, max_wait_seconds=1)
+    await bulkhead.acquire()
+    tasks = [asyncio.create_task(bulkhead.acquire(key=k)) for k in ("a", "a", "a", "b")]
+    await asyncio.sleep(0)
+
+    stats = bulkhead.stats()
+    assert (stats["queued"], stats["queued_users"], stats["max_user_queue_depth"]) == (4, 2, 3)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert bulkhead.stats()["queued_users"] == 0
+
+
+def test_fair_queue_weights_follow_experience_level(monkeypatch):
+    from app.core.config import get_settings
+    from app.models.user import User
+    from app.services.coach_analysis import user_weight
+
+    monkeypatch.setattr(get_settings(), "mistral_fair_queue_weights", "expert=2, advanced=1.5")
+    assert user_weight(User(email="e", provider="google", experience_level="expert")) == 2.0
+    assert user_weight(User(email="b", provider="google", experience_level="beginner")) == 1.0
+    assert user_weight(None) == 1.0
+
+
+@pytest.mark.asyncio
+async def test_overloaded_coach_returns_503_with_retry_after(reset_coach_state):
+    from app.services.mistral_client import MistralClientError
+    from tests.conftest import VALID_PAYLOAD, auth_headers, client
+
+    headers = auth_headers()
+    overloaded = AsyncMock(side_effect=MistralClientError("Coach IA surchargé.", status_code=503, retry_after=10))
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=overloaded):
+        async with client() as ac:
+            r = await ac.post(
+                "/coach/analyze-session",
+                json=VALID_PAYLOAD,
+                headers=headers,
+            )
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "10"
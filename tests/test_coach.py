@@ -5,13 +5,15 @@ from sqlmodel import Session
 from app.services.database import engine
 from app.models.user import User
 from app.core.security import create_access_token
+from app.services.analysis_cache import analysis_cache
 from app.services.rate_limiter import coach_rate_limiter
-from tests.conftest import client
+from tests.conftest import VALID_PAYLOAD, client, completion
 
 
 @pytest.fixture(autouse=True, scope="function")
 def reset_rate_limiter():
-    coach_rate_limiter._hits.clear()
+    coach_rate_limiter.reset()
+    analysis_cache.clear()
     yield
 
 
@@ -24,19 +26,6 @@ def _make_user() -> User:
         return user
 
 
-VALID_PAYLOAD = {
-    "session": {
-        "weapon": "Glock 17",
-        "caliber": "9mm",
-        "series": [
-            {"shot_count": 5, "distance": 25, "points": 45, "group_size_cm": 8.5, "comment": "stable"},
-        ],
-        "synthese": "RAS",
-    },
-    "prompt_variant": "coach_neutre",
-}
-
-
 @pytest.mark.asyncio
 async def test_analyze_session_requires_auth():
     async with client() as ac:
@@ -49,7 +38,7 @@ async def test_analyze_session_success():
     user = _make_user()
     token = create_access_token(sub=user.id)
 
-    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value="Analyse test.")):
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("Analyse test."))):
         async with client() as ac:
             r = await ac.post(
                 "/coach/analyze-session",
@@ -70,7 +59,7 @@ async def test_analyze_session_mistral_timeout_returns_504():
     user = _make_user()
     token = create_access_token(sub=user.id)
 
-    async def raise_timeout(prompt):
+    async def raise_timeout(prompt, **kwargs):
         raise MistralClientError("Le modèle ne répond pas (timeout).", status_code=504)
 
     with patch("app.api.coach.mistral_client.fetch_analysis", new=raise_timeout):
@@ -105,7 +94,7 @@ async def test_analyze_session_rate_limited_after_threshold():
     user = _make_user()
     token = create_access_token(sub=user.id)
 
-    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value="ok")):
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("ok"))):
         async with client() as ac:
             statuses = []
             for _ in range(11):
@@ -117,6 +106,25 @@ async def test_analyze_session_rate_limited_after_threshold():
                 statuses.append(r.status_code)
     assert statuses[-1] == 429
     assert statuses.count(200) == 10
+    assert r.headers["X-RateLimit-Remaining"] == "0"
+    assert int(r.headers["Retry-After"]) == 30  # 300 s / 10 requests
+
+
+@pytest.mark.asyncio
+async def test_analyze_session_reports_rate_limit_headers():
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("ok"))):
+        async with client() as ac:
+            r = await ac.post(
+                "/coach/analyze-session",
+                json=VALID_PAYLOAD,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+    assert r.headers["X-RateLimit-Limit"] == "10"
+    assert r.headers["X-RateLimit-Remaining"] == "9"
+    assert 0 < int(r.headers["X-RateLimit-Reset"]) <= 30
 
 
 @pytest.mark.asyncio
@@ -128,7 +136,7 @@ async def test_analyze_session_accepts_coach_cool_variant():
     payload = dict(VALID_PAYLOAD)
     payload["prompt_variant"] = "coach_cool"
 
-    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value="Analyse cool.")):
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("Analyse cool."))):
         async with client() as ac:
             r = await ac.post(
                 "/coach/analyze-session",
@@ -158,3 +166,387 @@ def test_prompt_builder_variants_produce_distinct_prompts():
     for prompt in (neutral, cool):
         assert "Glock 17" in prompt
         assert "Groupement=8.5cm" in prompt
+
+
+@pytest.mark.asyncio
+async def test_analyze_session_repeat_is_served_from_cache():
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+    fetch = AsyncMock(return_value=completion("Analyse test."))
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=fetch):
+        async with client() as ac:
+            first = await ac.post(
+                "/coach/analyze-session",
+                json=VALID_PAYLOAD,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            second = await ac.post(
+                "/coach/analyze-session",
+                json=VALID_PAYLOAD,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+
+    assert fetch.await_count == 1
+    assert first.json()["cached"] is False
+    assert second.json()["cached"] is True
+    assert second.json()["analysis"] == "Analyse test."
+    assert second.json()["generated_at"] == first.json()["generated_at"]
+
+
+@pytest.mark.asyncio
+async def test_analysis_cache_sqlite_tier_survives_memory_loss(tmp_path):
+    from datetime import datetime, timezone
+
+    from app.services.analysis_cache import AnalysisCache, CachedAnalysis, analysis_fingerprint
+
+    cache = AnalysisCache(max_entries=10, ttl_seconds=60, sqlite_path=str(tmp_path / "cache.db"))
+    key = analysis_fingerprint("prompt", "mistral-small-latest")
+    entry = CachedAnalysis("Analyse.", "mistral-small-latest", datetime.now(timezone.utc))
+    await cache.set(key, entry)
+
+    cache.clear()  # simulate a restart: memory tier lost
+    assert await cache.get(key) == entry
+    assert await cache.get(analysis_fingerprint("prompt", "other-model")) is None
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_analysis_cache_lru_eviction_and_ttl(monkeypatch):
+    from datetime import datetime, timezone
+
+    from app.services import analysis_cache as cache_module
+
+    cache = cache_module.AnalysisCache(max_entries=2, ttl_seconds=10)
+    entry = cache_module.CachedAnalysis("a", "m", datetime.now(timezone.utc))
+    for key in ("k1", "k2", "k3"):
+        await cache.set(key, entry)
+    assert await cache.get("k1") is None  # evicted (LRU)
+    assert await cache.get("k3") == entry
+
+    now = cache_module.time.time()
+    monkeypatch.setattr(cache_module.time, "time", lambda: now + 11)
+    assert await cache.get("k3") is None  # expired
+
+
+def _sse_events(body: str):
+    """Parse a text/event-stream body into (event, data) tuples."""
+    import json
+
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_analyze_session_stream_relays_tokens_as_sse():
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+
+    async def fake_stream(prompt, **kwargs):
+        for part in ("Bonne ", "session."):
+            yield part
+
+    with patch("app.api.coach.mistral_client.stream_analysis", new=fake_stream):
+        async with client() as ac:
+            r = await ac.post(
+                "/coach/analyze-session/stream",
+                json=VALID_PAYLOAD,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(r.text)
+    assert [e for e, _ in events] == ["token", "token", "done"]
+    assert "".join(d["text"] for e, d in events if e == "token") == "Bonne session."
+    assert events[-1][1]["cached"] is False
+
+    # The completed stream feeds the cache used by the buffered endpoint.
+    async with client() as ac:
+        r = await ac.post(
+            "/coach/analyze-session",
+            json=VALID_PAYLOAD,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    assert r.json()["analysis"] == "Bonne session."
+    assert r.json()["cached"] is True
+
+
+@pytest.mark.asyncio
+async def test_analyze_session_stream_maps_upstream_error_before_first_token():
+    from app.services.mistral_client import MistralClientError
+
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+
+    async def failing_stream(prompt, **kwargs):
+        raise MistralClientError("Le modèle ne répond pas (timeout).", status_code=504)
+        yield  # pragma: no cover (makes this an async generator)
+
+    with patch("app.api.coach.mistral_client.stream_analysis", new=failing_stream):
+        async with client() as ac:
+            r = await ac.post(
+                "/coach/analyze-session/stream",
+                json=VALID_PAYLOAD,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+    assert r.status_code == 504
+
+
+@pytest.mark.asyncio
+async def test_analyze_session_stream_reports_mid_stream_error_as_event():
+    from app.services.mistral_client import MistralClientError
+
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+
+    async def broken_stream(prompt, **kwargs):
+        yield "Début"
+        raise MistralClientError("Erreur réseau vers Mistral: reset", status_code=502)
+
+    with patch("app.api.coach.mistral_client.stream_analysis", new=broken_stream):
+        async with client() as ac:
+            r = await ac.post(
+                "/coach/analyze-session/stream",
+                json=VALID_PAYLOAD,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+    events = _sse_events(r.text)
+    assert events[0] == ("token", {"text": "Début"})
+    assert events[-1][0] == "error"
+    assert events[-1][1]["status_code"] == 502
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_analyses_share_one_mistral_call():
+    import asyncio
+
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+    release = asyncio.Event()
+    calls = 0
+
+    async def slow_fetch(prompt, **kwargs):
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return completion("Analyse partagée.")
+
+    async def post(ac):
+        return await ac.post(
+            "/coach/analyze-session",
+            json=VALID_PAYLOAD,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=slow_fetch):
+        async with client() as ac:
+            pending = [asyncio.create_task(post(ac)) for _ in range(2)]
+            while calls == 0:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            release.set()
+            responses = await asyncio.gather(*pending)
+
+    assert calls == 1
+    assert [r.status_code for r in responses] == [200, 200]
+    assert {r.json()["analysis"] for r in responses} == {"Analyse partagée."}
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_upstream_and_refunds_rate_limit(monkeypatch):
+    import asyncio
+
+    from starlette.requests import Request
+
+    from app.api import coach
+    from app.core.logging import request_id_var
+
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+    cancelled = asyncio.Event()
+
+    async def hanging_fetch(prompt, **kwargs):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    logged = []
+    monkeypatch.setattr(coach, "DISCONNECT_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(Request, "is_disconnected", AsyncMock(return_value=True))
+    monkeypatch.setattr(coach.logger, "info", lambda msg, *a, **kw: logged.append((msg, request_id_var.get())))
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=hanging_fetch):
+        async with client() as ac:
+            r = await ac.post(
+                "/coach/analyze-session",
+                json=VALID_PAYLOAD,
+                headers={"Authorization": f"Bearer {token}", "X-Request-ID": "req-abc"},
+            )
+
+    assert r.status_code == 499
+    assert cancelled.is_set()
+    assert coach_rate_limiter.remaining(user.id) == coach_rate_limiter.max_requests  # refunded
+    assert ("coach analysis cancelled: client disconnected", "req-abc") in logged
+
+
+def _batch_payload(count):
+    sessions = []
+    for i in range(count):
+        session = dict(VALID_PAYLOAD["session"])
+        session["synthese"] = f"Séance {i}"
+        sessions.append(session)
+    return {"sessions": sessions, "prompt_variant": "coach_neutre"}
+
+
+@pytest.mark.asyncio
+async def test_analyze_sessions_fans_out_and_reports_per_item_errors():
+    import asyncio
+
+    from app.services.mistral_client import MistralClientError
+
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+    concurrent = peak = 0
+
+    async def fetch(prompt, **kwargs):
+        nonlocal concurrent, peak
+        concurrent += 1
+        peak = max(peak, concurrent)
+        await asyncio.sleep(0.02)
+        concurrent -= 1
+        if "Séance 1" in prompt:
+            raise MistralClientError("Le modèle ne répond pas (timeout).", status_code=504)
+        return completion(f"Analyse {prompt[-8:]}")
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=fetch):
+        async with client() as ac:
+            r = await ac.post(
+                "/coach/analyze-sessions",
+                json=_batch_payload(3),
+                headers={"Authorization": f"Bearer {token}"},
+            )
+
+    assert r.status_code == 200
+    items = r.json()["items"]
+    assert [item["index"] for item in items] == [0, 1, 2]
+    assert items[0]["result"]["analysis"] == "Analyse Séance 0"
+    assert items[1]["result"] is None
+    assert items[1]["error"]["status_code"] == 504
+    assert items[2]["result"]["analysis"] == "Analyse Séance 2"
+    assert peak > 1  # upstream calls overlapped
+
+
+@pytest.mark.asyncio
+async def test_analyze_sessions_counts_each_item_against_rate_limit():
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+    for _ in range(coach_rate_limiter.max_requests - 1):
+        coach_rate_limiter.allow(user.id)
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("ok"))):
+        async with client() as ac:
+            r = await ac.post(
+                "/coach/analyze-sessions",
+                json=_batch_payload(2),
+                headers={"Authorization": f"Bearer {token}"},
+            )
+
+    statuses = [item["error"]["status_code"] if item["error"] else 200 for item in r.json()["items"]]
+    assert sorted(statuses) == [200, 429]
+
+
+@pytest.mark.asyncio
+async def test_analyze_sessions_rejects_oversized_batch():
+    from app.core.config import get_settings
+
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+
+    async with client() as ac:
+        r = await ac.post(
+            "/coach/analyze-sessions",
+            json=_batch_payload(get_settings().coach_batch_max_sessions + 1),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    assert r.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_analyze_session_reports_estimated_and_actual_tokens():
+    user = _make_user()
+    token = create_access_token(sub=user.id)
+    upstream = completion("Analyse.", prompt_tokens=700, completion_tokens=150)
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=upstream)):
+        async with client() as ac:
+            r = await ac.post(
+                "/coach/analyze-session",
+                json=VALID_PAYLOAD,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+    usage = r.json()["usage"]
+    assert usage["prompt_tokens_estimated"] > 0
+    assert usage["prompt_tokens"] == 700
+    assert usage["completion_tokens"] == 150
+
+
+def _long_session(series_count=40):
+    from app.schemas.coach import SeriesIn, SessionIn
+
+    return SessionIn(
+        weapon="Glock 17",
+        caliber="9mm",
+        series=[
+            SeriesIn(
+                shot_count=5,
+                distance=10 if i % 2 else 25,
+                points=40 + i % 8,
+                group_size_cm=6 + (i % 5),
+                comment="Lâcher un peu anticipé, respiration à retravailler " * 4,
+            )
+            for i in range(series_count)
+        ],
+        synthese="Bonne séance dans l'ensemble. " * 50,
+    )
+
+
+def test_prompt_builder_within_budget_is_unchanged():
+    from app.services.prompt_builder import build_prompt
+
+    session = _long_session(series_count=2)
+    assert build_prompt(session, max_tokens=0) == build_prompt(session, max_tokens=100_000)
+
+
+def test_prompt_builder_compacts_over_budget_prompts():
+    from app.services.prompt_builder import build_prompt, estimate_tokens
+
+    session = _long_session()
+    full = build_prompt(session, max_tokens=0)
+    compact = build_prompt(session, max_tokens=1200)
+
+    assert estimate_tokens(full) > 1200
+    assert estimate_tokens(compact) <= 1200
+    # Series are aggregated per distance with numeric summaries.
+    assert "agrégées par distance, 40 au total" in compact
+    assert "Distance=25.0m : 20 séries, Coups=100" in compact
+    assert "Série 40" not in compact
+    # Deterministic: same session => same prompt (cache key stability).
+    assert compact == build_prompt(session, max_tokens=1200)
+
+
+def test_prompt_builder_truncates_comments_first():
+    from app.services.prompt_builder import build_prompt, estimate_tokens
+
+    session = _long_session(series_count=6)
+    session.synthese = None
+    full = build_prompt(session, max_tokens=0)
+    budget = estimate_tokens(full) - 50
+    compact = build_prompt(session, max_tokens=budget)
+
+    assert "- Série 6 :" in compact
+    assert "…" in compact
@@ -0,0 +1,128 @@
+"""Persisted analysis history (GET /coach/analyses, lookup by fingerprint)."""
+import copy
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from tests.conftest import VALID_PAYLOAD, auth_headers, client, completion
+
+pytestmark = pytest.mark.usefixtures("reset_coach_state")
+
+
+def _payload(weapon: str) -> dict:
+    payload = copy.deepcopy(VALID_PAYLOAD)
+    payload["session"]["weapon"] = weapon
+    return payload
+
+
+@pytest.mark.asyncio
+async def test_analysis_is_persisted_and_found_by_fingerprint():
+    headers = auth_headers()
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("Analyse A.", prompt_tokens=120, completion_tokens=40))):
+        async with client() as ac:
+            r = await ac.post("/coach/analyze-session", json=VALID_PAYLOAD, headers=headers)
+            fingerprint = r.json()["session_fingerprint"]
+            assert fingerprint
+
+            found = await ac.get(f"/coach/analyses/by-fingerprint/{fingerprint}", headers=headers)
+            missing = await ac.get("/coach/analyses/by-fingerprint/inconnu", headers=headers)
+
+    assert found.status_code == 200
+    data = found.json()
+    assert data["analysis"] == "Analyse A."
+    assert data["prompt_variant"] == "coach_neutre"
+    assert data["prompt_tokens"] == 120
+    assert data["completion_tokens"] == 40
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_repeated_cached_analysis_is_stored_once():
+    headers = auth_headers()
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("Analyse A."))):
+        async with client() as ac:
+            await ac.post("/coach/analyze-session", json=VALID_PAYLOAD, headers=headers)
+            await ac.post("/coach/analyze-session", json=VALID_PAYLOAD, headers=headers)
+            r = await ac.get("/coach/analyses", headers=headers)
+
+    assert len(r.json()["items"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_and_stream_analyses_are_persisted():
+    headers = auth_headers()
+    batch = {
+        "sessions": [_payload(w)["session"] for w in ("Glock 17", "CZ 75", "SIG P226")],
+        "prompt_variant": "coach_neutre",
+    }
+
+    async def fake_stream(prompt, **kwargs):
+        yield "Analyse "
+        yield "streamée."
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("Lot."))), \
+            patch("app.api.coach.mistral_client.stream_analysis", new=fake_stream):
+        async with client() as ac:
+            r = await ac.post("/coach/analyze-sessions", json=batch, headers=headers)
+            assert r.status_code == 200
+            r = await ac.post("/coach/analyze-session/stream", json=_payload("HK USP"), headers=headers)
+            assert r.status_code == 200
+            r = await ac.get("/coach/analyses", headers=headers)
+
+    assert sorted(item["analysis"] for item in r.json()["items"]) == ["Analyse streamée.", "Lot.", "Lot.", "Lot."]
+
+
+@pytest.mark.asyncio
+async def test_history_keyset_pagination_newest_first():
+    headers = auth_headers()
+    fetch = AsyncMock(side_effect=[completion(f"Analyse {i}.") for i in range(5)])
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=fetch):
+        async with client() as ac:
+            for i in range(5):
+                await ac.post("/coach/analyze-session", json=_payload(f"Arme {i}"), headers=headers)
+
+            seen = []
+            cursor = None
+            while True:
+                params = {"limit": 2}
+                if cursor:
+                    params["cursor"] = cursor
+                page = (await ac.get("/coach/analyses", params=params, headers=headers)).json()
+                assert len(page["items"]) <= 2
+                seen.extend(item["analysis"] for item in page["items"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+
+    assert seen == [f"Analyse {i}." for i in reversed(range(5))]
+
+
+@pytest.mark.asyncio
+async def test_history_is_per_user_and_rejects_bad_cursor():
+    owner = auth_headers("owner@example.com")
+    other = auth_headers("other@example.com")
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("ok"))):
+        async with client() as ac:
+            fingerprint = (await ac.post("/coach/analyze-session", json=VALID_PAYLOAD, headers=owner)).json()["session_fingerprint"]
+            listing = await ac.get("/coach/analyses", headers=other)
+            lookup = await ac.get(f"/coach/analyses/by-fingerprint/{fingerprint}", headers=other)
+            bad = await ac.get("/coach/analyses", params={"cursor": "pas-un-curseur"}, headers=owner)
+
+    assert listing.json() == {"items": [], "next_cursor": None}
+    assert lookup.status_code == 404
+    assert bad.status_code == 422
+
+
+def test_session_fingerprint_ignores_model_and_follows_variant():
+    from app.schemas.coach import SessionIn
+    from app.services.analysis_history import session_fingerprint
+
+    session = SessionIn(**VALID_PAYLOAD["session"])
+    same = SessionIn(**copy.deepcopy(VALID_PAYLOAD["session"]))
+
+    assert session_fingerprint(session, "coach_neutre") == session_fingerprint(same, "coach_neutre")
+    assert session_fingerprint(session, "coach_neutre") != session_fingerprint(session, "coach_pedagogue")
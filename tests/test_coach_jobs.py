@@ -0,0 +1,157 @@
+"""Asynchronous coach analysis jobs (POST /coach/jobs, GET /coach/jobs/{id}).
+
+Mistral is mocked at `mistral_client.fetch_analysis`; the worker pool is
+started explicitly (the ASGI test transport does not run startup hooks).
+"""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlmodel import Session
+
+from app.models.analysis_job import AnalysisJob
+from app.services.analysis_jobs import analysis_jobs
+from app.services.database import engine
+from tests.conftest import VALID_PAYLOAD, auth_headers, client, completion
+
+
+@pytest.fixture(autouse=True)
+async def job_workers(reset_coach_state):
+    await analysis_jobs.start()
+    yield
+    await analysis_jobs.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_is_accepted_then_completed_via_long_polling():
+    headers = auth_headers()
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("Analyse job."))):
+        async with client() as ac:
+            r = await ac.post("/coach/jobs", json=VALID_PAYLOAD, headers=headers)
+            assert r.status_code == 202
+            job_id = r.json()["id"]
+            assert r.json()["status"] == "pending"
+
+            r = await ac.get(f"/coach/jobs/{job_id}", params={"wait": 5}, headers=headers)
+
+    assert r.status_code == 200
+    data = r.json()
+    assert data["status"] == "done"
+    assert data["result"]["analysis"] == "Analyse job."
+    assert data["error"] is None
+
+
+@pytest.mark.asyncio
+async def test_job_records_mapped_upstream_error():
+    from app.services.mistral_client import MistralClientError
+
+    headers = auth_headers()
+    failing = AsyncMock(side_effect=MistralClientError("Le modèle ne répond pas (timeout).", status_code=504))
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=failing):
+        async with client() as ac:
+            job_id = (await ac.post("/coach/jobs", json=VALID_PAYLOAD, headers=headers)).json()["id"]
+            r = await ac.get(f"/coach/jobs/{job_id}", params={"wait": 5}, headers=headers)
+
+    assert r.json()["status"] == "error"
+    assert r.json()["error"]["status_code"] == 504
+
+
+@pytest.mark.asyncio
+async def test_job_of_another_user_is_not_visible():
+    owner = auth_headers("owner@example.com")
+    other = auth_headers("other@example.com")
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("ok"))):
+        async with client() as ac:
+            job_id = (await ac.post("/coach/jobs", json=VALID_PAYLOAD, headers=owner)).json()["id"]
+            r = await ac.get(f"/coach/jobs/{job_id}", headers=other)
+    assert r.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_interrupted_jobs_are_resumed_on_restart():
+    from app.schemas.coach import AnalyzeSessionRequest
+
+    await analysis_jobs.stop()
+    with Session(engine) as session:
+        job = AnalysisJob(
+            user_id="u1",
+            status="running",  # interrupted mid-flight by a restart
+            request_json=AnalyzeSessionRequest.parse_obj(VALID_PAYLOAD).json(),
+        )
+        session.add(job)
+        session.commit()
+        job_id = job.id
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=AsyncMock(return_value=completion("Reprise."))):
+        await analysis_jobs.start()
+        done = await analysis_jobs.wait(job_id, "u1", timeout=5)
+
+    assert done.status == "done"
+    assert done.analysis == "Reprise."
+
+
+def _stored_job(status, heartbeat_at=None) -> str:
+    from app.schemas.coach import AnalyzeSessionRequest
+
+    with Session(engine) as session:
+        job = AnalysisJob(
+            user_id="u1",
+            status=status,
+            heartbeat_at=heartbeat_at,
+            request_json=AnalyzeSessionRequest.parse_obj(VALID_PAYLOAD).json(),
+        )
+        session.add(job)
+        session.commit()
+        return job.id
+
+
+def test_a_job_is_claimed_by_a_single_process():
+    from app.services.analysis_jobs import AnalysisJobRunner
+
+    job_id = _stored_job("pending")
+    worker_a, worker_b = AnalysisJobRunner(workers=1), AnalysisJobRunner(workers=1)
+
+    assert worker_a._claim(job_id) is not None
+    assert worker_b._claim(job_id) is None
+    assert worker_a._claim(job_id) is None  # duplicate queue entry
+
+
+def test_running_jobs_are_recovered_only_after_their_lease():
+    from datetime import timedelta
+
+    from app.services.analysis_jobs import AnalysisJobRunner, _now
+
+    runner = AnalysisJobRunner(workers=1, lease_seconds=60)
+    alive = _stored_job("running", heartbeat_at=_now())
+    dead = _stored_job("running", heartbeat_at=_now() - timedelta(seconds=61))
+    pending = _stored_job("pending")
+
+    assert set(runner._recover()) == {dead, pending}
+    assert runner._claim(alive) is None
+    assert runner._claim(dead) is not None
+
+
+async def test_long_poll_sees_a_job_finished_by_another_process():
+    import asyncio
+    import time
+
+    from app.services.analysis_jobs import AnalysisJobRunner
+
+    job_id = _stored_job("pending")
+    worker_a = AnalysisJobRunner(workers=1)
+    worker_b = AnalysisJobRunner(workers=1, poll_interval_seconds=0.05)
+
+    async def finish_elsewhere():
+        await asyncio.sleep(0.2)
+        await worker_a._finish(job_id, error=(502, "Erreur amont."))
+
+    start = time.perf_counter()
+    job, _ = await asyncio.gather(worker_b.wait(job_id, "u1", timeout=2.0), finish_elsewhere())
+    assert job.status == "error"
+    assert time.perf_counter() - start < 1.0
+    assert worker_b.stats()["waiters"] == 0
+
+    assert await worker_b.wait(_stored_job("pending"), "u1", timeout=0.1) is not None
+    assert worker_b.stats()["waiters"] == 0
@@ -0,0 +1,150 @@
+"""Token-usage ledger (batched writes), daily quotas and GET /coach/usage."""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlmodel import Session, select
+
+from app.core.config import get_settings
+from app.models.token_usage import TokenUsage
+from app.services.database import engine
+from app.services.usage_ledger import UsageLedger, usage_ledger
+from tests.conftest import VALID_PAYLOAD, auth_headers, client, completion
+
+pytestmark = pytest.mark.usefixtures("reset_coach_state")
+
+
+def _rows():
+    with Session(engine) as session:
+        return session.exec(select(TokenUsage)).all()
+
+
+@pytest.mark.asyncio
+async def test_calls_are_buffered_then_written_in_batch():
+    headers = auth_headers()
+    fetch = AsyncMock(return_value=completion("ok", prompt_tokens=300, completion_tokens=120))
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=fetch):
+        async with client() as ac:
+            r = await ac.post("/coach/analyze-session", json=VALID_PAYLOAD, headers=headers)
+    assert r.status_code == 200
+
+    assert _rows() == []  # nothing written on the request path
+    assert usage_ledger.stats()["pending"] == 1
+    await usage_ledger.flush()
+
+    [row] = _rows()
+    assert (row.prompt_variant, row.model, row.status) == ("coach_neutre", "mistral-small-latest", 200)
+    assert (row.prompt_tokens, row.completion_tokens) == (300, 120)
+
+
+@pytest.mark.asyncio
+async def test_failed_calls_are_recorded_with_their_status():
+    from app.services.mistral_client import MistralClientError
+
+    headers = auth_headers()
+    failing = AsyncMock(side_effect=MistralClientError("timeout", status_code=504))
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=failing):
+        async with client() as ac:
+            await ac.post("/coach/analyze-session", json=VALID_PAYLOAD, headers=headers)
+    await usage_ledger.flush()
+
+    [row] = _rows()
+    assert row.status == 504
+    assert row.prompt_tokens == row.completion_tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_daily_quota_blocks_further_analyses(monkeypatch):
+    monkeypatch.setattr(get_settings(), "coach_daily_token_quota", 400)
+    headers = auth_headers()
+    fetch = AsyncMock(return_value=completion("ok", prompt_tokens=300, completion_tokens=120))
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=fetch):
+        async with client() as ac:
+            first = await ac.post("/coach/analyze-session", json=VALID_PAYLOAD, headers=headers)
+            second = await ac.post("/coach/analyze-session", json=VALID_PAYLOAD, headers=headers)
+            job = await ac.post("/coach/jobs", json=VALID_PAYLOAD, headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert "Quota" in second.json()["detail"]
+    assert int(second.headers["Retry-After"]) <= 24 * 3600
+    assert job.status_code == 429
+    assert fetch.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_usage_endpoint_aggregates_per_day_and_variant():
+    headers = auth_headers()
+    fetch = AsyncMock(side_effect=[
+        completion("a", prompt_tokens=100, completion_tokens=10),
+        completion("b", prompt_tokens=200, completion_tokens=20),
+        completion("c", prompt_tokens=50, completion_tokens=5),
+    ])
+    other_synthese = dict(VALID_PAYLOAD, session=dict(VALID_PAYLOAD["session"], synthese="Autre"))
+
+    with patch("app.api.coach.mistral_client.fetch_analysis", new=fetch):
+        async with client() as ac:
+            await ac.post("/coach/analyze-session", json=VALID_PAYLOAD, headers=headers)
+            await ac.post("/coach/analyze-session", json=other_synthese, headers=headers)
+            await ac.post(
+                "/coach/analyze-session",
+                json=dict(VALID_PAYLOAD, prompt_variant="coach_cool"),
+                headers=headers,
+            )
+            r = await ac.get("/coach/usage", headers=headers)
+
+    data = r.json()
+    assert data["tokens_today"] == 385
+    assert data["daily_token_quota"] is None
+    by_variant = {item["prompt_variant"]: item for item in data["items"]}
+    assert by_variant["coach_neutre"]["calls"] == 2
+    assert by_variant["coach_neutre"]["prompt_tokens"] == 300
+    assert by_variant["coach_cool"]["completion_tokens"] == 5
+    assert len({item["day"] for item in data["items"]}) == 1
+
+
+@pytest.mark.asyncio
+async def test_background_writer_flushes_full_batches():
+    import asyncio
+
+    ledger = UsageLedger(batch_size=2, flush_interval_seconds=60)
+    await ledger.start()
+    try:
+        ledger.record("u1", "coach_neutre", "m", 10, 5, latency_ms=100)
+        ledger.record("u1", "coach_neutre", "m", 10, 5, latency_ms=100)
+        for _ in range(50):
+            if ledger.stats()["written"] == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert ledger.stats()["written"] == 2
+        assert ledger.tokens_today("u1") == 30
+    finally:
+        await ledger.stop()
+
+
+@pytest.mark.asyncio
+async def test_daily_total_sees_other_workers_after_refresh(monkeypatch):
+    import threading
+
+    from app.services import usage_ledger as ledger_module
+
+    worker_a = UsageLedger(batch_size=100, flush_interval_seconds=60, quota_refresh_seconds=30)
+    worker_b = UsageLedger(batch_size=100, flush_interval_seconds=60, quota_refresh_seconds=30)
+    assert await worker_b.tokens_today_async("u1") == 0
+
+    worker_a.record("u1", "coach_neutre", "m", 100, 50, latency_ms=100)
+    await worker_a.flush()
+    assert await worker_b.tokens_today_async("u1") == 0  # cached by worker B
+
+    threads = []
+    stored_today = UsageLedger._stored_today
+    monkeypatch.setattr(
+        UsageLedger, "_stored_today",
+        staticmethod(lambda *a: threads.append(threading.get_ident()) or stored_today(*a)),
+    )
+    now = ledger_module.monotonic()
+    monkeypatch.setattr(ledger_module, "monotonic", lambda: now + 31)
+    assert await worker_b.tokens_today_async("u1") == 150
+    assert threads and threading.get_ident() not in threads  # DB read off the loop
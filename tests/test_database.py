@@ -0,0 +1,24 @@
+"""Database engines: async driver derivation from DATABASE_URL."""
+import importlib.util
+
+import pytest
+
+from app.services.database import _create_async_engine, async_database_url
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("sqlite:///./data.db", "sqlite+aiosqlite:///./data.db"),
+        ("postgresql://u:p@h/db", "postgresql+asyncpg://u:p@h/db"),
+        ("postgresql+asyncpg://u:p@h/db", "postgresql+asyncpg://u:p@h/db"),
+    ],
+)
+def test_async_database_url(url, expected):
+    assert async_database_url(url) == expected
+
+
+@pytest.mark.skipif(importlib.util.find_spec("asyncpg") is not None, reason="asyncpg installed")
+def test_missing_async_driver_is_reported():
+    with pytest.raises(RuntimeError, match="pip install asyncpg"):
+        _create_async_engine("postgresql://u:p@h/db")
@@ -0,0 +1,189 @@
+"""Local Google id_token verification against a cached JWKS.
+
+A local RSA key signs the id_tokens and a fake JWKS endpoint serves its
+public half: once the cache is warm, logins make no network call at all.
+"""
+import asyncio
+import base64
+import time
+from unittest.mock import patch
+
+import pytest
+import rsa
+from google.auth import crypt, jwt
+
+from app.services import google_id_token
+from app.services.google_id_token import GoogleKeyCache, InvalidIdToken, google_keys, verify_id_token
+from app.services.oauth_state import get_state_manager
+from tests.conftest import client, http_response, mock_async_http_client
+
+PUBLIC_KEY, PRIVATE_KEY = rsa.newkeys(1024)
+OTHER_PUBLIC_KEY, OTHER_PRIVATE_KEY = rsa.newkeys(1024)
+
+
+def _b64int(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _jwks_response(max_age=3600):
+    resp = http_response(200, {"keys": [{
+        "kty": "RSA", "alg": "RS256", "use": "sig", "kid": "k1",
+        "n": _b64int(PUBLIC_KEY.n), "e": _b64int(PUBLIC_KEY.e),
+    }]})
+    resp.headers = {"cache-control": f"public, max-age={max_age}, must-revalidate"}
+    return resp
+
+
+def _jwks_endpoint(*responses):
+    mocked = mock_async_http_client(list(responses))
+    return mocked, patch("app.services.oauth_http.get_client", return_value=mocked)
+
+
+def _id_token(private_key=PRIVATE_KEY, kid="k1", **overrides):
+    now = int(time.time())
+    claims = {
+        "iss": "https://accounts.google.com",
+        "aud": "client-id",
+        "sub": "google-sub-123",
+        "email": "tireur@example.com",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    claims.update(overrides)
+    signer = crypt.RSASigner.from_string(private_key.save_pkcs1().decode(), key_id=kid)
+    return jwt.encode(signer, claims).decode()
+
+
+@pytest.fixture
+def keys():
+    google_keys.reset()
+    yield google_keys
+    google_keys.reset()
+
+
+async def test_keys_are_fetched_once_then_verified_locally(keys):
+    jwks, endpoint = _jwks_endpoint(_jwks_response())
+    with endpoint:
+        for _ in range(3):
+            claims = await verify_id_token(_id_token(), "client-id")
+    assert claims["sub"] == "google-sub-123"
+    assert jwks.get.await_count == 1
+    assert keys.stats()["fetches"] == 1
+
+
+async def test_cache_honors_max_age(keys, monkeypatch):
+    jwks, endpoint = _jwks_endpoint(_jwks_response(max_age=60), _jwks_response())
+    with endpoint:
+        await verify_id_token(_id_token(), "client-id")
+        now = google_id_token.time.monotonic()
+        monkeypatch.setattr(google_id_token.time, "monotonic", lambda: now + 61)
+        await verify_id_token(_id_token(), "client-id")
+    assert jwks.get.await_count == 2
+
+
+@pytest.mark.parametrize(
+    "token, error",
+    [
+        (lambda: _id_token(private_key=OTHER_PRIVATE_KEY), "Invalid signature"),
+        (lambda: _id_token(aud="someone-else"), "Invalid audience"),
+        (lambda: _id_token(iss="https://evil.example.com"), "Invalid issuer"),
+        (lambda: _id_token(exp=int(time.time()) - 60), "Token expired"),
+        (lambda: "not-a-jwt", "Malformed token"),
+    ],
+)
+async def test_invalid_tokens_are_rejected(keys, token, error):
+    _, endpoint = _jwks_endpoint(_jwks_response())
+    with endpoint, pytest.raises(InvalidIdToken, match=error):
+        await verify_id_token(token(), "client-id")
+
+
+@pytest.mark.parametrize("body", [[{"kid": "k1"}], {"keys": {"kid": "k1"}}, {"keys": ["k1"]}])
+async def test_malformed_jwks_is_an_invalid_token(body):
+    cache = GoogleKeyCache()
+    resp = http_response(200, body)
+    resp.headers = {}
+    _, endpoint = _jwks_endpoint(resp)
+    with endpoint, pytest.raises(InvalidIdToken):
+        await verify_id_token(_id_token(), "client-id", keys=cache)
+    assert cache.stats()["failures"] == (0 if body == {"keys": ["k1"]} else 1)
+
+
+async def test_non_string_kid_is_rejected(keys):
+    signer = crypt.RSASigner.from_string(PRIVATE_KEY.save_pkcs1().decode())
+    token = jwt.encode(signer, {"aud": "client-id"}, header={"kid": 7}).decode()
+    with pytest.raises(InvalidIdToken, match="Invalid key id"):
+        await verify_id_token(token, "client-id")
+
+
+async def test_background_refresher_survives_unexpected_errors(monkeypatch):
+    cache = GoogleKeyCache()
+    monkeypatch.setattr(cache, "RETRY_SECONDS", 0)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        cache._fetched_at = cache._expires_at = time.monotonic() + 3600
+
+    monkeypatch.setattr(cache, "_fetch", fetch)
+    await cache.start()
+    try:
+        for _ in range(100):
+            if len(calls) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        assert not cache._task.done()
+    finally:
+        await cache.stop()
+    assert len(calls) == 2
+
+
+async def test_unknown_kid_does_not_refetch_a_fresh_cache():
+    cache = GoogleKeyCache()
+    jwks, endpoint = _jwks_endpoint(_jwks_response())
+    with endpoint:
+        await verify_id_token(_id_token(), "client-id", keys=cache)
+        for _ in range(3):
+            with pytest.raises(InvalidIdToken, match="Unknown key id"):
+                await verify_id_token(_id_token(kid="rotated"), "client-id", keys=cache)
+    assert jwks.get.await_count == 1
+
+
+async def test_background_refresher_warms_the_cache():
+    cache = GoogleKeyCache()
+    _, endpoint = _jwks_endpoint(_jwks_response())
+    with endpoint:
+        await cache.start()
+        try:
+            for _ in range(100):
+                if cache.stats()["fresh"]:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await cache.stop()
+    assert cache.stats() == {"keys": 1, "fresh": True, "fetches": 1, "failures": 0}
+
+
+async def test_google_logins_do_not_touch_the_network_once_warm(google_configured, keys):
+    jwks, endpoint = _jwks_endpoint(_jwks_response())
+    with endpoint:
+        await verify_id_token(_id_token(), "client-id")  # warm-up
+    assert jwks.get.await_count == 1
+
+    # Any further request through httpx would pop from the exchange mock's
+    # one-response queue and fail the login.
+    for _ in range(2):
+        state, data = get_state_manager().create_state()
+        exchange = mock_async_http_client(
+            [http_response(200, {"id_token": _id_token(nonce=data["nonce"])})]
+        )
+        with patch("app.services.oauth_http.get_client", return_value=exchange):
+            async with client() as ac:
+                r = await ac.get(
+                    "/auth/google/callback",
+                    params={"code": "auth-code", "state": state},
+                )
+        assert r.status_code == 302
+    assert keys.stats()["fetches"] == 1
@@ -0,0 +1,131 @@
+"""Hedged Mistral requests (services/hedging + mistral_client)."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.services import mistral_client
+from app.services.bulkhead import Bulkhead
+from app.services.hedging import Hedger
+
+
+def _body(content):
+    return {"choices": [{"message": {"content": content}}]}
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    """Hedging on, warm latency window (threshold 10 ms), budget for one hedge."""
+    settings = get_settings()
+    monkeypatch.setattr(settings, "mistral_api_key", "test-key")
+    monkeypatch.setattr(settings, "mistral_hedge_enabled", True)
+    hedger = Hedger(percentile=95, budget_ratio=1.0, min_samples=3)
+    for _ in range(3):
+        hedger.record_latency(0.01)
+    monkeypatch.setattr(mistral_client, "mistral_hedger", hedger)
+    mistral_client.mistral_breaker.reset()
+    yield hedger
+    mistral_client._client = None
+
+
+def _install(handler):
+    mistral_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_hedge_wins(hedging):
+    release_primary = asyncio.Event()
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await release_primary.wait()  # primary stuck until cancelled
+            return httpx.Response(200, json=_body("lent"))
+        return httpx.Response(200, json=_body("rapide"))
+
+    _install(handler)
+    completion = await mistral_client.fetch_analysis("p")
+
+    assert completion.content == "rapide"
+    assert len(calls) == 2
+    stats = hedging.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+    assert mistral_client.mistral_bulkhead.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hedge_win_records_latency_from_primary_start(hedging):
+    release_primary = asyncio.Event()
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await release_primary.wait()
+        else:
+            await asyncio.sleep(0.02)
+        return httpx.Response(200, json=_body("ok"))
+
+    _install(handler)
+    await mistral_client.fetch_analysis("p")
+
+    # Threshold 10 ms + hedge 20 ms: the cancelled primary took at least
+    # 30 ms, not the 20 ms the hedge took on its own.
+    assert len(hedging._latencies) == 4
+    assert hedging._latencies[-1] >= 0.03
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged(hedging):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=_body("ok"))
+
+    _install(handler)
+    assert (await mistral_client.fetch_analysis("p")).content == "ok"
+    assert len(calls) == 1
+    assert hedging.stats()["hedges"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hedge_skipped_without_free_bulkhead_slot(hedging, monkeypatch):
+    monkeypatch.setattr(
+        mistral_client, "mistral_bulkhead", Bulkhead(max_concurrency=1, max_queue=1, max_wait_seconds=1)
+    )
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=_body("ok"))
+
+    _install(handler)
+    assert (await mistral_client.fetch_analysis("p")).content == "ok"
+    assert len(calls) == 1
+    assert hedging.stats()["skipped_capacity"] == 1
+
+
+def test_hedge_budget_caps_extra_calls():
+    hedger = Hedger(percentile=95, budget_ratio=0.05, min_samples=1)
+    hedger.record_latency(0.5)
+
+    sent = 0
+    for _ in range(200):
+        hedger.hedge_delay()
+        if hedger.try_spend():
+            sent += 1
+    assert sent == 10  # 5 % of 200 primary calls
+    assert hedger.stats()["hedge_rate"] == 0.05
+
+
+def test_hedge_threshold_tracks_latency_percentile():
+    hedger = Hedger(percentile=90, budget_ratio=0.05, min_samples=10)
+    assert hedger.hedge_delay() is None  # cold window: no hedging
+
+    for ms in range(1, 11):
+        hedger.record_latency(ms / 1000)
+    assert hedger.hedge_delay() == pytest.approx(0.009)
@@ -0,0 +1,300 @@
+"""Mistral HTTP client: shared pooled client and error mapping.
+
+The upstream API is never called: the shared client is swapped for one
+backed by `httpx.MockTransport`.
+"""
+import json
+
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.services import mistral_client
+
+
+def _completion(content="Analyse test."):
+    return {"choices": [{"message": {"content": content}}]}
+
+
+@pytest.fixture
+def mistral_configured(monkeypatch):
+    monkeypatch.setattr(get_settings(), "mistral_api_key", "test-key")
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    """Closed breaker and recorded (not slept) backoff delays."""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    mistral_client.mistral_breaker.reset()
+    monkeypatch.setattr(mistral_client.asyncio, "sleep", fake_sleep)
+    yield delays
+    mistral_client.mistral_breaker.reset()
+
+
+@pytest.fixture
+def mock_upstream():
+    """Install a MockTransport-backed shared client; yields the call log."""
+    calls = []
+    responses = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        status, body = responses.pop(0) if responses else (200, _completion())
+        return httpx.Response(status, json=body)
+
+    mistral_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    yield calls, responses
+    mistral_client._client = None
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_reused_across_calls(mistral_configured, mock_upstream):
+    calls, _ = mock_upstream
+    client = mistral_client.get_client()
+
+    assert (await mistral_client.fetch_analysis("p1")).content == "Analyse test."
+    assert (await mistral_client.fetch_analysis("p2")).content == "Analyse test."
+
+    assert len(calls) == 2
+    assert mistral_client.get_client() is client
+    assert calls[0].headers["Authorization"] == "Bearer test-key"
+
+
+@pytest.mark.asyncio
+async def test_completion_carries_model_and_token_usage(mistral_configured, mock_upstream):
+    _, responses = mock_upstream
+    body = _completion()
+    body.update(model="mistral-small-2409", usage={"prompt_tokens": 812, "completion_tokens": 240})
+    responses.append((200, body))
+
+    completion = await mistral_client.fetch_analysis("p")
+    assert completion.model == "mistral-small-2409"
+    assert (completion.prompt_tokens, completion.completion_tokens) == (812, 240)
+
+
+@pytest.mark.asyncio
+async def test_upstream_5xx_maps_to_502(mistral_configured, mock_upstream):
+    calls, responses = mock_upstream
+    responses.extend([(503, {})] * 3)
+
+    with pytest.raises(mistral_client.MistralClientError) as exc:
+        await mistral_client.fetch_analysis("p")
+    assert exc.value.status_code == 502
+    assert len(calls) == 1 + get_settings().mistral_max_retries
+
+
+@pytest.mark.asyncio
+async def test_transient_failure_is_retried_with_jittered_backoff(
+    mistral_configured, mock_upstream, fast_retries
+):
+    calls, responses = mock_upstream
+    responses.extend([(502, {}), (500, {})])
+
+    assert (await mistral_client.fetch_analysis("p")).content == "Analyse test."
+    assert len(calls) == 3
+    settings = get_settings()
+    assert len(fast_retries) == 2
+    assert 0 <= fast_retries[0] <= settings.mistral_retry_base_delay_seconds
+    assert 0 <= fast_retries[1] <= settings.mistral_retry_base_delay_seconds * 2
+
+
+@pytest.mark.asyncio
+async def test_upstream_retry_after_is_honored(mistral_configured, fast_retries):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            return httpx.Response(429, json={}, headers={"Retry-After": "3"})
+        return httpx.Response(200, json=_completion())
+
+    mistral_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        assert (await mistral_client.fetch_analysis("p")).content == "Analyse test."
+    finally:
+        mistral_client._client = None
+    assert fast_retries == [3.0]
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(mistral_configured, mock_upstream):
+    calls, responses = mock_upstream
+    responses.append((400, {}))
+
+    with pytest.raises(mistral_client.MistralClientError):
+        await mistral_client.fetch_analysis("p")
+    assert len(calls) == 1
+
+
+def test_short_prompts_are_routed_to_the_small_model(monkeypatch):
+    settings = get_settings()
+    assert mistral_client.route_model("court") == settings.mistral_model  # routing off by default
+
+    monkeypatch.setattr(settings, "mistral_small_model", "ministral-8b-latest")
+    monkeypatch.setattr(settings, "mistral_small_model_max_prompt_tokens", 10)
+    assert mistral_client.route_model("court") == "ministral-8b-latest"
+    assert mistral_client.route_model("x" * 400) == settings.mistral_model
+
+
+@pytest.mark.asyncio
+async def test_timeout_falls_back_to_alternate_model(
+    mistral_configured, mock_upstream, monkeypatch, fast_retries
+):
+    calls, responses = mock_upstream
+    monkeypatch.setattr(get_settings(), "mistral_fallback_model", "open-mistral-nemo")
+    monkeypatch.setattr(mistral_client, "mistral_model_stats", mistral_client.ModelStats())
+    responses.append((503, {}))
+
+    completion = await mistral_client.fetch_analysis("p", model="mistral-large-latest")
+
+    assert [json.loads(c.content)["model"] for c in calls] == ["mistral-large-latest", "open-mistral-nemo"]
+    assert completion.model == "open-mistral-nemo"  # no model in the mocked body
+    assert fast_retries == []  # immediate switch, no backoff
+    stats = mistral_client.model_stats()
+    assert stats["fallbacks"] == 1
+    assert stats["models"]["mistral-large-latest"]["success_rate"] == 0
+    assert stats["models"]["open-mistral-nemo"]["successes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_does_not_trigger_model_fallback(
+    mistral_configured, mock_upstream, monkeypatch
+):
+    calls, responses = mock_upstream
+    monkeypatch.setattr(get_settings(), "mistral_fallback_model", "open-mistral-nemo")
+    responses.append((429, {}))
+
+    await mistral_client.fetch_analysis("p", model="mistral-large-latest")
+    assert [json.loads(c.content)["model"] for c in calls] == ["mistral-large-latest"] * 2
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_after_consecutive_failures_and_rejects_fast(
+    mistral_configured, mock_upstream, monkeypatch
+):
+    calls, responses = mock_upstream
+    monkeypatch.setattr(get_settings(), "mistral_max_retries", 0)
+    breaker = mistral_client.mistral_breaker
+    responses.extend([(500, {})] * breaker.failure_threshold)
+
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(mistral_client.MistralClientError):
+            await mistral_client.fetch_analysis("p")
+    assert breaker.state == "open"
+
+    with pytest.raises(mistral_client.MistralClientError) as exc:
+        await mistral_client.fetch_analysis("p")
+    assert exc.value.status_code == 503
+    assert exc.value.retry_after >= 1
+    assert len(calls) == breaker.failure_threshold  # rejected without an upstream call
+
+
+def test_breaker_half_open_trial_closes_or_reopens(monkeypatch):
+    from app.services import circuit_breaker as cb
+
+    breaker = cb.CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=10)
+    now = cb.time.monotonic()
+    breaker.record_failure()
+    assert breaker.state == cb.OPEN
+
+    monkeypatch.setattr(cb.time, "monotonic", lambda: now + 11)
+    breaker.before_call()  # single trial allowed
+    assert breaker.state == cb.HALF_OPEN
+    with pytest.raises(cb.CircuitOpenError):
+        breaker.before_call()  # second concurrent trial refused
+
+    breaker.record_failure()
+    assert breaker.state == cb.OPEN
+
+    monkeypatch.setattr(cb.time, "monotonic", lambda: now + 30)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == cb.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_open_close_lifecycle_and_pool_stats():
+    await mistral_client.open_client()
+    client = mistral_client.get_client()
+    await mistral_client.open_client()  # idempotent
+    assert mistral_client.get_client() is client
+
+    stats = mistral_client.pool_stats()
+    assert stats == {"open": True, "active": 0, "idle": 0, "waiting": 0}
+
+    await mistral_client.close_client()
+    assert client.is_closed
+    assert mistral_client.pool_stats()["open"] is False
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_survive_renamed_httpx_internals(monkeypatch):
+    await mistral_client.open_client()
+    try:
+        monkeypatch.delattr(mistral_client.get_client(), "_transport")
+        stats = mistral_client.pool_stats()
+    finally:
+        monkeypatch.undo()
+        await mistral_client.close_client()
+    assert stats == {"open": True, "active": None, "idle": None, "waiting": None}
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_is_gated_outside_dev(monkeypatch):
+    from app import main
+    from tests.conftest import client
+
+    monkeypatch.setattr(main.settings, "environment", "production")
+    async with client() as ac:
+        assert (await ac.get("/metrics")).status_code == 404
+        monkeypatch.setattr(main.settings, "metrics_token", "s3cret")
+        assert (await ac.get("/metrics")).status_code == 401
+        assert (await ac.get("/metrics", headers={"Authorization": "Bearer nope"})).status_code == 401
+        assert (await ac.get("/metrics", headers={"Authorization": "Bearer s3cret"})).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_pool_stats():
+    from tests.conftest import client
+
+    async with client() as ac:
+        r = await ac.get("/metrics")
+    assert r.status_code == 200
+    assert set(r.json()["mistral_pool"]) == {"open", "active", "idle", "waiting"}
+
+
+@pytest.mark.asyncio
+async def test_stream_analysis_parses_sse_deltas(mistral_configured):
+    import json
+
+    chunks = [{"choices": [{"delta": {"content": c}}]} for c in ("Bonne ", "session")]
+    body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["payload"] = json.loads(request.content)
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    mistral_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        parts = [p async for p in mistral_client.stream_analysis("p")]
+    finally:
+        mistral_client._client = None
+
+    assert parts == ["Bonne ", "session"]
+    assert seen["payload"]["stream"] is True
+
+
+@pytest.mark.asyncio
+async def test_stream_analysis_maps_http_error(mistral_configured, mock_upstream):
+    _, responses = mock_upstream
+    responses.append((429, {}))
+
+    with pytest.raises(mistral_client.MistralClientError) as exc:
+        async for _ in mistral_client.stream_analysis("p"):
+            pass
+    assert exc.value.status_code == 429
@@ -4,11 +4,12 @@ Google and Facebook HTTP exchanges are entirely mocked: these tests cover
 the nominal end-to-end paths (login → callback → token exchange → /users/me)
 and the error branches, without any real network call.
 """
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from urllib.parse import parse_qs, urlparse
 
 import pytest
 
+from app.services.google_id_token import InvalidIdToken
 from app.services.oauth_state import get_state_manager
 from tests.conftest import client, http_response, mock_async_http_client
 
@@ -36,9 +37,9 @@ async def _google_callback(state, claims, token_payload=None, token_status=200):
     """Call /auth/google/callback with a mocked code exchange + id_token."""
     payload = {"id_token": "fake-id-token"} if token_payload is None else token_payload
     exchange = mock_async_http_client([http_response(token_status, payload, text="err")])
-    with patch("app.api.auth_google.httpx.AsyncClient", return_value=exchange), patch(
-        "app.api.auth_google.id_token.verify_oauth2_token",
-        return_value=claims,
+    with patch("app.services.oauth_http.get_client", return_value=exchange), patch(
+        "app.api.auth_google.google_id_token.verify_id_token",
+        AsyncMock(return_value=claims),
     ):
         async with client() as ac:
             return await ac.get(
@@ -115,9 +116,9 @@ async def test_google_callback_missing_id_token_returns_400(google_configured):
 async def test_google_callback_invalid_id_token_returns_400(google_configured):
     state, _ = get_state_manager().create_state()
     exchange = mock_async_http_client([http_response(200, {"id_token": "bad"})])
-    with patch("app.api.auth_google.httpx.AsyncClient", return_value=exchange), patch(
-        "app.api.auth_google.id_token.verify_oauth2_token",
-        side_effect=ValueError("Invalid signature"),
+    with patch("app.services.oauth_http.get_client", return_value=exchange), patch(
+        "app.api.auth_google.google_id_token.verify_id_token",
+        AsyncMock(side_effect=InvalidIdToken("Invalid signature")),
     ):
         async with client() as ac:
             r = await ac.get(
@@ -164,7 +165,7 @@ FB_USERINFO = {
 
 async def _facebook_callback(state, responses):
     fb_client = mock_async_http_client(responses)
-    with patch("app.api.auth_facebook.httpx.AsyncClient", return_value=fb_client):
+    with patch("app.services.oauth_http.get_client", return_value=fb_client):
         async with client() as ac:
             return await ac.get(
                 "/auth/facebook/callback",
@@ -0,0 +1,59 @@
+"""Shared OAuth provider HTTP clients and per-step latency histograms."""
+import httpx
+import pytest
+
+from app.services import oauth_http
+from app.services.oauth_http import LatencyHistogram
+from app.services.oauth_state import get_state_manager
+from tests.conftest import http_response
+from tests.test_oauth_flows import FB_USERINFO, _facebook_callback
+
+
+@pytest.fixture(autouse=True)
+async def fresh_clients():
+    await oauth_http.close_clients()
+    oauth_http.reset_latencies()
+    yield
+    await oauth_http.close_clients()
+    oauth_http.reset_latencies()
+
+
+async def test_one_pooled_client_per_provider():
+    await oauth_http.open_clients()
+    google = oauth_http.get_client("google")
+    assert oauth_http.get_client("google") is google
+    assert oauth_http.get_client("facebook") is not google
+    assert google.timeout == httpx.Timeout(oauth_http.OAUTH_TIMEOUT_SECONDS)
+
+    await oauth_http.close_clients()
+    assert google.is_closed
+    assert oauth_http.get_client("google") is not google  # recreated on demand
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = LatencyHistogram()
+    histogram.observe(10)
+    histogram.observe(300)
+    histogram.observe(20000, ok=False)
+
+    stats = histogram.stats()
+    assert stats["count"] == 3
+    assert stats["errors"] == 1
+    assert stats["buckets"]["le_25"] == 1
+    assert stats["buckets"]["le_250"] == 1
+    assert stats["buckets"]["le_500"] == 2
+    assert stats["buckets"]["le_inf"] == 3
+
+
+async def test_facebook_login_records_each_step(facebook_configured):
+    state, _ = get_state_manager().create_state()
+    r = await _facebook_callback(
+        state,
+        [http_response(200, {"access_token": "fb-access"}), http_response(200, FB_USERINFO)],
+    )
+    assert r.status_code == 302
+
+    stats = oauth_http.latency_stats()["facebook"]
+    assert stats["token_exchange"]["count"] == 1
+    assert stats["userinfo"]["count"] == 1
+    assert stats["userinfo"]["errors"] == 0
@@ -0,0 +1,95 @@
+"""Stateless signed OAuth states (OAUTH_STATE_MODE=signed)."""
+import pytest
+
+from app.services import oauth_state
+from app.services.oauth_state import SignedStateManager
+from app.services.shared_store import MemoryStore, SqliteStore
+from tests.test_auth_google_nonce import _call_callback, _claims
+
+
+@pytest.fixture
+def signed(monkeypatch):
+    manager = SignedStateManager("test-secret", store=MemoryStore())
+    monkeypatch.setattr(oauth_state, "_state_manager", manager)
+    return manager
+
+
+def test_signed_state_carries_nonces_without_storage(signed):
+    state, data = signed.create_state(client_nonce="c1")
+    assert signed.stats()["values"] == 0
+
+    assert signed.verify_and_consume(state) == data
+    assert data["client_nonce"] == "c1"
+
+
+def test_signed_state_is_single_use(signed):
+    state, _ = signed.create_state()
+    assert signed.verify_and_consume(state) is not None
+    assert signed.verify_and_consume(state) is None
+
+
+def test_tampered_forged_or_expired_state_is_rejected(signed, monkeypatch):
+    state, _ = signed.create_state()
+    payload, signature = state.split(".")
+    assert signed.verify_and_consume(payload[:-2] + "AA." + signature) is None
+    assert signed.verify_and_consume("forged-state") is None
+    assert SignedStateManager("other-secret").verify_and_consume(state) is None
+
+    now = oauth_state.time.time()
+    monkeypatch.setattr(oauth_state.time, "time", lambda: now + oauth_state.STATE_TTL_SECONDS + 1)
+    assert signed.verify_and_consume(state) is None
+
+
+@pytest.mark.parametrize("state", ["abc.é", "é", "....", "abc.", ".sig"])
+def test_garbage_state_is_rejected_not_raised(signed, state):
+    assert signed.verify_and_consume(state) is None
+
+
+def test_validly_signed_but_malformed_payload_is_rejected(signed):
+    for claims in (b'{"j":"x"}', b'[1,2]', b'{"j":"x","n":"n","c":null,"t":0,"e":"soon"}'):
+        payload = oauth_state._b64encode(claims)
+        assert signed.verify_and_consume(f"{payload}.{signed._sign(payload)}") is None
+
+
+@pytest.mark.asyncio
+async def test_google_callback_with_non_ascii_state_is_a_400(google_configured, signed):
+    r = await _call_callback("abc.é", _claims())
+    assert r.status_code == 400
+
+
+def test_replay_markers_are_not_evicted_by_capacity():
+    store = MemoryStore(max_values=2)
+    manager = SignedStateManager("test-secret", store=store)
+    first, second, third = (manager.create_state()[0] for _ in range(3))
+    assert manager.verify_and_consume(first) is not None
+    assert manager.verify_and_consume(second) is not None
+    # Stored states still evict each other; markers are kept apart.
+    for i in range(5):
+        store.put(f"oauth_state:{i}", "{}", 60, 0.0)
+
+    assert manager.verify_and_consume(first) is None
+    # Full: a new state is refused rather than an old marker dropped.
+    assert manager.verify_and_consume(third) is None
+    assert store.stats()["markers"] == 2
+    assert store.stats()["markers_rejected"] == 1
+
+
+def test_any_worker_verifies_and_replay_cache_is_shared(tmp_path):
+    path = str(tmp_path / "shared.db")
+    worker_a = SignedStateManager("test-secret", store=SqliteStore(path))
+    worker_b = SignedStateManager("test-secret", store=SqliteStore(path))
+
+    state, data = worker_a.create_state()
+    assert worker_b.verify_and_consume(state) == data
+    assert worker_a.verify_and_consume(state) is None
+
+
+@pytest.mark.asyncio
+async def test_google_callback_with_signed_state(google_configured, signed):
+    state, data = signed.create_state()
+
+    r = await _call_callback(state, _claims(nonce=data["nonce"]))
+    assert r.status_code == 302
+
+    replay = await _call_callback(state, _claims(nonce=data["nonce"]))
+    assert replay.status_code == 400
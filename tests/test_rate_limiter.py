@@ -0,0 +1,115 @@
+"""GCRA rate limiter (one TAT float per key, idle-key eviction)."""
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import GcraRateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "time", lambda: now[0])
+    return now
+
+
+def test_burst_then_steady_rate(clock):
+    limiter = GcraRateLimiter(max_requests=10, window_seconds=300)
+
+    assert all(limiter.allow("u") for _ in range(10))
+    assert not limiter.allow("u")
+    assert limiter.remaining("u") == 0
+    assert limiter.retry_after("u") == pytest.approx(30)
+
+    clock[0] += 30
+    assert limiter.allow("u")
+    assert not limiter.allow("u")
+
+
+def test_remaining_and_reset_queries(clock):
+    limiter = GcraRateLimiter(max_requests=10, window_seconds=300)
+    assert limiter.remaining("u") == 10
+    assert limiter.reset_after("u") == 0
+
+    limiter.allow("u")
+    limiter.allow("u")
+    assert limiter.remaining("u") == 8
+    assert limiter.reset_after("u") == pytest.approx(60)
+
+    clock[0] += 45
+    assert limiter.remaining("u") == 9
+
+
+def test_refund_restores_one_call(clock):
+    limiter = GcraRateLimiter(max_requests=2, window_seconds=60)
+    limiter.allow("u")
+    limiter.allow("u")
+    limiter.refund("u")
+    assert limiter.remaining("u") == 1
+    limiter.refund("u")
+    limiter.refund("u")  # never below a full quota
+    assert limiter.remaining("u") == 2
+
+
+def test_idle_keys_are_evicted_periodically(clock):
+    limiter = GcraRateLimiter(max_requests=10, window_seconds=300, sweep_interval_seconds=60)
+    limiter.allow("idle")
+    for _ in range(5):
+        limiter.allow("busy")
+
+    clock[0] += 61
+    limiter.allow("busy")
+    assert limiter.stats()["keys"] == 1
+    assert limiter.stats()["evicted"] == 1
+    assert limiter.remaining("idle") == 10
+
+
+def test_size_triggered_eviction_keeps_active_keys(clock):
+    limiter = GcraRateLimiter(max_requests=1, window_seconds=10, max_keys=2, sweep_interval_seconds=3600)
+    limiter.allow("a")
+    limiter.allow("b")
+    clock[0] += 5
+    limiter.allow("c")  # size bound hit, nothing idle yet: next sweep at 4 keys
+    assert (limiter.stats()["keys"], limiter.stats()["evicted"]) == (3, 0)
+
+    clock[0] += 6
+    limiter.allow("d")
+    limiter.allow("e")  # a and b are idle by now
+    assert (limiter.stats()["keys"], limiter.stats()["evicted"]) == (3, 2)
+
+
+def test_decision_carries_header_values_from_one_store_call(clock):
+    limiter = GcraRateLimiter(max_requests=10, window_seconds=300)
+    calls = []
+    store_allow = limiter.store.gcra_allow
+    limiter.store.gcra_allow = lambda *a: calls.append(a) or store_allow(*a)
+    limiter.store.gcra_tat = lambda *a: pytest.fail("decision must not re-read the store")
+
+    decision = limiter.allow("u")
+    assert (decision.allowed, decision.limit, decision.remaining) == (True, 10, 9)
+    assert decision.reset_after == pytest.approx(30)
+    for _ in range(9):
+        limiter.allow("u")
+    denied = limiter.allow("u")
+    assert not denied
+    assert (denied.remaining, denied.retry_after) == (0, pytest.approx(30))
+    assert len(calls) == 11
+
+
+async def test_blocking_backends_run_off_the_event_loop(clock):
+    import threading
+
+    from app.services.shared_store import MemoryStore
+
+    class SlowStore(MemoryStore):
+        blocking = True
+        threads = set()
+
+        def gcra_allow(self, *args):
+            self.threads.add(threading.get_ident())
+            return super().gcra_allow(*args)
+
+    limiter = GcraRateLimiter(max_requests=2, window_seconds=60, store=SlowStore())
+    assert await limiter.allow_async("u")
+    await limiter.refund_async("u")
+    assert limiter.remaining("u") == 2
+    assert threading.get_ident() not in SlowStore.threads
@@ -3,11 +3,18 @@ from datetime import datetime, timedelta, timezone
 
 import pytest
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.security import create_callback_token
 from app.models.refresh_token import RefreshToken
 from app.models.user import User
-from app.services.database import engine
+from app.services.database import async_engine, engine
+from app.services.refresh_tokens import (
+    RefreshTokenError,
+    issue_refresh_token,
+    rotate_refresh_token,
+    rotate_refresh_token_async,
+)
 from tests.conftest import client
 
 
@@ -150,3 +157,23 @@ async def test_exchange_contract_unchanged_for_existing_clients():
         assert field in data
     assert data["token_type"] == "bearer"
     assert data["expires_in"] == 3600
+
+
+@pytest.mark.asyncio
+async def test_sync_and_async_flavours_share_rotation_rules():
+    user = _make_user()
+    with Session(engine) as s:
+        raw, _ = issue_refresh_token(s, user.id)
+
+    async with AsyncSession(async_engine, expire_on_commit=False) as s:
+        new_raw, record = await rotate_refresh_token_async(s, raw)
+        assert record.user_id == user.id
+        with pytest.raises(RefreshTokenError, match="reuse"):
+            await rotate_refresh_token_async(s, raw)
+
+    # Reuse revoked the whole family, successor included.
+    with Session(engine) as s:
+        assert all(t.revoked_at is not None for t in s.exec(select(RefreshToken)).all())
+        with pytest.raises(RefreshTokenError):
+            rotate_refresh_token(s, new_raw)
+
@@ -0,0 +1,81 @@
+"""JWT signing with prepared keys and the verified-token cache."""
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+
+from app.core import security
+from app.core.config import get_settings
+from app.core.security import (
+    VerifiedTokenCache,
+    create_access_token,
+    create_callback_token,
+    decode_token,
+    jwt_cache,
+    verify_callback_token,
+)
+
+
+def test_tokens_match_pyjwt_output():
+    settings = get_settings()
+    expire = datetime.now(timezone.utc) + timedelta(minutes=5)
+    payload = {"exp": expire, "sub": "user-1", "type": "access", "email": "tireur@example.com"}
+    expected = jwt.encode(payload, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    assert security._encode(payload) == expected
+
+
+def test_replayed_token_is_verified_once(monkeypatch):
+    token = create_access_token(sub="user-1")
+    calls = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(security.jwt, "decode", lambda *a, **kw: calls.append(1) or real_decode(*a, **kw))
+
+    for _ in range(3):
+        assert decode_token(token)["sub"] == "user-1"
+    assert len(calls) == 1
+    assert jwt_cache.stats()["hits"] == 2
+
+
+def test_cached_payload_is_a_copy():
+    token = create_access_token(sub="user-1")
+    decode_token(token)["sub"] = "someone-else"
+    assert decode_token(token)["sub"] == "user-1"
+
+
+def test_cached_token_expires_at_exp(monkeypatch):
+    token = create_access_token(sub="user-1", expires_delta=timedelta(seconds=60))
+    decode_token(token)
+    now = security.time.time()
+    monkeypatch.setattr(security.time, "time", lambda: now + 61)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_token(token)
+    assert jwt_cache.stats()["size"] == 0
+
+
+def test_invalid_tokens_are_not_cached():
+    forged = jwt.encode({"sub": "user-1", "exp": 2**31}, "another-secret", algorithm="HS256")
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidSignatureError):
+            decode_token(forged)
+    assert jwt_cache.stats()["size"] == 0
+
+
+def test_cached_access_token_is_still_not_a_callback_token():
+    access = create_access_token(sub="user-1")
+    decode_token(access)
+    with pytest.raises(jwt.InvalidTokenError, match="Invalid token type"):
+        verify_callback_token(access)
+    callback = create_callback_token(sub="user-1", provider="google", email="tireur@example.com")
+    assert verify_callback_token(callback)["provider"] == "google"
+
+
+def test_cache_is_bounded_lru():
+    cache = VerifiedTokenCache(max_entries=2)
+    tokens = [create_access_token(sub=f"user-{i}") for i in range(3)]
+    for token in tokens[:2]:
+        cache.put(token, jwt.decode(token, options={"verify_signature": False}))
+    cache.get(tokens[0])  # tokens[1] becomes least recently used
+    cache.put(tokens[2], jwt.decode(tokens[2], options={"verify_signature": False}))
+    assert cache.get(tokens[1]) is None
+    assert cache.get(tokens[0])["sub"] == "user-0"
+    assert cache.stats()["size"] == 2
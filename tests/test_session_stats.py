@@ -0,0 +1,111 @@
+"""Server-side session statistics (no LLM call)."""
+from datetime import datetime
+
+import pytest
+
+from app.core.security import create_access_token
+from app.schemas.coach import SeriesIn, SessionIn
+from app.services.session_stats import compute_session_stats, compute_sessions_stats
+from tests.conftest import client
+from tests.test_coach import _make_user
+
+
+def _session(groups, points=45, distance=25, date=None):
+    return SessionIn(
+        date=date,
+        series=[
+            SeriesIn(shot_count=5, distance=distance, points=points, group_size_cm=g)
+            for g in groups
+        ],
+    )
+
+
+def test_session_stats_per_shot_trend_and_distances():
+    session = _session([10, 8, 6])
+    session.series.append(SeriesIn(shot_count=10, distance=10, points=95, group_size_cm=3))
+
+    stats = compute_session_stats(session)
+
+    assert stats.series_count == 4
+    assert stats.shot_count == 25
+    assert stats.points_per_shot == round((45 * 3 + 95) / 25, 2)
+    assert stats.group_size_best_cm == 3
+    assert stats.group_size_trend_cm_per_series < 0  # tightening
+    by_distance = {d.distance: d for d in stats.distances}
+    assert by_distance[25].series_count == 3
+    assert by_distance[25].group_size_mean_cm == 8
+    assert by_distance[10].points_per_shot == 9.5
+
+
+def test_session_stats_tolerates_missing_values():
+    stats = compute_session_stats(SessionIn(series=[SeriesIn(shot_count=5)]))
+    assert stats.points_per_shot is None
+    assert stats.group_size_mean_cm is None
+    assert stats.group_size_trend_cm_per_series is None
+
+
+def test_cross_session_trend_follows_dates():
+    older = _session([12], points=40, date=datetime(2026, 1, 1))
+    newer = _session([6], points=48, date=datetime(2026, 3, 1))
+
+    result = compute_sessions_stats([newer, older])  # sent out of order
+
+    assert result.trend.session_count == 2
+    assert result.trend.points_per_shot_trend > 0
+    assert result.trend.group_size_trend_cm < 0
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoint_accepts_naive_and_aware_dates():
+    user = _make_user()
+    payload = {
+        "sessions": [
+            {"date": "2026-01-02T10:00:00Z",
+             "series": [{"shot_count": 5, "distance": 25, "points": 48, "group_size_cm": 6}]},
+            {"date": "2026-01-01T10:00:00",
+             "series": [{"shot_count": 5, "distance": 25, "points": 40, "group_size_cm": 12}]},
+        ]
+    }
+
+    async with client() as ac:
+        r = await ac.post(
+            "/coach/stats",
+            json=payload,
+            headers={"Authorization": f"Bearer {create_access_token(sub=user.id)}"},
+        )
+    assert r.status_code == 200
+    # Naive date read as UTC: the 2026-01-01 session comes first.
+    assert r.json()["trend"]["points_per_shot_trend"] > 0
+
+
+def test_prompt_can_embed_precomputed_stats():
+    from app.services.prompt_builder import build_prompt
+
+    session = _session([10, 8, 6])
+    prompt = build_prompt(session, include_stats=True)
+
+    assert "Statistiques calculées" in prompt
+    assert "Points par coup=9.0" in prompt
+    assert "Statistiques calculées" not in build_prompt(session, include_stats=False)
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoint_returns_per_session_and_trend():
+    user = _make_user()
+    payload = {
+        "sessions": [
+            {"series": [{"shot_count": 5, "distance": 25, "points": 45, "group_size_cm": 8}]},
+            {"series": [{"shot_count": 5, "distance": 25, "points": 48, "group_size_cm": 6}]},
+        ]
+    }
+
+    async with client() as ac:
+        r = await ac.post(
+            "/coach/stats",
+            json=payload,
+            headers={"Authorization": f"Bearer {create_access_token(sub=user.id)}"},
+        )
+    assert r.status_code == 200
+    data = r.json()
+    assert [s["points_per_shot"] for s in data["sessions"]] == [9.0, 9.6]
+    assert data["trend"]["group_size_trend_cm"] == -2.0
@@ -0,0 +1,161 @@
+"""Shared store backends (memory, SQLite, Redis protocol) behind one interface.
+
+No Redis server here: `FakeRedis` maps the store's Lua scripts to their Python
+equivalent and implements the few commands used (SET PX, GET, GETDEL).
+"""
+import asyncio
+
+import pytest
+
+from app.services.oauth_state import OAuthStateManager
+from app.services.rate_limiter import GcraRateLimiter
+from app.services.shared_store import MemoryStore, RedisStore, SqliteStore
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}  # key -> (value, expires_at ms)
+        self.now_ms = 0.0
+
+    def _get(self, key):
+        item = self.data.get(key)
+        if item is None or item[1] <= self.now_ms:
+            self.data.pop(key, None)
+            return None
+        return item[0]
+
+    def set(self, key, value, px, nx=False):
+        if nx and self._get(key) is not None:
+            return None
+        self.data[key] = (str(value).encode(), self.now_ms + px)
+        return True
+
+    def get(self, key):
+        return self._get(key)
+
+    def getdel(self, key):
+        value = self._get(key)
+        self.data.pop(key, None)
+        return value
+
+    def eval(self, script, numkeys, key, *args):
+        current = self._get(key)
+        current = float(current) if current is not None else None
+        if script == RedisStore.GCRA_ALLOW:
+            now, interval, window = args
+            tat = (current if current is not None and current > now else now) + interval
+            if tat - now > window:
+                return [0, str(current).encode() if current is not None else None]
+            self.set(key, tat, px=(tat - now) * 1000)
+            return [1, str(tat).encode()]
+        if script == RedisStore.GCRA_REFUND:
+            now, interval = args
+            if current is None:
+                return 0
+            tat = max(current - interval, now)
+            if tat <= now:
+                self.data.pop(key, None)
+            else:
+                self.set(key, tat, px=(tat - now) * 1000)
+            return 1
+        raise AssertionError("unexpected script")
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    if request.param == "sqlite":
+        return SqliteStore(str(tmp_path / "shared.db"))
+    return RedisStore(FakeRedis())
+
+
+def test_gcra_allow_deny_and_refund(store):
+    assert store.gcra_allow("k", 100.0, 30.0, 60.0) == (True, 130.0)
+    assert store.gcra_allow("k", 100.0, 30.0, 60.0) == (True, 160.0)
+    allowed, tat = store.gcra_allow("k", 100.0, 30.0, 60.0)
+    assert not allowed and tat == 160.0
+
+    store.gcra_refund("k", 100.0, 30.0)
+    assert store.gcra_tat("k", 100.0) == 130.0
+    assert store.gcra_allow("k", 100.0, 30.0, 60.0)[0]
+
+
+def test_put_take_is_single_use_and_expires(store):
+    store.put("s1", "payload", 10, 100.0)
+    assert store.take("s1", 105.0) == "payload"
+    assert store.take("s1", 105.0) is None
+
+    store.put("s2", "payload", 10, 100.0)
+    if isinstance(store, RedisStore):
+        store.client.now_ms = 111_000  # Redis expires keys on its own clock
+    assert store.take("s2", 111.0) is None
+    assert store.take("unknown", 100.0) is None
+
+
+def test_put_if_absent_until_expiry(store):
+    assert store.put_if_absent("used", "1", 10, 100.0)
+    assert not store.put_if_absent("used", "1", 10, 105.0)
+    if isinstance(store, RedisStore):
+        store.client.now_ms = 111_000
+    assert store.put_if_absent("used", "1", 10, 111.0)
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.db")
+    a = GcraRateLimiter(max_requests=2, window_seconds=60, store=SqliteStore(path))
+    b = GcraRateLimiter(max_requests=2, window_seconds=60, store=SqliteStore(path))
+
+    assert a.allow("u")
+    assert b.allow("u")
+    assert not a.allow("u")
+    assert b.remaining("u") == 0
+
+
+def test_oauth_state_consumed_once_across_workers(tmp_path):
+    path = str(tmp_path / "shared.db")
+    worker_a = OAuthStateManager(store=SqliteStore(path))
+    worker_b = OAuthStateManager(store=SqliteStore(path))
+
+    state, data = worker_a.create_state(client_nonce="c1")
+    assert worker_b.verify_and_consume(state) == data
+    assert worker_a.verify_and_consume(state) is None
+
+
+async def test_async_oauth_state_consumption_on_blocking_backend(tmp_path):
+    manager = OAuthStateManager(store=SqliteStore(str(tmp_path / "shared.db")))
+    state, data = manager.create_state()
+    assert await manager.verify_and_consume_async(state) == data
+    assert await manager.verify_and_consume_async(state) is None
+
+
+def test_memory_values_expire_through_heap_and_capacity_is_bounded():
+    store = MemoryStore(max_values=3)
+    store.put("old", "x", 10, 100.0)
+    for i in range(3):
+        store.put(f"k{i}", "v", 60, 101.0)
+    assert store.stats()["values"] == 3
+    assert store.stats()["values_evicted"] == 1
+    assert store.take("old", 101.0) is None
+
+    store.put("short", "v", 1, 102.0)  # evicts k0
+    store.purge(104.0)
+    stats = store.stats()
+    assert (stats["values"], stats["values_expired"]) == (2, 1)
+    assert store.take("k2", 104.0) == "v"
+
+
+async def test_oauth_state_sweeper_purges_in_background():
+    store = MemoryStore()
+    manager = OAuthStateManager(ttl_seconds=0, store=store, sweep_interval_seconds=0.01)
+    manager.create_state()
+    await manager.start()
+    try:
+        for _ in range(100):
+            if store.stats()["values"] == 0:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await manager.stop()
+    assert store.stats()["values_expired"] == 1
+    assert manager.stats()["sweeper_running"] is False
@@ -0,0 +1,82 @@
+"""Single-flight coalescing of identical in-flight calls."""
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_upstream_call():
+    flights = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "analyse"
+
+    waiters = [asyncio.create_task(flights.do("k", upstream)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["analyse"] * 3
+    assert calls == 1
+    assert flights.stats() == {"in_flight": 0, "upstream_calls": 1, "coalesced": 2}
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared_by_all_waiters():
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def upstream():
+        await release.wait()
+        raise ValueError("boom")
+
+    waiters = [asyncio.create_task(flights.do("k", upstream)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_distinct_keys_are_not_coalesced():
+    flights = SingleFlight()
+
+    async def upstream():
+        return "ok"
+
+    await asyncio.gather(flights.do("a", upstream), flights.do("b", upstream))
+    assert flights.stats()["upstream_calls"] == 2
+
+
+@pytest.mark.asyncio
+async def test_upstream_cancelled_only_when_every_waiter_is_cancelled():
+    flights = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def upstream():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(flights.do("k", upstream))
+    second = asyncio.create_task(flights.do("k", upstream))
+    await started.wait()
+
+    first.cancel()
+    await asyncio.sleep(0)
+    assert not cancelled.is_set()  # second caller still waiting
+
+    second.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert flights.in_flight() == 0
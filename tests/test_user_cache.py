@@ -0,0 +1,113 @@
+"""Short-TTL authenticated-user cache behind get_current_user."""
+import pytest
+from sqlmodel import Session
+
+from app.api.oauth_utils import get_or_create_user
+from app.core.security import create_access_token
+from app.models.user import User
+from app.services import user_cache as user_cache_module
+from app.services.database import engine
+from app.services.user_cache import UserCache, user_cache
+from tests.conftest import client
+
+
+def _make_user(**fields) -> User:
+    with Session(engine) as session:
+        user = User(email="tireur@example.com", provider="google", **fields)
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        return user
+
+
+async def _me(user: User):
+    async with client() as ac:
+        return await ac.get("/users/me", headers={"Authorization": f"Bearer {create_access_token(sub=user.id)}"})
+
+
+@pytest.mark.asyncio
+async def test_repeated_requests_hit_the_cache():
+    user = _make_user(display_name="Tireur")
+    for _ in range(3):
+        r = await _me(user)
+        assert r.status_code == 200
+        assert r.json()["display_name"] == "Tireur"
+
+    stats = user_cache.stats()
+    assert (stats["misses"], stats["hits"], stats["db_lookups_avoided"]) == (1, 2, 2)
+    assert stats["hit_rate"] == pytest.approx(2 / 3, abs=1e-4)
+
+
+@pytest.mark.asyncio
+async def test_profile_update_invalidates_the_entry():
+    user = _make_user(display_name="Avant")
+    await _me(user)
+
+    async with client() as ac:
+        r = await ac.patch(
+            "/users/me/profile",
+            json={"display_name": "Après"},
+            headers={"Authorization": f"Bearer {create_access_token(sub=user.id)}"},
+        )
+    assert r.status_code == 200
+    assert user_cache.stats()["invalidations"] == 1
+    assert (await _me(user)).json()["display_name"] == "Après"
+
+
+@pytest.mark.asyncio
+async def test_profile_update_of_a_deleted_cached_user_is_a_401():
+    user = _make_user()
+    await _me(user)  # snapshot cached
+    with Session(engine) as session:
+        session.delete(session.get(User, user.id))
+        session.commit()
+
+    async with client() as ac:
+        r = await ac.patch(
+            "/users/me/profile",
+            json={"display_name": "Fantôme"},
+            headers={"Authorization": f"Bearer {create_access_token(sub=user.id)}"},
+        )
+    assert r.status_code == 401
+    assert user_cache.get(user.id) is None
+
+
+@pytest.mark.asyncio
+async def test_idp_refresh_invalidates_the_entry():
+    user = _make_user()
+    await _me(user)
+
+    with Session(engine) as session:
+        get_or_create_user(session, user.email, "google", avatar_url="https://example.com/new.jpg")
+
+    assert (await _me(user)).json()["avatar_url"] == "https://example.com/new.jpg"
+
+
+@pytest.mark.asyncio
+async def test_deactivation_applies_once_the_entry_expires(monkeypatch):
+    user = _make_user()
+    assert (await _me(user)).status_code == 200
+
+    with Session(engine) as session:
+        stored = session.get(User, user.id)
+        stored.is_active = False
+        session.add(stored)
+        session.commit()
+
+    assert (await _me(user)).status_code == 200  # still cached, within the TTL
+
+    now = user_cache_module.time.monotonic()
+    monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now + user_cache.ttl_seconds + 1)
+    assert (await _me(user)).status_code == 401
+
+
+def test_cache_is_bounded_lru():
+    cache = UserCache(max_entries=2, ttl_seconds=60)
+    a, b, c = (User(id=i, email=f"{i}@example.com", provider="google") for i in "abc")
+    cache.put(a)
+    cache.put(b)
+    assert cache.get("a") is not None  # a becomes most recent
+    cache.put(c)
+    assert cache.get("b") is None
+    assert cache.get("a").email == "a@example.com"
+    assert cache.stats()["size"] == 2